@@ -5,18 +5,55 @@ Created on Fri Jan  1 15:46:21 2021
 
 @author: adamguo
 """
-import os, sys, librosa, warnings
+import os, sys, warnings
 import pandas as pd
 import numpy as np
-from coarticulation_classes import Spectra, Coarticulation
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from coarticulation_classes import Spectra, Coarticulation, RecordingSpectra, \
+    recording_pair_measures, get_n_fft, get_fft_size, get_backend_name
+from measures_journal import MeasuresJournal
+import audio_io
+from audio_io import load_audio, AudioPrefetcher, estimate_audio_bytes
+from table_io import read_table, write_table, get_table_path
+from filter_banks import get_mel_filter_bank
+from feature_store import FeatureStore
+from result_cache import ResultCache
 
 warnings.simplefilter("error")
 warnings.simplefilter("ignore", ResourceWarning)
 
+# Full subfolder name for each condition code
+condition_folder_code_dict = {"NB": "noBarrierCondition",
+                              "BABBLE": "babbleCondition",
+                              "VOC": "vocoderCondition",
+                              "L2": "L2Condition",
+                              "READ_CO": "sentenceReadingCasual",
+                              "READ_CL": "sentenceReadingClear"}
+
+# Columns of the measures in the output
+measure_columns = ["Spectral_distance",
+                   "Raw_transition_duration",
+                   "Relative_transition_duration"]
+
 def analyze_coarticulation(sound_folders_dir,
                            phone_pairs_data_dir,
                            output_dir,
-                           sr = 44100):
+                           sr = 44100,
+                           whole_recording = False,
+                           multi_resolution = False,
+                           n_jobs = 1,
+                           blas_threads = 1,
+                           checkpoint = False,
+                           checkpoint_interval = 10,
+                           resample_cache_dir = None,
+                           n_fft = None,
+                           stft_backend = "librosa",
+                           dtype = "float64",
+                           feature_store_dir = None,
+                           result_cache_path = None,
+                           prefetch = 2,
+                           prefetch_memory = 2 ** 30,
+                           table_format = "parquet"):
     """
     Gets coarticulation measures (spectral distance and temporal transition) for 
     phone pairs.
@@ -25,118 +62,911 @@ def analyze_coarticulation(sound_folders_dir,
         Directory of the sound files (WAV) on which the analysis will be 
         performed. Each subfolder in this directory should be a condition.
     phone_pairs_data_dir:
-        Directory of the phone pair data.
+        Path to the phone pair data (Parquet, CSV or Excel; see 
+        table_io.read_table).
     output_dir:
-        Directory of the output (which is the phone pairs data plus one column 
-        that gives the spectral distance for each phone pair).
+        Directory of the output, coart_data (which is the phone pairs data 
+        plus one column per measure).
     sampling_rate:
         Sampling rate for loading the sound files (default: 44100, which is the 
-        native sampling rate of the LUCID recordings).
+        native sampling rate of the LUCID recordings). This is also the 
+        analysis rate: at a lower rate (e.g., 16000, which still covers the 
+        6000 Hz top of the filter bank) the FFT size shrinks with it (see 
+        get_analysis_n_fft). Use compare_measures to check the output 
+        against a 44100 Hz run.
+    whole_recording:
+        Compute the spectrogram of each recording once and slice the phones 
+        out of it, instead of running an STFT per phone (default: False). The 
+        frames of each phone then lie on the frame grid of the recording (up 
+        to half a hop from its first sample) and its edge frames see the 
+        neighbouring audio rather than STFT padding, so the measures are not 
+        those of the per-pair analysis: the spectral distance moves by a 
+        median of several percent and short phones and transition durations 
+        by much more. See check_whole_recording for the size of the 
+        difference on a recording.
+    multi_resolution:
+        Compute the spectra at the 0.001 step size only and decimate them to 
+        0.010 for the spectral distance (default: False). See 
+        check_multi_resolution for how far this is from the two-pass output.
+    n_jobs:
+        Number of worker processes (default: 1, i.e., no worker processes). 
+        With more than one, the phone pairs are grouped by recording and each 
+        recording is analyzed by one worker; the output is the same as with 
+        a single process.
+    blas_threads:
+        Number of BLAS/OpenMP threads per worker process (default: 1), so 
+        that n_jobs workers do not oversubscribe the cores.
+    checkpoint:
+        Keep a journal of the measures (coart_data_journal.sqlite in 
+        output_dir) while the analysis runs (default: False). If the run 
+        stops, running it again with the same phone pair data and settings 
+        skips the phone pairs in the journal. The journal is removed once 
+        coart_data has been saved.
+    checkpoint_interval:
+        Number of recordings between two writes to the journal (default: 10).
+    resample_cache_dir:
+        Directory for a cache of the recordings resampled to sr, so that each 
+        recording is resampled only once across runs (default: None, i.e., 
+        resample on every load). Not used for files already at sr. The 
+        recordings are resampled with audio_io.res_type either way, so the 
+        cache does not change the measures.
+    n_fft:
+        FFT size of the spectra: a number, "auto" for the next fast FFT size 
+        for the 0.0256 s window (1152 at 44100 Hz), or None for a power of 
+        two (see get_analysis_n_fft) (default: None). The filter bank is 
+        made for this size.
+    stft_backend:
+        STFT backend: "librosa", "scipy", "numpy" or a function (see 
+        coarticulation_classes.stft_backends) (default: "librosa"). Use 
+        functools.partial(scipy_stft_magnitude, workers = ...) for a 
+        multithreaded scipy.fft. See benchmarks.benchmark_stft_backends.
+    dtype:
+        Precision of the spectra, their logs and the distances: "float64" 
+        or "float32" (default: "float64"). float32 halves the memory traffic 
+        of the analysis; see check_dtype for how far its measures are from 
+        the float64 ones.
+    feature_store_dir:
+        Directory of a feature store (see feature_store.build_feature_store) 
+        to take the log spectra from, instead of loading the recordings 
+        (default: None). The measures are then those of whole_recording 
+        (with the same difference from the per-pair ones, see 
+        check_whole_recording), in the precision of the store. The store
+        must have been built with the same sampling rate and filter bank.
+    result_cache_path:
+        Path to a cache of the measures (an SQLite file; see 
+        result_cache.ResultCache) (default: None, i.e., no cache). Phone 
+        pairs whose sound file, time bounds, settings and code are the same 
+        as in an earlier run take their measures from the cache, so only new 
+        or changed phone pairs are analyzed. The numbers of cache hits and 
+        misses are printed.
+    prefetch:
+        Number of sound files that are loaded in background threads ahead of 
+        the one being analyzed (default: 2; 0 to load them in turn). Only 
+        used without worker processes (n_jobs = 1). The time the analysis 
+        waited for the sound files is printed at the end.
+    prefetch_memory:
+        Largest estimated size of the sound files loaded ahead (in bytes; 
+        default: 2 ** 30, 1 GiB). At least one sound file is always loaded 
+        ahead when prefetch is not 0.
+    table_format:
+        Format of the output: "parquet", "csv" or "xlsx" (default: 
+        "parquet"; see table_io).
     """
     # Load the phone pair data
-    phone_pairs_data = pd.read_excel(phone_pairs_data_dir)
+    phone_pairs_data = read_table(phone_pairs_data_dir)
     nrow = phone_pairs_data.shape[0]
     
-    # Create a new copy of the original phone data
-    coart_data = phone_pairs_data.copy(deep = True)
+    # Create the Mel-frequency filter bank
+    mel_f = get_mel_filter_bank(sr, n_fft = get_analysis_n_fft(sr, n_fft), n_mels = 29, 
+                                fmin = 100.0, fmax = 6000.0, htk = True, norm = 1)
     
-    # Add new empty columns for the measures
-    coart_data["Spectral_distance"] = np.nan
-    coart_data["Raw_transition_duration"] = np.nan
-    coart_data["Relative_transition_duration"] = np.nan
+    # Keyword arguments of all Spectra and RecordingSpectra
+    spectra_options = {"backend": stft_backend, "dtype": np.dtype(dtype)}
     
-    # Initialize filename of previous row
-    prev_filename_wav = ""
+    # Open the feature store
+    feature_store = None
+    if feature_store_dir is not None:
+        feature_store = FeatureStore(feature_store_dir)
+        feature_store.check_parameters(sr = sr, n_fft = get_n_fft(mel_f),
+                                       n_mels = mel_f.shape[0],
+                                       window_length = 0.0256)
     
-    # Create a dictionary specifying the full subfolder name for each condition 
-    # code
-    condition_folder_code_dict = {"NB": "noBarrierCondition",
-                                  "BABBLE": "babbleCondition",
-                                  "VOC": "vocoderCondition",
-                                  "L2": "L2Condition",
-                                  "READ_CO": "sentenceReadingCasual",
-                                  "READ_CL": "sentenceReadingClear"}
+    # Settings that affect the measures (for the journal and the result 
+    # cache)
+    settings = {"sr": sr,
+                "res_type": audio_io.res_type,
+                "whole_recording": whole_recording,
+                "multi_resolution": multi_resolution,
+                "n_fft": get_n_fft(mel_f),
+                "stft_backend": get_backend_name(stft_backend),
+                "dtype": str(np.dtype(dtype)),
+                "feature_store": None if feature_store is None else feature_store.get_version()}
     
-    # Create the Mel-frequency filter bank
-    mel_f = librosa.filters.mel(sr, n_fft = 2048, n_mels = 29, 
-                                fmin = 100.0, fmax = 6000.0, htk = True, norm = 1)
+    # Create the output array for the measures (one row per phone pair; one 
+    # column per measure, see measure_columns)
+    measures = np.full((nrow, len(measure_columns)), np.nan)
+    done = np.zeros(nrow, dtype = bool)
     
-    # Iterate over the phone pair _data
-    for index, row in phone_pairs_data.iterrows():
-        
-        # Get file name with WAV extension and check if it is NOT the same as 
-        # prev_filename_wav. If yes, load the sound file.
-        filename_wav = row["Filename_wav"]
-        condition_code = row["Condition"]
-        
-        if filename_wav != prev_filename_wav:
-            
-            # Get the full path to the sound file
-            condition_subfolder = condition_folder_code_dict[condition_code]
-            full_sound_file_path = os.path.join(sound_folders_dir,
-                                                condition_subfolder,
-                                                filename_wav)
-                
-            sound, _ = librosa.load(full_sound_file_path,
-                                     sr = sr)
-            
-            # Then let prev_filename_wav be filename_wav
-            prev_filename_wav = filename_wav
-            
-        # Now start the analysis. First create the Spectra objects for the 
-        # phone pair.
-        first_phone_ts = sound[int(row["First_phone_start_t"] * sr):
-            int(row["First_phone_end_t"] * sr)]
-        second_phone_ts = sound[int(row["Second_phone_start_t"] * sr):
-            int(row["Second_phone_end_t"] * sr)]
-        
-        # Spectral distance analyais:
-        ## Create Spectra objects for the first and second phones.
-        first_phone_spec = Spectra(first_phone_ts, sr, mel_f, step_size = 0.010)
-        second_phone_spec = Spectra(second_phone_ts, sr, mel_f, step_size = 0.010)
-        
-        ## Create a Coarticulation object using the two Spectra objects.
-        coar = Coarticulation(first_phone_spec, second_phone_spec)
-            
-        ## Get the spectral distance metric for the two phones.
-        spectral_distance = coar.spectral_dist()
-        
-        ## Add the distance data point to coart_data
-        coart_data.at[index, "Spectral_distance"] = spectral_distance
+    # Fill in the phone pairs that are in the result cache
+    result_cache = None
+    if result_cache_path is not None:
+        result_cache = ResultCache(result_cache_path, settings)
+        keys = result_cache.get_keys(
+                [os.path.join(sound_folders_dir,
+                              condition_folder_code_dict[condition_code],
+                              filename_wav)
+                 for condition_code, filename_wav in 
+                 zip(phone_pairs_data["Condition"], phone_pairs_data["Filename_wav"])],
+                phone_pairs_data[["First_phone_start_t", "First_phone_end_t",
+                                  "Second_phone_start_t", "Second_phone_end_t"]].values)
+        cached_positions, cached_measures = result_cache.get_measures(keys)
+        done[cached_positions] = True
+        measures[cached_positions] = cached_measures
+        result_cache.report()
+    
+    # Open the journal and fill in the phone pairs that are already done
+    journal = None
+    if checkpoint:
+        journal = MeasuresJournal(os.path.join(output_dir, "coart_data_journal.sqlite"),
+                                  phone_pairs_data,
+                                  settings,
+                                  checkpoint_interval = checkpoint_interval)
+        done_positions, done_measures = journal.get_measures()
+        done[done_positions] = True
+        measures[done_positions] = done_measures
+        print("\n{} of {} phone pairs already done".format(done.sum(), nrow))
+    
+    # The phone pairs to be added to the result cache afterwards
+    if result_cache is not None:
+        new_positions = np.setdiff1d(np.arange(nrow), cached_positions)
+    
+    try:
+        # Analyze the recordings in worker processes
+        if n_jobs > 1:
+            analyze_in_parallel(phone_pairs_data, measures, sound_folders_dir,
+                                condition_folder_code_dict, sr, mel_f,
+                                whole_recording = whole_recording,
+                                multi_resolution = multi_resolution,
+                                n_jobs = n_jobs,
+                                blas_threads = blas_threads,
+                                journal = journal,
+                                done = done,
+                                cache_dir = resample_cache_dir,
+                                spectra_options = spectra_options,
+                                feature_store = feature_store)
         
-        # Temporal transition analysis
-        ## Again, create Spectra objects for the first and second phones, but 
-        ## using a step size of 0.001.
-        first_phone_spec = Spectra(first_phone_ts, sr, mel_f, step_size = 0.001)
-        second_phone_spec = Spectra(second_phone_ts, sr, mel_f, step_size = 0.001)
+        else:
+            analyze_serially(phone_pairs_data, measures, sound_folders_dir,
+                             condition_folder_code_dict, sr, mel_f,
+                             whole_recording = whole_recording,
+                             multi_resolution = multi_resolution,
+                             journal = journal,
+                             done = done,
+                             cache_dir = resample_cache_dir,
+                             spectra_options = spectra_options,
+                             feature_store = feature_store,
+                             prefetch = prefetch,
+                             prefetch_memory = prefetch_memory)
+    
+    # Keep what has been done so far in the journal
+    except BaseException:
+        if journal is not None:
+            journal.close()
+        if result_cache is not None:
+            result_cache.close()
+        raise
+    
+    if result_cache is not None:
+        result_cache.add([keys[i] for i in new_positions], measures[new_positions])
+        result_cache.close()
+    
+    # Create a new copy of the original phone data with the measures
+    coart_data = phone_pairs_data.copy(deep = True)
+    for i, column in enumerate(measure_columns):
+        coart_data[column] = measures[:, i]
+    
+    # Finally, save the coarticulation data to the output directory
+    write_table(coart_data, get_table_path(output_dir, "coart_data", table_format))
+    if journal is not None:
+        journal.close(remove = True)
+    print("\nDone!")
+
+def analyze_serially(phone_pairs_data, measures, sound_folders_dir,
+                     condition_folder_code_dict, sr, mel_f,
+                     whole_recording = False, multi_resolution = False,
+                     journal = None, done = None, cache_dir = None,
+                     spectra_options = None, feature_store = None,
+                     prefetch = 2, prefetch_memory = 2 ** 30):
+    """
+    Gets the coarticulation measures of the phone pairs one recording at a 
+    time (see plan_recordings), loading each sound file once, and writes 
+    them to measures (in the order of phone_pairs_data). The sound files are 
+    loaded ahead in background threads (see audio_io.AudioPrefetcher), so 
+    that the analysis does not wait for them.
+    
+    phone_pairs_data:
+        Phone pair data.
+    measures:
+        Output array (one row per phone pair, one column per measure).
+    sound_folders_dir:
+        Directory of the sound files (one subfolder per condition).
+    condition_folder_code_dict:
+        Subfolder name for each condition code.
+    sr:
+        Sampling rate.
+    mel_f:
+        Mel-frequency filter bank.
+    whole_recording:
+        See analyze_coarticulation (default: False).
+    multi_resolution:
+        See analyze_coarticulation (default: False).
+    journal:
+        MeasuresJournal to record the measures in (default: None).
+    done:
+        Rows to skip (expects a boolean array; default: None).
+    cache_dir:
+        Directory of the cache of resampled recordings (default: None).
+    spectra_options:
+        Keyword arguments of the Spectra, e.g., backend and dtype (expects a 
+        dictionary; default: None).
+    feature_store:
+        FeatureStore to take the log spectra from (default: None).
+    prefetch:
+        Number of sound files loaded ahead (default: 2).
+    prefetch_memory:
+        Largest size of the sound files loaded ahead (in bytes; default: 
+        2 ** 30).
+    """
+    nrow = phone_pairs_data.shape[0]
+    if done is None:
+        done = np.zeros(nrow, dtype = bool)
+    bounds = get_sample_bounds(phone_pairs_data, sr)
+    
+    # One run per recording, whatever the order of the rows
+    runs = plan_recordings(phone_pairs_data, condition_folder_code_dict, done)
+    no_of_pairs = np.cumsum([len(positions) for _, positions in runs])
+    
+    # Load the sound files (only the parts around the phone pairs) in 
+    # background threads, a few runs ahead of the analysis
+    if feature_store is None:
+        sounds = AudioPrefetcher(load_recording,
+                                 [(os.path.join(sound_folders_dir, recording), sr, mel_f,
+                                   bounds[positions], cache_dir)
+                                  for recording, positions in runs],
+                                 estimate_recording_bytes,
+                                 depth = prefetch,
+                                 max_bytes = prefetch_memory)
+        sounds_iter = iter(sounds)
+    
+    # Iterate over the runs
+    for count, (recording, positions) in enumerate(runs):
         
-        ## Create a Coarticulation object using the two Spectra objects.
-        coar = Coarticulation(first_phone_spec, second_phone_spec)
+        # Get the measures of the phone pairs of this run from the log 
+        # spectra in the feature store
+        if feature_store is not None:
+            measures[positions] = get_stored_recording_measures(
+                    feature_store, recording, bounds[positions],
+                    multi_resolution = multi_resolution)
         
-        ## Get the transition duratiion metrics for the two phones.
-        try:
-            raw_trans_dur, relative_trans_dur = coar.temporal_trans()
+        # Or from the sound file
+        else:
+            measures[positions] = get_sound_measures(next(sounds_iter), sr, mel_f,
+                                                     bounds[positions],
+                                                     whole_recording = whole_recording,
+                                                     multi_resolution = multi_resolution,
+                                                     spectra_options = spectra_options)
         
-        except RuntimeWarning:
-            raw_trans_dur, relative_trans_dur = np.nan, np.nan
-            
-        ## Add the duration metrics to coart_data
-        coart_data.at[index, "Raw_transition_duration"] = raw_trans_dur
-        coart_data.at[index, "Relative_transition_duration"] = relative_trans_dur
+        if journal is not None:
+            journal.add(positions, measures[positions])
+            journal.end_recording()
         
         # Update progress
-        sys.stdout.write("\rProgress: {0}%".format(round((float(index) / nrow) * 100)))
+        sys.stdout.write("\rProgress: {0}%".format(round((float(no_of_pairs[count]) / no_of_pairs[-1]) * 100)))
         sys.stdout.flush()
     
-    # Finally, save the coarticulation data to the output directory
-    coart_data.to_excel(
-            os.path.join(output_dir, "coart_data.xlsx"),
-            index = False)
-    print("\nDone!")
+    if feature_store is None:
+        sounds.report()
+
+def plan_recordings(phone_pairs_data, condition_folder_code_dict, done = None):
+    """
+    Plans the analysis so that each recording is loaded once, even if the 
+    phone pair data were sorted or filtered (e.g., by keyword or speaker) so 
+    that the rows of a recording are not next to each other. Returns a list 
+    of (path of the sound file relative to the sound folders directory, row 
+    positions of its phone pairs), in the order of the first row of each 
+    recording, and prints how many loads this saves compared with loading a 
+    sound file whenever it differs from that of the previous row.
+    
+    phone_pairs_data:
+        Phone pair data.
+    condition_folder_code_dict:
+        Subfolder name for each condition code.
+    done:
+        Rows to skip (expects a boolean array; default: None).
+    """
+    if done is None:
+        done = np.zeros(phone_pairs_data.shape[0], dtype = bool)
+    
+    groups = phone_pairs_data.groupby(["Condition", "Filename_wav"],
+                                      sort = False, observed = True)
+    plan = []
+    for (condition_code, filename_wav), positions in groups.indices.items():
+        positions = positions[~done[positions]]
+        if len(positions) > 0:
+            plan.append((os.path.join(condition_folder_code_dict[condition_code],
+                                      filename_wav),
+                         positions))
+    
+    # Number of loads in the order of the rows: one per run of consecutive 
+    # rows (that are not done) of the same recording
+    recording_codes = groups.ngroup().values[~done]
+    no_of_row_order_loads = int(len(recording_codes) > 0) + \
+        int(np.count_nonzero(recording_codes[1:] != recording_codes[:-1]))
+    print("\n{} recordings to load ({} saved compared with the order of the "
+          "rows)".format(len(plan), no_of_row_order_loads - len(plan)))
+    return plan
+
+def load_recording(full_sound_file_path, sr, mel_f, bounds, cache_dir = None):
+    """
+    Loads the parts of a sound file that the analysis of some of its phone 
+    pairs needs: the phone pairs plus the STFT window (n_fft samples) on 
+    either side. If the file is not at the sampling rate sr, the whole file 
+    is resampled instead (or taken from the cache in cache_dir).
+    
+    full_sound_file_path:
+        Path to the sound file.
+    sr:
+        Sampling rate.
+    mel_f:
+        Mel-frequency filter bank.
+    bounds:
+        Start and end samples of the phone pairs (see get_sample_bounds).
+    cache_dir:
+        Directory of the cache of resampled recordings (default: None).
+    """
+    return load_audio(full_sound_file_path, sr,
+                      regions = bounds[:, [0, 3]],
+                      margin = get_n_fft(mel_f),
+                      cache_dir = cache_dir)
+
+def estimate_recording_bytes(full_sound_file_path, sr, mel_f, bounds, cache_dir = None):
+    """ Estimates the size (in bytes) of the time series that load_recording 
+    gives for the same arguments (see audio_io.estimate_audio_bytes), for 
+    the memory budget of the prefetching. """
+    return estimate_audio_bytes(full_sound_file_path, sr,
+                                regions = bounds[:, [0, 3]],
+                                margin = get_n_fft(mel_f))
+
+def get_analysis_n_fft(sr, n_fft = None):
+    """
+    Gets the FFT size for the analysis at the sampling rate sr: by default 
+    the smallest power of two of at least the 0.0256 s window, i.e., 2048 at 
+    44100 Hz and 512 at 16000 Hz. Sizing it from the window rather than from 
+    the frequency resolution at 44100 Hz keeps it to the same duration or 
+    shorter, so a phone that is long enough for the STFT at 44100 Hz is long 
+    enough at a lower rate too.
+    
+    sr:
+        Sampling rate.
+    n_fft:
+        FFT size or "auto" to use instead (see 
+        coarticulation_classes.get_fft_size) (default: None).
+    """
+    if n_fft is not None:
+        return get_fft_size(sr, 0.0256, n_fft)
+    return int(2 ** np.ceil(np.log2(int(sr * 0.0256))))
+
+def compare_measures(reference_dir, other_dir):
+    """
+    Compares two coart_data files (e.g., the output of a run at a reduced 
+    sampling rate against a 44100 Hz run) and prints, for each measure, the 
+    correlation between the two runs, the median and maximum absolute 
+    difference and the median relative difference. Returns the summary as 
+    a dataframe.
+    
+    reference_dir:
+        Path to the reference coart_data file.
+    other_dir:
+        Path to the coart_data file to be checked.
+    """
+    reference = read_table(reference_dir)
+    other = read_table(other_dir)
+    
+    summary = pd.DataFrame(index = measure_columns,
+                           columns = ["Correlation", "Median_abs_diff",
+                                      "Max_abs_diff", "Median_rel_diff"],
+                           dtype = float)
+    for column in measure_columns:
+        x = reference[column].values
+        y = other[column].values
+        both = ~np.isnan(x) & ~np.isnan(y)
+        diff = np.abs(x[both] - y[both])
+        summary.loc[column] = [np.corrcoef(x[both], y[both])[0, 1],
+                               np.median(diff),
+                               np.max(diff),
+                               np.median(diff[x[both] != 0] / np.abs(x[both][x[both] != 0]))]
+    
+    print("\nComparison of {} against {}:".format(other_dir, reference_dir))
+    print(summary)
+    return summary
+
+def get_sample_bounds(phone_pairs_data, sr):
+    """
+    Gets the start and end samples of the first and second phones of each 
+    phone pair (an array with one row per phone pair), i.e., 
+    int(time * sr) for each of the time columns.
+    
+    phone_pairs_data:
+        Phone pair data.
+    sr:
+        Sampling rate.
+    """
+    times = phone_pairs_data[["First_phone_start_t", "First_phone_end_t",
+                              "Second_phone_start_t", "Second_phone_end_t"]]
+    return (times.values.astype(float) * sr).astype(int)
+
+def get_pair_measures(first_phone_ts, second_phone_ts, sr, mel_f,
+                      multi_resolution = False, spectra_options = None):
+    """
+    Gets the spectral distance and the raw and relative transition durations 
+    of a phone pair.
+    
+    first_phone_ts:
+        Time series of the first phone.
+    second_phone_ts:
+        Time series of the second phone.
+    sr:
+        Sampling rate.
+    mel_f:
+        Mel-frequency filter bank.
+    multi_resolution:
+        Compute the spectra at the 0.001 step size only and decimate them to 
+        0.010 for the spectral distance, instead of running a second STFT 
+        (default: False). See check_multi_resolution.
+    spectra_options:
+        Keyword arguments of the Spectra, e.g., backend and dtype (expects a 
+        dictionary; default: None).
+    """
+    if spectra_options is None:
+        spectra_options = {}
+    
+    # Temporal transition analysis
+    ## Create Spectra objects for the first and second phones using a step 
+    ## size of 0.001.
+    first_phone_spec = Spectra(first_phone_ts, sr, mel_f, step_size = 0.001,
+                               **spectra_options)
+    second_phone_spec = Spectra(second_phone_ts, sr, mel_f, step_size = 0.001,
+                                **spectra_options)
+    
+    ## Create a Coarticulation object using the two Spectra objects.
+    coar = Coarticulation(first_phone_spec, second_phone_spec)
+    
+    ## Get the transition duratiion metrics for the two phones.
+    try:
+        raw_trans_dur, relative_trans_dur = coar.temporal_trans()
+    
+    except RuntimeWarning:
+        raw_trans_dur, relative_trans_dur = np.nan, np.nan
+    
+    # Spectral distance analyais:
+    ## Again, create Spectra objects for the first and second phones, but 
+    ## using a step size of 0.010 (or decimate the ones above to it).
+    if multi_resolution:
+        first_phone_spec = first_phone_spec.decimate(0.010)
+        second_phone_spec = second_phone_spec.decimate(0.010)
+    
+    else:
+        first_phone_spec = Spectra(first_phone_ts, sr, mel_f, step_size = 0.010,
+                                   **spectra_options)
+        second_phone_spec = Spectra(second_phone_ts, sr, mel_f, step_size = 0.010,
+                                    **spectra_options)
+    
+    ## Get the spectral distance metric for the two phones.
+    spectral_distance = Coarticulation(first_phone_spec,
+                                       second_phone_spec).spectral_dist()
+    
+    return spectral_distance, raw_trans_dur, relative_trans_dur
+
+def check_multi_resolution(sound, sr, mel_f, bounds, tolerance = 0.05):
+    """
+    Compares the spectral distances of the multi-resolution mode (0.001 
+    frames decimated to 0.010) against the two-pass output for some phone 
+    pairs of a recording. At 44100 Hz the hops are 441 and 44 samples, so 
+    each decimated frame is off by at most 22 samples (0.5 ms) from the 
+    frame of the two-pass output, and the relative deviation of the spectral 
+    distance is expected to stay within a few percent; the transition 
+    durations do not change. Prints the deviations and returns True if the 
+    largest relative deviation is within the tolerance.
+    
+    sound:
+        Time series of the recording.
+    sr:
+        Sampling rate.
+    mel_f:
+        Mel-frequency filter bank.
+    bounds:
+        Start and end samples of the phone pairs (see get_sample_bounds).
+    tolerance:
+        Largest acceptable relative deviation (default: 0.05).
+    """
+    deviations = []
+    for first_start, first_end, second_start, second_end in bounds:
+        first_phone_ts = sound[first_start:first_end]
+        second_phone_ts = sound[second_start:second_end]
+        two_pass, _, _ = get_pair_measures(first_phone_ts, second_phone_ts,
+                                           sr, mel_f)
+        single_pass, _, _ = get_pair_measures(first_phone_ts, second_phone_ts,
+                                              sr, mel_f, multi_resolution = True)
+        deviations.append(abs(single_pass - two_pass) / two_pass)
+    
+    print("\nRelative deviation of the spectral distance (multi-resolution vs. two-pass):")
+    print("Median:", np.median(deviations))
+    print("Max:", np.max(deviations))
+    return np.max(deviations) <= tolerance
+
+def check_whole_recording(sound, sr, mel_f, bounds, tolerance = 0.10,
+                          multi_resolution = False, spectra_options = None):
+    """
+    Compares the measures of the whole-recording mode (see the
+    whole_recording of analyze_coarticulation) against the per-pair output
+    for some phone pairs of a recording. The frames of a phone in the
+    spectrogram of the recording start at the frame nearest to its first
+    sample (up to half a hop, 5 ms at the 0.010 step size, away from it),
+    and its first and last frames see the neighbouring audio where the
+    per-pair STFT sees zero padding. So the measures of a phone pair are
+    not those of the per-pair analysis: on synthetic recordings the spectral
+    distance moved by a median of about 8% (up to 60% for the shortest
+    phones) and the relative transition duration by up to a few times its
+    per-pair value. Prints the median and maximum relative deviation of
+    each measure and the number of pairs whose transition could be measured
+    in one mode but not in the other, and returns True if the median
+    relative deviation of both measures is within the tolerance.
+
+    sound:
+        Time series of the recording.
+    sr:
+        Sampling rate.
+    mel_f:
+        Mel-frequency filter bank.
+    bounds:
+        Start and end samples of the phone pairs (see get_sample_bounds).
+    tolerance:
+        Largest acceptable median relative deviation (default: 0.10).
+    multi_resolution:
+        See analyze_coarticulation (default: False).
+    spectra_options:
+        Keyword arguments of the Spectra, e.g., backend and dtype (expects a
+        dictionary; default: None).
+    """
+    per_pair = get_sound_measures(sound, sr, mel_f, bounds,
+                                  multi_resolution = multi_resolution,
+                                  spectra_options = spectra_options)
+    whole = get_recording_measures(sound, sr, mel_f, bounds,
+                                   multi_resolution = multi_resolution,
+                                   spectra_options = spectra_options)
+
+    report = pd.DataFrame(index = ["Spectral_distance", "Relative_transition_duration"],
+                          columns = ["Median_rel_diff", "Max_rel_diff", "NaN_mismatches"],
+                          dtype = float)
+    for column in report.index:
+        x = per_pair[:, measure_columns.index(column)]
+        y = whole[:, measure_columns.index(column)]
+        both = ~np.isnan(x) & ~np.isnan(y) & (x != 0)
+        deviations = np.abs(x[both] - y[both]) / np.abs(x[both])
+        report.loc[column] = [np.median(deviations) if len(deviations) else 0.0,
+                              np.max(deviations, initial = 0.0),
+                              np.count_nonzero(np.isnan(x) != np.isnan(y))]
+
+    print("\nRelative deviation of the measures (whole recording vs. per pair, "
+          "{} phone pairs):".format(bounds.shape[0]))
+    print(report)
+    return bool(np.all(report["Median_rel_diff"] <= tolerance))
+
+def check_dtype(sound, sr, mel_f, bounds, dtype = np.float32):
+    """
+    Compares the spectral distance and the relative transition duration of 
+    the analysis in a lower precision (see the dtype of 
+    analyze_coarticulation) against the float64 analysis for some phone 
+    pairs of a recording. Prints the largest absolute and relative 
+    deviation of each measure, and the number of pairs whose transition 
+    could be measured in one precision but not in the other, and returns 
+    them as a dataframe.
+    
+    sound:
+        Time series of the recording.
+    sr:
+        Sampling rate.
+    mel_f:
+        Mel-frequency filter bank.
+    bounds:
+        Start and end samples of the phone pairs (see get_sample_bounds).
+    dtype:
+        Precision to be checked (default: np.float32).
+    """
+    reference = np.empty((bounds.shape[0], len(measure_columns)))
+    other = np.empty((bounds.shape[0], len(measure_columns)))
+    for i, (first_start, first_end, second_start, second_end) in enumerate(bounds):
+        first_phone_ts = sound[first_start:first_end]
+        second_phone_ts = sound[second_start:second_end]
+        reference[i] = get_pair_measures(first_phone_ts, second_phone_ts, sr, mel_f)
+        other[i] = get_pair_measures(first_phone_ts, second_phone_ts, sr, mel_f,
+                                     spectra_options = {"dtype": dtype})
+    
+    report = pd.DataFrame(index = ["Spectral_distance", "Relative_transition_duration"],
+                          columns = ["Max_abs_diff", "Max_rel_diff", "NaN_mismatches"],
+                          dtype = float)
+    for column in report.index:
+        x = reference[:, measure_columns.index(column)]
+        y = other[:, measure_columns.index(column)]
+        both = ~np.isnan(x) & ~np.isnan(y)
+        diff = np.abs(x[both] - y[both])
+        nonzero = x[both] != 0
+        report.loc[column] = [np.max(diff, initial = 0.0),
+                              np.max(diff[nonzero] / np.abs(x[both][nonzero]), initial = 0.0),
+                              np.count_nonzero(np.isnan(x) != np.isnan(y))]
+    
+    print("\nDeviation of the {} analysis from the float64 analysis ({} phone pairs):".format(
+            np.dtype(dtype), bounds.shape[0]))
+    print(report)
+    return report
+
+def get_recording_measures(sound, sr, mel_f, bounds, multi_resolution = False,
+                           spectra_options = None):
+    """
+    Gets the coarticulation measures of all phone pairs of one recording from 
+    spectrograms of the whole recording (computed only around the pairs). 
+    Returns an array with one row per phone pair and one column per measure.
+    
+    sound:
+        Time series of the recording.
+    sr:
+        Sampling rate.
+    mel_f:
+        Mel-frequency filter bank.
+    bounds:
+        Start and end samples of the phone pairs (see get_sample_bounds).
+    multi_resolution:
+        Decimate the 0.001 spectrogram for the spectral distance instead of 
+        computing a 0.010 one (default: False).
+    spectra_options:
+        Keyword arguments of the Spectra, e.g., backend and dtype (expects a 
+        dictionary; default: None).
+    """
+    if spectra_options is None:
+        spectra_options = {}
+    first_bounds = bounds[:, 0:2]
+    second_bounds = bounds[:, 2:4]
+    
+    # Only the frames around the phone pairs are computed
+    regions = np.column_stack((first_bounds[:, 0], second_bounds[:, 1]))
+    temporal_recording = RecordingSpectra(sound, sr, mel_f, step_size = 0.001,
+                                          regions = regions, **spectra_options)
+    if multi_resolution:
+        measures = recording_pair_measures(temporal_recording, temporal_recording,
+                                           first_bounds, second_bounds,
+                                           spectral_step_size = 0.010)
+    else:
+        spectral_recording = RecordingSpectra(sound, sr, mel_f, step_size = 0.010,
+                                              regions = regions, **spectra_options)
+        measures = recording_pair_measures(spectral_recording, temporal_recording,
+                                           first_bounds, second_bounds)
+    return np.column_stack(measures)
+
+def get_stored_recording_measures(feature_store, recording, bounds,
+                                  multi_resolution = False):
+    """
+    Gets the coarticulation measures of all phone pairs of one recording 
+    from the log spectra of a feature store (like get_recording_measures, 
+    without loading the recording). Returns an array with one row per phone 
+    pair and one column per measure.
+    
+    feature_store:
+        A FeatureStore.
+    recording:
+        Path of the sound file relative to the sound folders directory.
+    bounds:
+        Start and end samples of the phone pairs (see get_sample_bounds).
+    multi_resolution:
+        Decimate the 0.001 log spectra for the spectral distance instead of 
+        using the 0.010 ones (default: False).
+    """
+    first_bounds = bounds[:, 0:2]
+    second_bounds = bounds[:, 2:4]
+    temporal_recording = feature_store.get_recording(recording, 0.001)
+    if multi_resolution:
+        measures = recording_pair_measures(temporal_recording, temporal_recording,
+                                           first_bounds, second_bounds,
+                                           spectral_step_size = 0.010)
+    else:
+        spectral_recording = feature_store.get_recording(recording, 0.010)
+        measures = recording_pair_measures(spectral_recording, temporal_recording,
+                                           first_bounds, second_bounds)
+    return np.column_stack(measures)
+
+def analyze_in_parallel(phone_pairs_data, measures, sound_folders_dir,
+                        condition_folder_code_dict, sr, mel_f,
+                        whole_recording = False, multi_resolution = False,
+                        n_jobs = 2, blas_threads = 1, journal = None,
+                        done = None, cache_dir = None,
+                        spectra_options = None, feature_store = None):
+    """
+    Gets the coarticulation measures with one task per recording in a pool 
+    of worker processes and writes them to measures (in the order of 
+    phone_pairs_data).
+    
+    phone_pairs_data:
+        Phone pair data.
+    measures:
+        Output array (one row per phone pair, one column per measure).
+    sound_folders_dir:
+        Directory of the sound files (one subfolder per condition).
+    condition_folder_code_dict:
+        Subfolder name for each condition code.
+    sr:
+        Sampling rate.
+    mel_f:
+        Mel-frequency filter bank.
+    whole_recording:
+        See analyze_coarticulation (default: False).
+    multi_resolution:
+        See analyze_coarticulation (default: False).
+    n_jobs:
+        Number of worker processes (default: 2).
+    blas_threads:
+        Number of BLAS/OpenMP threads per worker process (default: 1).
+    journal:
+        MeasuresJournal to record the measures in (default: None).
+    done:
+        Rows to skip (expects a boolean array; default: None).
+    cache_dir:
+        Directory of the cache of resampled recordings (default: None).
+    spectra_options:
+        Keyword arguments of the Spectra, e.g., backend and dtype (expects a 
+        dictionary; default: None).
+    feature_store:
+        FeatureStore to take the log spectra from (default: None).
+    """
+    bounds = get_sample_bounds(phone_pairs_data, sr)
+    
+    with ProcessPoolExecutor(max_workers = n_jobs,
+                             initializer = _init_worker,
+                             initargs = (blas_threads,)) as executor:
+        futures = {}
+        for recording, positions in plan_recordings(phone_pairs_data,
+                                                    condition_folder_code_dict,
+                                                    done):
+            if feature_store is not None:
+                future = executor.submit(get_stored_recording_measures,
+                                         feature_store,
+                                         recording,
+                                         bounds[positions],
+                                         multi_resolution = multi_resolution)
+            else:
+                future = executor.submit(analyze_recording,
+                                         os.path.join(sound_folders_dir, recording),
+                                         bounds[positions],
+                                         sr, mel_f,
+                                         whole_recording = whole_recording,
+                                         multi_resolution = multi_resolution,
+                                         cache_dir = cache_dir,
+                                         spectra_options = spectra_options)
+            futures[future] = positions
+        
+        # Put the results of each recording back at its rows. If a recording 
+        # fails, the other ones are still finished (and journaled) before the 
+        # error is raised.
+        errors = []
+        for count, future in enumerate(as_completed(futures)):
+            try:
+                measures[futures[future]] = future.result()
+            
+            except Exception as error:
+                errors.append(error)
+                continue
+            
+            if journal is not None:
+                journal.add(futures[future], measures[futures[future]])
+                journal.end_recording()
+            
+            # Update progress
+            sys.stdout.write("\rProgress: {0}%".format(round((float(count + 1) / len(futures)) * 100)))
+            sys.stdout.flush()
+    
+    if errors:
+        raise errors[0]
+
+def analyze_recording(full_sound_file_path, bounds, sr, mel_f,
+                      whole_recording = False, multi_resolution = False,
+                      cache_dir = None, spectra_options = None):
+    """
+    Loads a recording and gets the coarticulation measures of its phone 
+    pairs. Returns an array with one row per phone pair and columns for the 
+    spectral distance and the raw and relative transition durations.
+    
+    full_sound_file_path:
+        Path to the sound file.
+    bounds:
+        Start and end samples of the phone pairs (see get_sample_bounds).
+    sr:
+        Sampling rate.
+    mel_f:
+        Mel-frequency filter bank.
+    whole_recording:
+        See analyze_coarticulation (default: False).
+    multi_resolution:
+        See analyze_coarticulation (default: False).
+    cache_dir:
+        Directory of the cache of resampled recordings (default: None).
+    spectra_options:
+        Keyword arguments of the Spectra, e.g., backend and dtype (expects a 
+        dictionary; default: None).
+    """
+    sound = load_recording(full_sound_file_path, sr, mel_f, bounds,
+                           cache_dir = cache_dir)
+    return get_sound_measures(sound, sr, mel_f, bounds,
+                              whole_recording = whole_recording,
+                              multi_resolution = multi_resolution,
+                              spectra_options = spectra_options)
+
+def get_sound_measures(sound, sr, mel_f, bounds, whole_recording = False,
+                       multi_resolution = False, spectra_options = None):
+    """
+    Gets the coarticulation measures of the phone pairs of a loaded 
+    recording (see analyze_recording).
+    
+    sound:
+        Time series of the recording.
+    sr:
+        Sampling rate.
+    mel_f:
+        Mel-frequency filter bank.
+    bounds:
+        Start and end samples of the phone pairs (see get_sample_bounds).
+    whole_recording:
+        See analyze_coarticulation (default: False).
+    multi_resolution:
+        See analyze_coarticulation (default: False).
+    spectra_options:
+        Keyword arguments of the Spectra, e.g., backend and dtype (expects a 
+        dictionary; default: None).
+    """
+    if whole_recording:
+        return get_recording_measures(sound, sr, mel_f, bounds,
+                                      multi_resolution = multi_resolution,
+                                      spectra_options = spectra_options)
+    
+    measures = np.empty((bounds.shape[0], len(measure_columns)))
+    for i, (first_start, first_end, second_start, second_end) in enumerate(bounds):
+        first_phone_ts = sound[first_start:first_end]
+        second_phone_ts = sound[second_start:second_end]
+        measures[i] = get_pair_measures(first_phone_ts, second_phone_ts, sr,
+                                        mel_f, multi_resolution = multi_resolution,
+                                        spectra_options = spectra_options)
+    return measures
+
+# Keeps the thread limits of a worker process in place
+_thread_limits = None
+
+def _init_worker(blas_threads):
+    """ Limits the BLAS/OpenMP threads of a worker process. """
+    global _thread_limits
+    for var in ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS"]:
+        os.environ[var] = str(blas_threads)
+    
+    # numpy is already loaded at this point, so the variables above only 
+    # reach libraries loaded later; threadpoolctl (installed with 
+    # scikit-learn, which librosa depends on) changes the loaded ones.
+    try:
+        from threadpoolctl import threadpool_limits
+        _thread_limits = threadpool_limits(limits = blas_threads)
+    
+    except ImportError:
+        pass
 
 if __name__ == "__main__":
     sound_folders_dir = "/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/recordings/channels separated"
-    phone_pairs_data_dir = "/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/recordings/phone_pairs_data.xlsx"
+    phone_pairs_data_dir = "/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/recordings/phone_pairs_data.parquet"
     output_dir = "/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/recordings"
     analyze_coarticulation(sound_folders_dir,
                            phone_pairs_data_dir,
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 15:20:37 2026
+
+@author: adamguo
+
+Reading the parts of a recording that an analysis needs, instead of decoding
+(and possibly resampling) the whole file.
+"""
+import os, time, hashlib, tempfile, librosa
+import numpy as np
+import soundfile as sf
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Resampler of the sound files that are not at the sampling rate of the
+# analysis (see librosa.resample), the same whether or not the resampled time
+# series are cached, so that both give the same measures
+res_type = "soxr_hq"
+
+class SegmentedAudio:
+    def __init__(self, segments, starts, no_of_samples):
+        """
+        Some parts of a recording. Slices of it work like slices of the full
+        time series (sound[start:end], with sample indices of the full
+        recording), as long as they fall inside a part that was read.
+
+        segments:
+            Time series of the parts (expects a list of arrays).
+        starts:
+            Index of the first sample of each part in the recording (sorted).
+        no_of_samples:
+            Number of samples in the whole recording.
+        """
+        self.segments = segments
+        self.starts = np.asarray(starts)
+        self.ends = self.starts + np.array([len(segment) for segment in segments])
+        self.no_of_samples = no_of_samples
+
+    def __len__(self):
+        return self.no_of_samples
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError("SegmentedAudio only supports slices with a step of 1")
+        start, stop, _ = key.indices(self.no_of_samples)
+        stop = max(start, stop)
+
+        # Find the part that contains the slice
+        i = np.searchsorted(self.starts, start, side = "right") - 1
+        if i < 0 or stop > self.ends[i]:
+            raise IndexError("Samples {} to {} were not read".format(start, stop))
+        return self.segments[i][start - self.starts[i]:stop - self.starts[i]]
+
+class AudioPrefetcher:
+    def __init__(self, load, tasks, estimate_size, depth = 2, max_bytes = 2 ** 30):
+        """
+        Loads sound files in background threads ahead of the loop that uses
+        them. Iterating over an AudioPrefetcher gives load(*task) for each
+        task, in order, while the next tasks are loaded: up to depth of them,
+        as long as the estimated sizes of the sound files being held do not
+        exceed max_bytes (the next sound file is always loaded, whatever its
+        size). The size of a sound file is only estimated when it is about to
+        be loaded, so that no pass over the metadata of all the files delays
+        the first one. The time the loop waited for a sound file is kept in
+        wait_time (see report).
+
+        load:
+            Function that loads a sound file (e.g., load_audio).
+        tasks:
+            Arguments of load for each sound file (expects a list of tuples).
+        estimate_size:
+            Function that estimates the size (in bytes) of the time series
+            that load gives for a task, called with the same arguments (see
+            estimate_audio_bytes).
+        depth:
+            Number of sound files loaded ahead (default: 2; 0 to load each
+            one when it is needed).
+        max_bytes:
+            Largest total estimated size of the sound files loaded ahead (in
+            bytes; default: 2 ** 30, 1 GiB).
+        """
+        self.load = load
+        self.tasks = tasks
+        self.estimate_size = estimate_size
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.wait_time = 0.0
+        self.load_time = 0.0
+        self.no_of_loads = 0
+
+    def __iter__(self):
+        if self.depth <= 0:
+            for task in self.tasks:
+                sound, load_time = self._timed_load(task)
+                self.wait_time += load_time
+                self.load_time += load_time
+                self.no_of_loads += 1
+                yield sound
+            return
+
+        executor = ThreadPoolExecutor(max_workers = self.depth)
+        pending = deque()
+        pending_bytes = 0
+        next_task = 0
+        next_size = None
+        try:
+            for _ in range(len(self.tasks)):
+
+                # Submit the next tasks while they fit in the budget (the
+                # one that is needed next always does)
+                while next_task < len(self.tasks) and len(pending) <= self.depth:
+                    if next_size is None:
+                        next_size = self.estimate_size(*self.tasks[next_task])
+                    if pending and pending_bytes + next_size > self.max_bytes:
+                        break
+                    pending.append((executor.submit(self._timed_load, self.tasks[next_task]),
+                                    next_size))
+                    pending_bytes += next_size
+                    next_task += 1
+                    next_size = None
+
+                future, size = pending.popleft()
+                start = time.perf_counter()
+                sound, load_time = future.result()
+                self.wait_time += time.perf_counter() - start
+                self.load_time += load_time
+                self.no_of_loads += 1
+                pending_bytes -= size
+                yield sound
+        finally:
+            executor.shutdown(wait = False, cancel_futures = True)
+
+    def _timed_load(self, task):
+        """ Loads a sound file and times it. """
+        start = time.perf_counter()
+        sound = self.load(*task)
+        return sound, time.perf_counter() - start
+
+    def report(self):
+        """ Prints how long the loop waited for the sound files, and how
+        long loading them took. """
+        print("\nAudio loading: {} sound files in {:.2f} s, of which the analysis "
+              "waited {:.2f} s".format(self.no_of_loads, self.load_time, self.wait_time))
+
+def estimate_audio_bytes(path, sr, regions = None, margin = 0):
+    """
+    Estimates the size (in bytes) of the time series that load_audio gives
+    for a sound file: the regions widened by margin if the file is at sr,
+    and otherwise the whole file at sr. Files that soundfile cannot read are
+    estimated by their size on disk.
+
+    path:
+        Path to the sound file.
+    sr:
+        Sampling rate.
+    regions:
+        Sample ranges that will be used (expects an array of [start, end)
+        rows; default: None, i.e., the whole file).
+    margin:
+        Number of samples read before and after each region (default: 0).
+    """
+    try:
+        info = sf.info(path)
+    except RuntimeError:
+        return os.path.getsize(path)
+
+    if regions is not None and info.samplerate == sr:
+        regions = np.asarray(regions, dtype = int).reshape(-1, 2)
+        no_of_samples = min(int(np.sum(regions[:, 1] - regions[:, 0] + 2 * margin)),
+                            info.frames)
+    else:
+        no_of_samples = int(np.ceil(info.frames * sr / info.samplerate))
+    return no_of_samples * np.dtype(np.float32).itemsize
+
+def load_audio(path, sr, regions = None, margin = 0, merge_gap = None,
+               cache_dir = None):
+    """
+    Loads a sound file as a mono float32 time series at the sampling rate sr,
+    like librosa.load. If regions is given and the file is already at sr,
+    only those sample ranges are read (with seeks, and no resampling) and a
+    SegmentedAudio is returned. If the file has to be resampled and cache_dir
+    is given, the resampled time series comes from the cache (see
+    load_resampled). Otherwise the whole file is loaded with librosa.load
+    (resampled with res_type).
+
+    path:
+        Path to the sound file.
+    sr:
+        Sampling rate.
+    regions:
+        Sample ranges that will be used (expects an array of [start, end)
+        rows; default: None, i.e., the whole file).
+    margin:
+        Number of samples to read before and after each region (default: 0).
+    merge_gap:
+        Regions that are fewer than this many samples apart are read in one
+        go (default: None, i.e., sr, one second).
+    cache_dir:
+        Directory of the cache of resampled time series (default: None, i.e.,
+        no cache).
+    """
+    if regions is not None or cache_dir is not None:
+        try:
+            with sf.SoundFile(path) as sound_file:
+                native_sr = sound_file.samplerate
+                if native_sr == sr and regions is not None:
+                    return read_regions(sound_file, regions, margin = margin,
+                                        merge_gap = sr if merge_gap is None else merge_gap)
+
+            if native_sr != sr and cache_dir is not None:
+                return load_resampled(path, sr, cache_dir)
+
+        # Formats that soundfile cannot read are left to librosa
+        except RuntimeError:
+            pass
+
+    sound, _ = librosa.load(path, sr = sr, res_type = res_type)
+    return sound
+
+def load_resampled(path, sr, cache_dir):
+    """
+    Loads a sound file resampled to sr (mono, float32) from a cache of
+    resampled time series. The cache holds one .npy file per sound file,
+    sampling rate and resampler, named after the SHA-1 of the sound file's
+    contents, so an edited recording gets a new entry. On a miss the file is
+    resampled with librosa.load (with res_type, as without the cache) and
+    saved. The time series is
+    memory-mapped, so only the slices that are used get read.
+
+    path:
+        Path to the sound file.
+    sr:
+        Sampling rate.
+    cache_dir:
+        Directory of the cache.
+    """
+    file_hash = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            file_hash.update(chunk)
+    cache_path = os.path.join(cache_dir, "{}_{}_{}.npy".format(file_hash.hexdigest(), sr,
+                                                             res_type))
+
+    if not os.path.exists(cache_path):
+        sound, _ = librosa.load(path, sr = sr, res_type = res_type)
+
+        # Write to a temporary file first, so that other processes never see
+        # a partly written entry
+        os.makedirs(cache_dir, exist_ok = True)
+        fd, tmp_path = tempfile.mkstemp(dir = cache_dir, suffix = ".npy")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, sound)
+        os.replace(tmp_path, cache_path)
+
+    return np.load(cache_path, mmap_mode = "r")
+
+def read_regions(sound_file, regions, margin = 0, merge_gap = 0):
+    """
+    Reads sample ranges of an open sound file into a SegmentedAudio. The
+    ranges are widened by margin, clipped to the file, and merged when they
+    overlap or are fewer than merge_gap samples apart.
+
+    sound_file:
+        A soundfile.SoundFile object.
+    regions:
+        Sample ranges (expects an array of [start, end) rows).
+    margin:
+        Number of samples to read before and after each region (default: 0).
+    merge_gap:
+        Largest gap between two regions that are read together (default: 0).
+    """
+    no_of_samples = sound_file.frames
+    regions = np.asarray(regions, dtype = int).reshape(-1, 2)
+    regions = regions[np.argsort(regions[:, 0], kind = "stable")]
+    starts = np.clip(regions[:, 0] - margin, 0, no_of_samples)
+    ends = np.clip(regions[:, 1] + margin, 0, no_of_samples)
+
+    # Merge the regions: a new merged region starts wherever a region starts
+    # more than merge_gap after the end of all regions before it.
+    ends = np.maximum.accumulate(ends)
+    new_region = np.concatenate(([True], starts[1:] - ends[:-1] > merge_gap))
+    merged_starts = starts[new_region]
+    merged_ends = ends[np.append(np.flatnonzero(new_region)[1:] - 1, len(ends) - 1)]
+
+    segments = []
+    for start, end in zip(merged_starts, merged_ends):
+        sound_file.seek(start)
+        data = sound_file.read(end - start, dtype = "float32", always_2d = True)
+
+        # Mix down to mono like librosa.load
+        if data.shape[1] == 1:
+            segments.append(data[:, 0])
+        else:
+            segments.append(np.mean(data, axis = 1))
+
+    return SegmentedAudio(segments, merged_starts, no_of_samples)
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 14:02:11 2026
+
+@author: adamguo
+
+Benchmarks for the analysis scripts (run with synthetic data, so that they do
+not need the LUCID recordings).
+"""
+import os, sys, io, time, functools, warnings, contextlib
+import pandas as pd
+import numpy as np
+from unittest import mock
+import analyze_coarticulation
+from analyze_coarticulation import get_sample_bounds, measure_columns, \
+    plan_recordings, get_sound_measures, condition_folder_code_dict
+from filter_banks import get_mel_filter_bank
+from coarticulation_classes import Spectra, get_fft_size, get_n_fft, \
+    scipy_stft_magnitude
+from get_files_metadata import file_metadata_columns
+
+def make_phone_pairs_data(n_pairs = 100000, n_files = 200, seed = 0):
+    """
+    Creates a synthetic phone pair dataframe with the columns that the
+    analysis reads.
+
+    n_pairs:
+        Number of phone pairs (default: 100000).
+    n_files:
+        Number of sound files (default: 200).
+    seed:
+        Seed of the random number generator (default: 0).
+    """
+    rng = np.random.default_rng(seed)
+    first_phone_start_t = np.round(rng.uniform(0.5, 600.0, n_pairs), 3)
+    first_phone_end_t = np.round(first_phone_start_t + rng.uniform(0.03, 0.2, n_pairs), 3)
+    second_phone_end_t = np.round(first_phone_end_t + rng.uniform(0.03, 0.2, n_pairs), 3)
+    return pd.DataFrame({"Filename_wav": ["file{}.wav".format(i) for i in
+                                         np.sort(rng.integers(0, n_files, n_pairs))],
+                         "Condition": "NB",
+                         "First_phone_start_t": first_phone_start_t,
+                         "First_phone_end_t": first_phone_end_t,
+                         "Second_phone_start_t": first_phone_end_t,
+                         "Second_phone_end_t": second_phone_end_t})
+
+def benchmark_driver_overhead(n_pairs = 100000, sr = 44100):
+    """
+    Times the per-pair bookkeeping of the analyze_coarticulation driver,
+    without the spectral analysis itself (get_pair_measures is replaced by a
+    stub that returns three numbers, and loading a sound file by a lookup):
+    the loop of the original driver (iterrows, a check of the file name of
+    each row, DataFrame.at writes and a progress update per pair), copied
+    as it was, against the current one (get_sample_bounds, plan_recordings
+    and get_sound_measures, writing to a preallocated array). The progress
+    updates are timed but not printed.
+
+    n_pairs:
+        Number of phone pairs (default: 100000).
+    sr:
+        Sampling rate (default: 44100).
+    """
+    phone_pairs_data = make_phone_pairs_data(n_pairs)
+    sound = np.zeros(int(601 * sr), dtype = np.float32)
+    sound_folders_dir = "recordings"
+    nrow = phone_pairs_data.shape[0]
+
+    def load(full_sound_file_path):
+        return sound
+
+    def get_pair_measures(first_phone_ts, second_phone_ts, sr, mel_f, **kwargs):
+        return len(first_phone_ts), len(second_phone_ts), 0.0
+
+    # The loop of the original driver
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        coart_data = phone_pairs_data.copy(deep = True)
+        coart_data["Spectral_distance"] = np.nan
+        coart_data["Raw_transition_duration"] = np.nan
+        coart_data["Relative_transition_duration"] = np.nan
+        prev_filename_wav = ""
+        for index, row in phone_pairs_data.iterrows():
+            filename_wav = row["Filename_wav"]
+            condition_code = row["Condition"]
+
+            if filename_wav != prev_filename_wav:
+                condition_subfolder = condition_folder_code_dict[condition_code]
+                full_sound_file_path = os.path.join(sound_folders_dir,
+                                                    condition_subfolder,
+                                                    filename_wav)
+                sound = load(full_sound_file_path)
+                prev_filename_wav = filename_wav
+
+            first_phone_ts = sound[int(row["First_phone_start_t"] * sr):
+                int(row["First_phone_end_t"] * sr)]
+            second_phone_ts = sound[int(row["Second_phone_start_t"] * sr):
+                int(row["Second_phone_end_t"] * sr)]
+            spectral_distance, raw_trans_dur, relative_trans_dur = \
+                get_pair_measures(first_phone_ts, second_phone_ts, sr, None)
+            coart_data.at[index, "Spectral_distance"] = spectral_distance
+            coart_data.at[index, "Raw_transition_duration"] = raw_trans_dur
+            coart_data.at[index, "Relative_transition_duration"] = relative_trans_dur
+
+            sys.stdout.write("\rProgress: {0}%".format(round((float(index) / nrow) * 100)))
+            sys.stdout.flush()
+    rowwise = time.perf_counter() - start
+
+    # The current driver (the loop of analyze_serially without prefetching)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), \
+        mock.patch.object(analyze_coarticulation, "get_pair_measures", get_pair_measures):
+        bounds = get_sample_bounds(phone_pairs_data, sr)
+        measures = np.full((nrow, len(measure_columns)), np.nan)
+        runs = plan_recordings(phone_pairs_data, condition_folder_code_dict)
+        no_of_pairs = np.cumsum([len(positions) for _, positions in runs])
+        for count, (recording, positions) in enumerate(runs):
+            measures[positions] = get_sound_measures(load(os.path.join(sound_folders_dir,
+                                                                       recording)),
+                                                     sr, None, bounds[positions])
+            sys.stdout.write("\rProgress: {0}%".format(round((float(no_of_pairs[count]) / no_of_pairs[-1]) * 100)))
+            sys.stdout.flush()
+        coart_data = phone_pairs_data.copy(deep = True)
+        for i, column in enumerate(measure_columns):
+            coart_data[column] = measures[:, i]
+    columnar = time.perf_counter() - start
+
+    print("\nDriver overhead per phone pair ({} pairs):".format(n_pairs))
+    print("Original loop (iterrows + DataFrame.at): {:.1f} us".format(rowwise / n_pairs * 1e6))
+    print("Current loop (column arrays): {:.1f} us".format(columnar / n_pairs * 1e6))
+
+def benchmark_stft_backends(n_phones = 2000, sr = 44100, workers = 4, seed = 0):
+    """
+    Times the Spectra of phones of typical lengths (40 to 150 ms, at the 
+    0.001 and 0.010 step sizes of the analysis) for each STFT backend, with 
+    the 2048-point FFT and with the "auto" FFT size.
+
+    n_phones:
+        Number of phones (default: 2000).
+    sr:
+        Sampling rate (default: 44100).
+    workers:
+        Number of threads of the multithreaded scipy.fft backend (default: 4).
+    seed:
+        Seed of the random number generator (default: 0).
+    """
+    rng = np.random.default_rng(seed)
+    phones = [rng.standard_normal(int(duration * sr)).astype(np.float32)
+              for duration in rng.uniform(0.04, 0.15, n_phones)]
+    backends = {"librosa": "librosa",
+                "numpy": "numpy",
+                "scipy": "scipy",
+                "scipy ({} workers)".format(workers): functools.partial(scipy_stft_magnitude,
+                                                                        workers = workers)}
+
+    print("\nSpectra per phone ({} phones of 40 to 150 ms):".format(n_phones))
+    for n_fft in [2048, "auto"]:
+        mel_f = get_mel_filter_bank(sr, n_fft = get_fft_size(sr, 0.0256, n_fft))
+        for name, backend in backends.items():
+            start = time.perf_counter()
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                for phone in phones:
+                    Spectra(phone, sr, mel_f, step_size = 0.001, backend = backend)
+                    Spectra(phone, sr, mel_f, step_size = 0.010, backend = backend)
+            elapsed = time.perf_counter() - start
+            print("n_fft = {}, {}: {:.0f} us".format(get_n_fft(mel_f), name,
+                                                     elapsed / n_phones * 1e6))
+
+def make_phone_time_data(n_words = 60, seed = 0):
+    """
+    Creates synthetic time data of the keyword phones of one TextGrid (see
+    get_keywords_tiers.get_KW_phones_ints_and_times): words of three or four
+    phones, with a gap between one pair of phones in about a third of them.
+
+    n_words:
+        Number of keyword tokens (default: 60).
+    seed:
+        Seed of the random number generator (default: 0).
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    t = 0.5
+    for word in range(n_words):
+        n_phones = rng.integers(3, 5)
+        gap = rng.integers(1, n_phones) if rng.random() < 0.3 else 0
+        for phone in range(n_phones):
+            if phone == gap and phone > 0:
+                t = round(t + 0.01, 3)
+            end_t = round(t + rng.uniform(0.03, 0.2), 3)
+            rows.append(["KW{}".format(word % 20), word // 20 + 1,
+                         "P{}".format(rng.integers(0, 40)), t, end_t])
+            t = end_t
+        t = round(t + rng.uniform(0.5, 5.0), 3)
+    return pd.DataFrame(rows, columns = ["Keyword", "Repetition", "Phone",
+                                         "Start_t", "End_t"])
+
+def benchmark_phone_pairs(n_textgrids = 5, n_words = 60, corpus_textgrids = 500):
+    """
+    Times the building of the phone pair data from the keyword phones of
+    synthetic TextGrids: one iterrows loop with a DataFrame.loc append per
+    pair against get_adjacent_phone_pairs with one concatenation at the end,
+    both on the same n_textgrids TextGrids (the cost of the appends grows
+    with the size of the table, so the loop is only run on a subset of
+    corpus size). get_adjacent_phone_pairs is then timed on its own on
+    corpus_textgrids TextGrids.
+
+    n_textgrids:
+        Number of TextGrids for the comparison (default: 5).
+    n_words:
+        Number of keyword tokens per TextGrid (default: 60).
+    corpus_textgrids:
+        Number of TextGrids for the corpus-sized run (default: 500).
+    """
+    # get_phone_pairs_data needs get_keywords_tiers (from the scripts for
+    # the LUCID TextGrids) to be importable, so it is only imported here
+    from get_phone_pairs_data import get_adjacent_phone_pairs, concat_phone_pairs, \
+        phone_pair_columns
+
+    phone_time_frames = [make_phone_time_data(n_words, seed = i)
+                         for i in range(max(n_textgrids, corpus_textgrids))]
+    metadata = ["file{}".format(i) for i in range(len(file_metadata_columns))]
+
+    def get_vectorized(frames):
+        return concat_phone_pairs([get_adjacent_phone_pairs(phone_time_data, metadata,
+                                                            file_metadata_columns)
+                                   for phone_time_data in frames],
+                                  file_metadata_columns)
+
+    # iterrows and DataFrame.loc appends
+    start = time.perf_counter()
+    phone_pairs_data = pd.DataFrame(columns = file_metadata_columns + phone_pair_columns)
+    for phone_time_data in phone_time_frames[:n_textgrids]:
+        for index, row in phone_time_data.iterrows():
+            if index > 0 and prev_phone["End_t"] == row["Start_t"]:
+                phone_pairs_data.loc[len(phone_pairs_data)] = metadata + [
+                        prev_phone["Keyword"], prev_phone["Repetition"],
+                        prev_phone["Phone"] + "_" + row["Phone"],
+                        prev_phone["Phone"], prev_phone["Start_t"], prev_phone["End_t"],
+                        row["Phone"], row["Start_t"], row["End_t"]]
+            prev_phone = row
+    rowwise = time.perf_counter() - start
+    rowwise_pairs = len(phone_pairs_data)
+
+    # Shifted comparisons and one concatenation, on the same TextGrids
+    start = time.perf_counter()
+    phone_pairs_data = get_vectorized(phone_time_frames[:n_textgrids])
+    vectorized = time.perf_counter() - start
+    if len(phone_pairs_data) != rowwise_pairs:
+        raise ValueError("The two methods found {} and {} phone pairs".format(
+                rowwise_pairs, len(phone_pairs_data)))
+
+    # Shifted comparisons on a corpus-sized input
+    start = time.perf_counter()
+    corpus_pairs = len(get_vectorized(phone_time_frames[:corpus_textgrids]))
+    corpus = time.perf_counter() - start
+
+    print("\nPhone pair data ({} TextGrids, {} phone pairs):".format(n_textgrids,
+                                                                  rowwise_pairs))
+    print("iterrows + DataFrame.loc: {:.2f} s ({:.0f} us per pair)".format(
+            rowwise, rowwise / rowwise_pairs * 1e6))
+    print("Shifted comparisons: {:.3f} s ({:.1f} us per pair)".format(
+            vectorized, vectorized / rowwise_pairs * 1e6))
+    print("Shifted comparisons ({} TextGrids, {} phone pairs): {:.2f} s".format(
+            corpus_textgrids, corpus_pairs, corpus))
+
+if __name__ == "__main__":
+    benchmark_driver_overhead()
+    benchmark_stft_backends()
+    benchmark_phone_pairs()
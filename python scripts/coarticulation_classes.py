@@ -11,25 +11,55 @@ Some snippets of code are taken from:
     https://github.com/megseekosh/Meas_Quechua_coartic
 """
 
-import librosa
+import inspect, librosa, scipy.fft, functools, hashlib, marshal
 import numpy as np
 import matplotlib.pyplot as plt
+from numpy.lib.stride_tricks import as_strided
+from filter_banks import MelFilterBank, get_mel_filter_bank
 
 class Spectra:
-    def __init__(self, time_series, sr, mel_f, window_length = 0.0256, 
-                 step_size = 0.010):
-        """ Gets a spectral represeentation of a (floating point) time series.
+    # Spectra are made once per phone (and per step size), so they have no 
+    # __dict__.
+    __slots__ = ("time_series", "sampling_rate", "window_length", "no_of_samples",
+                 "step_size", "filter_bank", "backend", "dtype", "duration",
+                 "spectra", "log_spectra", "average_spectrum", "no_of_frames",
+                 "segment")
+    
+    def __init__(self, time_series, sr, mel_f = None, window_length = 0.0256, 
+                 step_size = 0.010, n_fft = None, backend = "librosa",
+                 keep_time_series = True, dtype = np.float64):
+        """ Gets a spectral represeentation of a (floating point) time series. 
+        The spectra and the average spectrum are computed on first access.
         
         time_series:
             Audio file time series (expects an array).
         sr:
             Sampling rate.
         mel_f:
-            Mel-frequency filter bank.
+            Mel-frequency filter bank (the FFT size is inferred from its 
+            number of frequency bins) (default: None, i.e., the filter bank 
+            of the analysis for n_fft from filter_banks.get_mel_filter_bank).
         window_length:
             Window length (time in seconds; default: 0.0256).
         step_size:
             Step_size (times in seconds; default: 0.010).
+        n_fft:
+            FFT size; "auto" for the next fast FFT size for the window (see 
+            get_fft_size) (default: None, i.e., the size of the filter bank, 
+            or 2048 without one). The filter bank must have been made for 
+            this size.
+        backend:
+            STFT backend: "librosa", "scipy", "numpy" or a function (see 
+            stft_backends) (default: "librosa").
+        keep_time_series:
+            Keep the time series (default: True). If False, the spectra are 
+            computed right away and the time series is dropped (see 
+            drop_time_series).
+        dtype:
+            Precision of the spectra, their logs and the distances computed 
+            from them: np.float64 or np.float32 (default: np.float64). With 
+            np.float32 the time series is cast to float32, so that the STFT 
+            runs in complex64 too.
         """
         # Initialize variables of the Spectra class
         self.time_series = time_series
@@ -37,40 +67,188 @@ class Spectra:
         self.window_length = window_length
         self.no_of_samples = len(time_series)
         self.step_size = step_size
-        self.filter_bank = mel_f
+        self.filter_bank = get_filter_bank(mel_f, sr, window_length, n_fft)
+        self.backend = backend
+        self.dtype = np.dtype(dtype)
         
         # Note: no. of samples / duration = sampling rate
         self.duration = self.no_of_samples / sr
         
-            
+        # Computed on first access (see get_spectra and get_average_spectrum). 
+        # The log spectra are only kept for Spectra sliced out of a store of 
+        # log spectra (see from_recording).
+        self.spectra = None
+        self.log_spectra = None
+        self.average_spectrum = None
+        
+        # No. of frames of the STFT with center = True (the time series is 
+        # padded by n_fft // 2 samples on either side)
+        n_fft = get_n_fft(self.filter_bank)
+        self.no_of_frames = 1 + (self.no_of_samples + 2 * (n_fft // 2) - n_fft) // \
+            int(sr * step_size)
+        
+        # Only set for Spectra sliced out of a RecordingSpectra (see 
+        # from_recording): (recording, start sample, end sample)
+        self.segment = None
+        
+        if not keep_time_series:
+            self.drop_time_series()
+    
+    def compute_spectra(self):
+        """ Computes the spectral vectors (the mel-filtered magnitudes of the 
+        STFT). """
         # Note n_fft and hop_length are basically window length and step 
         # size, respectively. But they want "numbers of samples" in each 
         # window or step. They can be obtained by multiplying sampling rate 
         # by window length or step size.
         
-        
-        # Get the spectra
-        FFT = librosa.stft(time_series,
-                               n_fft = 2048,
-                               hop_length = int(sr * step_size),
-                               win_length = int(sr * window_length))
+        # Get the spectra (the FFT size is the one the filter bank was made 
+        # for)
+        FFT = stft_magnitude(single_precision(self.time_series, self.dtype),
+                             n_fft = get_n_fft(self.filter_bank),
+                             hop_length = int(self.sampling_rate * self.step_size),
+                             win_length = int(self.sampling_rate * self.window_length),
+                             backend = self.backend)
             
         # Convolve the filterbank over the spectrum
-        self.spectra = mel_f.dot(np.abs(FFT))  
-        self.average_spectrum = np.mean(np.log(self.spectra), axis = 1)
-        
-            
-        # Get no. of frames.
+        self.spectra = read_only(self.filter_bank.dot(FFT, dtype = self.dtype))
         self.no_of_frames = self.spectra.shape[1]
     
-    # Getter functions    
+    def drop_time_series(self):
+        """ Computes the spectra (if they are not computed yet) and drops the 
+        time series, so that the Spectra object only holds its features. 
+        get_time_series then returns None, and a Coarticulation of this 
+        Spectra can only get its combined spectra from a recording (see 
+        from_recording). """
+        if self.spectra is None and self.log_spectra is None:
+            self.compute_spectra()
+        self.time_series = None
+    
+    @classmethod
+    def from_recording(cls, recording, start, end):
+        """ Gets the spectral representation of samples start to end of a 
+        recording by slicing the frames of a RecordingSpectra, instead of 
+        running a new STFT on the time series.
+        
+        recording:
+            A RecordingSpectra object (or a feature_store.StoredRecordingSpectra, 
+            which has log spectra and no time series).
+        start:
+            Index of the first sample.
+        end:
+            Index after the last sample.
+        """
+        first_frame, no_of_frames = recording.get_frame_range(start, end)
+        frames = slice(first_frame, first_frame + no_of_frames)
+        time_series = recording.get_time_series()
+        return cls._from_spectra(None if time_series is None else time_series[start:end],
+                                 recording.get_sampling_rate(),
+                                 recording.get_filter_bank(),
+                                 recording.get_window_length(),
+                                 recording.get_step_size(),
+                                 None if recording.stores_log_spectra else 
+                                 recording.get_spectra(frames.start, frames.stop),
+                                 segment = (recording, start, end),
+                                 backend = recording.get_backend(),
+                                 no_of_samples = end - start,
+                                 log_spectra = recording.get_log_spectra(frames) if 
+                                 recording.stores_log_spectra else None)
+    
+    @classmethod
+    def from_magnitudes(cls, magnitudes, time_series, sr, mel_f, 
+                        window_length = 0.0256, step_size = 0.010, 
+                        backend = "librosa", dtype = np.float64):
+        """ Gets the spectral representation of a time series from the 
+        magnitudes of its STFT (see stft_magnitude), computed with the window 
+        length and step size given here, so that one STFT can be shared by 
+        several filter banks. The spectra are the same as those of 
+        Spectra(time_series, sr, mel_f, ...).
+        
+        magnitudes:
+            STFT magnitudes, one column per frame (expects an array).
+        time_series:
+            Time series the STFT was computed from.
+        (See Spectra for the other arguments.)
+        """
+        mel_f = get_filter_bank(mel_f, sr, window_length)
+        return cls._from_spectra(time_series, sr, mel_f, window_length, step_size,
+                                 mel_f.dot(magnitudes, dtype = np.dtype(dtype)),
+                                 backend = backend)
+    
+    @classmethod
+    def _from_spectra(cls, time_series, sr, mel_f, window_length, step_size,
+                      spectra, segment = None, backend = "librosa",
+                      no_of_samples = None, log_spectra = None):
+        """ Builds a Spectra object around spectral vectors (or log spectral 
+        vectors) that have already been computed (no_of_samples is only 
+        needed without a time series). """
+        spec = cls.__new__(cls)
+        spec.backend = backend
+        spec.time_series = time_series
+        spec.sampling_rate = sr
+        spec.window_length = window_length
+        spec.no_of_samples = len(time_series) if no_of_samples is None else no_of_samples
+        spec.step_size = step_size
+        spec.filter_bank = mel_f
+        spec.duration = spec.no_of_samples / sr
+        spec.spectra = None if spectra is None else read_only(spectra)
+        spec.log_spectra = None if log_spectra is None else read_only(log_spectra)
+        spec.average_spectrum = None
+        features = spectra if spectra is not None else log_spectra
+        spec.dtype = features.dtype
+        spec.no_of_frames = features.shape[1]
+        spec.segment = segment
+        return spec
+    
+    def decimate(self, step_size):
+        """ Gets a Spectra object with a coarser step size from the frames of 
+        this one, without another STFT. Each coarse frame is the fine frame 
+        whose centre is nearest to it, so when the coarse hop is not a 
+        multiple of the fine hop (e.g., 441 and 44 samples at 44100 Hz) the 
+        frames are off by up to half a fine hop.
+        
+        step_size:
+            Step size of the new Spectra (time in seconds).
+        """
+        frames = decimated_frames(0, self.no_of_samples, self.sampling_rate,
+                                  self.step_size, step_size)
+        frames = np.minimum(frames, self.get_no_of_frames() - 1)
+        if self.log_spectra is None:
+            spectra, log_spectra = self.get_spectra()[:, frames], None
+        else:
+            spectra, log_spectra = None, self.log_spectra[:, frames]
+        return Spectra._from_spectra(self.time_series,
+                                     self.sampling_rate,
+                                     self.filter_bank,
+                                     self.window_length,
+                                     step_size,
+                                     spectra,
+                                     backend = self.backend,
+                                     no_of_samples = self.no_of_samples,
+                                     log_spectra = log_spectra)
+    
+    # Getter functions (the arrays are read-only, not copies)
     def get_spectra(self):
         """ Gets the spectral vectors. """
-        return np.copy(self.spectra)
+        if self.spectra is None:
+            if self.log_spectra is not None:
+                self.spectra = read_only(np.exp(self.log_spectra))
+            else:
+                self.compute_spectra()
+        return self.spectra
+    
+    def get_log_spectra(self, first_frame = 0, last_frame = None):
+        """ Gets the log of the spectral vectors of frames first_frame to 
+        last_frame (default: all frames). """
+        if self.log_spectra is not None:
+            return self.log_spectra[:, first_frame:last_frame]
+        return np.log(self.get_spectra()[:, first_frame:last_frame])
     
     def get_average_spectrum(self):
         """ Gets the average spectral vector. """
-        return np.copy(self.average_spectrum)
+        if self.average_spectrum is None:
+            self.average_spectrum = read_only(np.mean(self.get_log_spectra(), axis = 1))
+        return self.average_spectrum
     
     def get_no_of_frames(self):
         """ Gets the number of frames in the spectral representation. """
@@ -96,16 +274,399 @@ class Spectra:
         """ Gets step size (in seconds). """
         return self.step_size
     
+    def get_time_series(self):
+        """ Gets the time series (None if it was dropped). """
+        return self.time_series
+    
+    def get_filter_bank(self):
+        """ Gets the filter bank. """
+        return self.filter_bank
+    
+    def get_segment(self):
+        """ Gets the (recording, start sample, end sample) this Spectra was 
+        sliced from, or None. """
+        return self.segment
+    
+    def get_backend(self):
+        """ Gets the STFT backend. """
+        return self.backend
+    
+    def get_dtype(self):
+        """ Gets the precision of the spectra. """
+        return self.dtype
+
+def read_only(array):
+    """ Gets a read-only view of an array. """
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+def single_precision(time_series, dtype):
+    """ Casts a time series to float32 if dtype is float32 (a time series in 
+    float32 is left as it is for float64 spectra, as librosa.load returns 
+    it). """
+    if np.dtype(dtype) == np.float32:
+        return np.asarray(time_series, dtype = np.float32)
+    return time_series
+
+class RecordingSpectra:
+    # Frames per STFT call when filling the spectrogram (bounds the size of 
+    # the complex STFT held in memory at once).
+    block_size = 2048
+    
+    # Whether the recording holds log spectra (see 
+    # feature_store.StoredRecordingSpectra) rather than spectra
+    stores_log_spectra = False
+    
+    def __init__(self, time_series, sr, mel_f = None, window_length = 0.0256,
+                 step_size = 0.010, regions = None, n_fft = None,
+                 backend = "librosa", dtype = np.float64):
+        """ Gets the spectral representation of a whole recording, so that the 
+        spectra of the phones in it can be sliced out by frame index instead 
+        of running one STFT per phone. Frame j is centred on sample 
+        j * hop_length, as in librosa.stft(center = True).
+        
+        time_series:
+            Time series of the whole recording (expects an array, or an 
+            audio_io.SegmentedAudio that covers the regions).
+        sr:
+            Sampling rate.
+        mel_f:
+            Mel-frequency filter bank (see Spectra; default: None).
+        window_length:
+            Window length (time in seconds; default: 0.0256).
+        step_size:
+            Step_size (times in seconds; default: 0.010).
+        regions:
+            Sample ranges to compute right away (expects an array of 
+            [start, end) rows; default: None, i.e., the whole recording). 
+            Frames outside the regions are computed on first access.
+        n_fft:
+            FFT size (see Spectra; default: None).
+        backend:
+            STFT backend (see Spectra; default: "librosa").
+        dtype:
+            Precision of the spectra (see Spectra; default: np.float64).
+        """
+        mel_f = get_filter_bank(mel_f, sr, window_length, n_fft)
+        self.backend = backend
+        self.dtype = np.dtype(dtype)
+        self.time_series = time_series
+        self.sampling_rate = sr
+        self.window_length = window_length
+        self.step_size = step_size
+        self.filter_bank = mel_f
+        self.hop_length = int(sr * step_size)
+        self.no_of_samples = len(time_series)
+        self.no_of_frames = 1 + self.no_of_samples // self.hop_length
+        
+        # The spectrogram is allocated in full but only filled where needed 
+        # (np.zeros does not commit untouched pages).
+        self.spectra = np.zeros((mel_f.shape[0], self.no_of_frames), dtype = self.dtype)
+        self.computed = np.zeros(self.no_of_frames, dtype = bool)
+        
+        if regions is None:
+            self.compute_frames(np.array([0]), np.array([self.no_of_frames]))
+        else:
+            regions = np.asarray(regions, dtype = int).reshape(-1, 2)
+            first_frames, no_of_frames = self.get_frame_range(regions[:, 0],
+                                                              regions[:, 1])
+            self.compute_frames(first_frames, first_frames + no_of_frames)
+    
+    def get_frame_range(self, start, end):
+        """ Gets the first frame and the no. of frames that a Spectra of 
+        samples start to end would have (works on arrays too). The first 
+        frame is the frame of the recording nearest to sample start, so it 
+        can be up to half a hop away from it, unlike frame 0 of 
+        Spectra(time_series[start:end]), which is centred on it. """
+        first_frame = (start + self.hop_length // 2) // self.hop_length
+        first_frame = np.minimum(first_frame, self.no_of_frames - 1)
+        no_of_frames = 1 + (end - start) // self.hop_length
+        no_of_frames = np.minimum(no_of_frames, self.no_of_frames - first_frame)
+        return first_frame, no_of_frames
+    
+    def compute_frames(self, first_frames, last_frames):
+        """ Computes the frames in [first_frames, last_frames) (arrays of 
+        frame ranges) that have not been computed yet. """
+        # Mark the needed frames with a difference array, then get the runs 
+        # of needed frames that are still missing.
+        needed = np.zeros(self.no_of_frames + 1, dtype = int)
+        np.add.at(needed, first_frames, 1)
+        np.add.at(needed, np.minimum(last_frames, self.no_of_frames), -1)
+        missing = (np.cumsum(needed[:-1]) > 0) & ~self.computed
+        if not missing.any():
+            return
+        
+        edges = np.diff(np.concatenate(([0], missing.astype(int), [0])))
+        run_starts = np.flatnonzero(edges == 1)
+        run_ends = np.flatnonzero(edges == -1)
+        
+        n_fft = get_n_fft(self.filter_bank)
+        for run_start, run_end in zip(run_starts, run_ends):
+            for block_start in range(run_start, run_end, self.block_size):
+                block_end = min(block_start + self.block_size, run_end)
+                ts_block = self.get_padded_samples(block_start * self.hop_length,
+                                                   (block_end - 1) * self.hop_length + n_fft,
+                                                   n_fft // 2)
+                FFT = stft_magnitude(single_precision(ts_block, self.dtype),
+                                     n_fft = n_fft,
+                                     hop_length = self.hop_length,
+                                     win_length = int(self.sampling_rate * self.window_length),
+                                     center = False,
+                                     backend = self.backend)
+                self.spectra[:, block_start:block_end] = self.filter_bank.dot(FFT, dtype = self.dtype)
+        
+        self.computed[missing] = True
+    
+    def get_padded_samples(self, start, end, pad):
+        """ Gets samples start to end of the time series padded by pad 
+        samples on both sides (at the ends of the recording, the way 
+        librosa.stft(center = True) pads it, see _librosa_pad_mode), so that 
+        the frames can be computed with center = False. Only the ends of the 
+        recording are copied for padding. """
+        lo, hi = start - pad, end - pad
+        if lo >= 0 and hi <= self.no_of_samples:
+            return self.time_series[lo:hi]
+        
+        # Near the ends of the recording: pad a piece of it that includes the 
+        # samples that a reflection would use.
+        left, right = lo < 0, hi > self.no_of_samples
+        piece_lo = 0 if left else lo
+        piece_hi = self.no_of_samples if right else hi
+        if left:
+            piece_hi = max(piece_hi, min(pad + 1, self.no_of_samples))
+        if right:
+            piece_lo = min(piece_lo, max(self.no_of_samples - pad - 1, 0))
+        piece = np.pad(self.time_series[piece_lo:piece_hi],
+                       (pad if left else 0, pad if right else 0),
+                       mode = _librosa_pad_mode)
+        offset = piece_lo - (pad if left else 0)
+        return piece[lo - offset:hi - offset]
+    
+    def get_spectra(self, first_frame, last_frame):
+        """ Gets the spectral vectors of frames first_frame to last_frame. """
+        if not self.computed[first_frame:last_frame].all():
+            self.compute_frames(np.array([first_frame]), np.array([last_frame]))
+        return self.spectra[:, first_frame:last_frame]
+    
+    def get_average_spectra(self, starts, ends, step_size = None):
+        """ Gets the average (log) spectral vector of each of the sample 
+        ranges [starts, ends), one column per range, with one segment 
+        reduction over the frames of all ranges. If step_size is given 
+        (coarser than the step size of the recording), the frames are 
+        decimated to it first (see Spectra.decimate). """
+        first_frames, no_of_frames = self.get_frame_range(starts, ends)
+        if step_size is None:
+            self.compute_frames(first_frames, first_frames + no_of_frames)
+            frames, offsets = _segment_frames(first_frames, no_of_frames)
+        else:
+            # Coarse frame k of a range is centred on start + k * coarse hop
+            coarse_hop_length = int(self.sampling_rate * step_size)
+            no_of_frames = 1 + (ends - starts) // coarse_hop_length
+            frames, offsets = _segment_frames(np.zeros_like(starts), no_of_frames)
+            centres = np.repeat(starts, no_of_frames) + frames * coarse_hop_length
+            frames = (centres + self.hop_length // 2) // self.hop_length
+            frames = np.minimum(frames, self.no_of_frames - 1)
+
+            # The nearest fine frame can be one past the fine frames of the
+            # range, so the frames to compute are the decimated ones
+            self.compute_frames(frames, frames + 1)
+        log_spectra = self.get_log_spectra(frames)
+        return np.add.reduceat(log_spectra, offsets, axis = 1) / no_of_frames.astype(self.dtype)
+    
+    def get_log_spectra(self, frames):
+        """ Gets the log spectral vectors of some frames (expects an index 
+        array or a slice of frames that have been computed). """
+        return np.log(self.spectra[:, frames])
+    
     def get_time_series(self):
         """ Gets the time series. """
         return self.time_series
     
+    def get_sampling_rate(self):
+        """ Gets sampling rate. """
+        return self.sampling_rate
+    
+    def get_window_length(self):
+        """ Gets the window length. """
+        return self.window_length
+    
+    def get_step_size(self):
+        """ Gets step size (in seconds). """
+        return self.step_size
+    
     def get_filter_bank(self):
         """ Gets the filter bank. """
         return self.filter_bank
+    
+    def get_backend(self):
+        """ Gets the STFT backend. """
+        return self.backend
+    
+    def get_dtype(self):
+        """ Gets the precision of the spectra. """
+        return self.dtype
+
+def get_n_fft(mel_f):
+    """ Gets the FFT size that a filter bank was made for (it has 
+    n_fft // 2 + 1 frequency bins). """
+    return 2 * (mel_f.shape[1] - 1)
+
+def get_fft_size(sr, window_length = 0.0256, n_fft = "auto"):
+    """ Gets the FFT size for a window length: n_fft itself if it is a 
+    number, or the smallest size of at least the window that scipy.fft 
+    handles fast if it is "auto" (e.g., 1152 instead of 2048 for the 1128 
+    samples of a 0.0256 s window at 44100 Hz).
+    
+    sr:
+        Sampling rate.
+    window_length:
+        Window length (time in seconds; default: 0.0256).
+    n_fft:
+        FFT size or "auto" (default: "auto").
+    """
+    if n_fft == "auto":
+        return scipy.fft.next_fast_len(int(sr * window_length), real = True)
+    return int(n_fft)
+
+def get_filter_bank(mel_f, sr, window_length, n_fft = None):
+    """ Gets the filter bank for an FFT size (see get_fft_size): the 
+    filter bank of the analysis from filter_banks.get_mel_filter_bank if 
+    mel_f is None, and otherwise mel_f itself, after checking that it was 
+    made for that size (a ValueError if not). A filter bank given as an 
+    array (e.g., from librosa.filters.mel) is wrapped in a 
+    filter_banks.MelFilterBank. """
+    if mel_f is None:
+        return get_mel_filter_bank(sr, n_fft = get_fft_size(sr, window_length,
+                                                            2048 if n_fft is None else n_fft))
+    if n_fft is not None and get_fft_size(sr, window_length, n_fft) != get_n_fft(mel_f):
+        raise ValueError("The filter bank was made for n_fft = {}, not {}".format(
+                get_n_fft(mel_f), get_fft_size(sr, window_length, n_fft)))
+    if not isinstance(mel_f, MelFilterBank):
+        mel_f = MelFilterBank(mel_f)
+    return mel_f
+
+def stft_magnitude(time_series, n_fft, hop_length, win_length, center = True,
+                   backend = "librosa"):
+    """ Gets the magnitude of the short-time Fourier transform (one column 
+    per frame) with a Hann window, like np.abs(librosa.stft(...)).
+    
+    time_series:
+        Time series (expects an array).
+    n_fft:
+        FFT size.
+    hop_length:
+        Step size (in samples).
+    win_length:
+        Window length (in samples).
+    center:
+        Pad the time series so that frame j is centred on sample 
+        j * hop_length (default: True).
+    backend:
+        Name of a backend in stft_backends, or a function with the same 
+        arguments as this one (except backend) (default: "librosa").
+    """
+    if not callable(backend):
+        backend = stft_backends[backend]
+    return backend(time_series, n_fft, hop_length, win_length, center = center)
+
+def librosa_stft_magnitude(time_series, n_fft, hop_length, win_length,
+                           center = True):
+    """ STFT backend that calls librosa.stft. """
+    return np.abs(librosa.stft(time_series,
+                               n_fft = n_fft,
+                               hop_length = hop_length,
+                               win_length = win_length,
+                               center = center))
+
+def frame_stft_magnitude(time_series, n_fft, hop_length, win_length,
+                         center = True, rfft = np.fft.rfft):
+    """ STFT backend that windows strided views of the frames and runs one 
+    batched real FFT over them (np.fft.rfft unless rfft is given). When 
+    center is True the time series is padded like librosa.stft pads it by 
+    default (by reflection before librosa 0.10, with zeros since). """
+    window = librosa.util.pad_center(librosa.filters.get_window("hann", win_length,
+                                                                fftbins = True),
+                                     size = n_fft)
+    time_series = np.asarray(time_series)
+    if center:
+        time_series = np.pad(time_series, n_fft // 2, mode = _librosa_pad_mode)
+    no_of_frames = 1 + (len(time_series) - n_fft) // hop_length
+    frames = as_strided(time_series,
+                        shape = (no_of_frames, n_fft),
+                        strides = (time_series.strides[0] * hop_length,
+                                   time_series.strides[0]),
+                        writeable = False)
+    return np.abs(rfft(frames * window, axis = 1)).T
+
+def scipy_stft_magnitude(time_series, n_fft, hop_length, win_length,
+                         center = True, workers = 1):
+    """ STFT backend like frame_stft_magnitude, with scipy.fft.rfft on 
+    workers threads (use functools.partial to set workers). """
+    def rfft(frames, axis):
+        return scipy.fft.rfft(frames, axis = axis, workers = workers)
+    return frame_stft_magnitude(time_series, n_fft, hop_length, win_length,
+                                center = center, rfft = rfft)
+
+# Padding of librosa.stft with center = True
+_librosa_pad_mode = inspect.signature(librosa.stft).parameters["pad_mode"].default
+
+# STFT backends by name (see stft_magnitude)
+stft_backends = {"librosa": librosa_stft_magnitude,
+                 "numpy": frame_stft_magnitude,
+                 "scipy": scipy_stft_magnitude}
+
+def get_backend_name(backend):
+    """ Gets a name that tells STFT backends apart (e.g., for the settings 
+    of a cache of measures): the name of a backend in stft_backends, or the 
+    module and qualified name of a function with a hash of its code, and 
+    the arguments of a functools.partial. """
+    if not callable(backend):
+        return backend
+    if isinstance(backend, functools.partial):
+        arguments = [repr(argument) for argument in backend.args] + \
+            ["{} = {!r}".format(name, value) for name, value in sorted(backend.keywords.items())]
+        return "{}({})".format(get_backend_name(backend.func), ", ".join(arguments))
+    name = "{}.{}".format(getattr(backend, "__module__", None),
+                          getattr(backend, "__qualname__", type(backend).__qualname__))
+    code = getattr(backend, "__code__", None)
+    if code is not None:
+        name += " " + hashlib.sha1(marshal.dumps(code)).hexdigest()
+    return name
+
+def decimated_frames(start, end, sr, step_size, coarse_step_size):
+    """ Gets the indices of the frames at step_size (counted from frame 0 of 
+    a recording) that are nearest to the frames at coarse_step_size of 
+    samples start to end.
+    
+    start:
+        Index of the first sample.
+    end:
+        Index after the last sample.
+    sr:
+        Sampling rate.
+    step_size:
+        Step size of the frames to pick from (time in seconds).
+    coarse_step_size:
+        Step size of the decimated frames (time in seconds).
+    """
+    hop_length = int(sr * step_size)
+    coarse_hop_length = int(sr * coarse_step_size)
+    coarse_centres = start + np.arange(1 + (end - start) // coarse_hop_length) \
+        * coarse_hop_length
+    return (coarse_centres + hop_length // 2) // hop_length
+
+def _segment_frames(first_frames, no_of_frames):
+    """ Concatenates the frame indices of several segments. Returns the 
+    indices and the offset of each segment in them. """
+    offsets = np.cumsum(no_of_frames) - no_of_frames
+    frames = np.repeat(first_frames - offsets, no_of_frames) + \
+        np.arange(np.sum(no_of_frames))
+    return frames, offsets
 
 class Coarticulation:
-    def __init__(self, spec_first, spec_second):
+    def __init__(self, spec_first, spec_second, dtype = None,
+                 combined_spectra = None):
         """
         Takes the Spectra objects of two adjacent phones, analyzes their coarticulatory 
         properties (i.e., computing the spectral distance and temporal transition 
@@ -115,82 +676,215 @@ class Coarticulation:
             A Spectra object of the first phone.
         spec_second:
             A Spectra object of the second phone.
+        dtype:
+            Precision of the combined spectra and of the distances 
+            (default: None, i.e., that of spec_first).
+        combined_spectra:
+            Spectra object of the concatenated time series of the two 
+            phones, if it has already been computed (default: None, i.e., 
+            computed on first use).
         """
         self.spec_first = spec_first
         self.spec_second = spec_second
+        self.dtype = spec_first.get_dtype() if dtype is None else np.dtype(dtype)
+        
+        # Computed on first use (see get_combined_spectra and get_trajectory).
+        self.combined_spectra = combined_spectra
+        self.trajectory = None
         
     def spectral_dist(self):
         """ Calculates the Euclidean distance between the average spectra of the 
         two segments. """
-        spec_first_average = self.spec_first.get_average_spectrum()
-        spec_second_average = self.spec_second.get_average_spectrum()
+        spec_first_average = self.spec_first.get_average_spectrum().astype(self.dtype, copy = False)
+        spec_second_average = self.spec_second.get_average_spectrum().astype(self.dtype, copy = False)
         return np.linalg.norm(spec_first_average - spec_second_average)
     
+    def get_combined_spectra(self):
+        """ Gets the Spectra object of the concatenated time series of the two 
+        phones (computed on first use). """
+        if self.combined_spectra is None:
+            
+            # If both phones were sliced out of the same recording (and are 
+            # adjacent), slice the combined span out of it too.
+            seg_first = self.spec_first.get_segment()
+            seg_second = self.spec_second.get_segment()
+            if seg_first is not None and seg_second is not None and \
+                seg_first[0] is seg_second[0] and seg_first[2] == seg_second[1]:
+                self.combined_spectra = Spectra.from_recording(seg_first[0],
+                                                               seg_first[1],
+                                                               seg_second[2])
+                return self.combined_spectra
+            
+            # Concatenate the time series of the two phones.
+            ts_first = self.spec_first.get_time_series()
+            ts_second = self.spec_second.get_time_series()
+            if ts_first is None or ts_second is None:
+                raise ValueError("The time series of a phone was dropped, so the "
+                                 "combined spectra cannot be computed")
+            ts_combined = np.concatenate((ts_first, ts_second))
+            
+            # Create the Spectra object for the combined time series (assume 
+            # that the Spectra of the two phones use the same sampling rate, 
+            # have the same window length, etc.). 
+            self.combined_spectra = Spectra(ts_combined, 
+                                            self.spec_first.get_sampling_rate(),
+                                            self.spec_first.get_filter_bank(),
+                                            self.spec_first.get_window_length(),
+                                            self.spec_first.get_step_size(),
+                                            backend = self.spec_first.get_backend(),
+                                            dtype = self.dtype)
+        return self.combined_spectra
+    
+    def get_trajectory(self):
+        """ Gets the d1, d2 and f12 trajectories (arrays, one value per frame) 
+        between the midpoints of the two phones. """
+        if self.trajectory is None:
+            combined_spectra = self.get_combined_spectra()
+            
+            # Get the indice of the start and end frames.
+            no_frames_first = self.spec_first.get_no_of_frames()
+            no_frames_second = self.spec_second.get_no_of_frames()
+            start_frame = int(no_frames_first / 2)
+            end_frame = no_frames_first + int(no_frames_second / 2)
+            
+            self.trajectory = f12_trajectory(combined_spectra.get_log_spectra(start_frame, end_frame),
+                                             self.spec_first.get_average_spectrum().astype(self.dtype, copy = False),
+                                             self.spec_second.get_average_spectrum().astype(self.dtype, copy = False))
+        return self.trajectory
+    
     def temporal_trans(self, trans_prop = 0.8):
         """ Calculates the proportion of frames that fall into the transition 
         period. """
-        # Concatenate the time series of the two phones.
-        ts_first = self.spec_first.get_time_series()
-        ts_second = self.spec_second.get_time_series()
-        ts_combined = np.concatenate((ts_first, ts_second))
-        
-        # Create the Spectra object for the combined time series (assume that) 
-        # the Spectra of the two phones use the same sampling rate, have the 
-        # same window length, etc.). 
-        sr = self.spec_first.get_sampling_rate()
-        filter_bank = self.spec_first.get_filter_bank()
-        window_length = self.spec_first.get_window_length()
-        step_size = self.spec_first.get_step_size() 
-        combined_spectra = Spectra(ts_combined, 
-                                   sr,
-                                   filter_bank,
-                                   window_length,
-                                   step_size)
-        spectra = combined_spectra.get_spectra()
-        
-        # Get the indice of the start and end frames.
-        no_frames_first = self.spec_first.get_no_of_frames()
-        no_frames_second = self.spec_second.get_no_of_frames()
-        start_frame = int(no_frames_first / 2)
-        end_frame = no_frames_first + int(no_frames_second / 2)
-        
-        # Following Gerosa & Narayanan: 
-        # f12(i) = d(x1, xi) − d(x2, xi) where 1 and 2 are the first and second 
-        # phones, respectively, and xi is the ith frame.
-        trajectory = []
-        d1_list = []
-        d2_list = []
-        for i in np.arange(start_frame, end_frame):
-            spec = np.log(spectra[:, i]) # xi
-            d1 = np.linalg.norm(self.spec_first.get_average_spectrum() - spec) # d(x1, xi)
-            d2 = np.linalg.norm(self.spec_second.get_average_spectrum() - spec) # d(x2, xi)
-            d1_list.append(d1)
-            d2_list.append(d2)
-            trajectory.append(d1 - d2)  # f12(i)
-        
-        list1 = []
-        list2 = []
-        
-        for value in trajectory:
-            if value < 0:
-                list1.append(value)
-            else:
-                list2.append(value)
-        
-        mean1 = np.mean(list1) # Mean f12 in the portion for the first phone
-        mean2 = np.mean(list2) # Mean f12 in the portion for the second phone
-            
-        lb = mean1 * trans_prop # Lowerbound for f12 values in the transition
-        ub = mean2 * trans_prop # Upperbound
+        _, _, trajectory = self.get_trajectory()
         
         # Count how many frames are in the transition
-        no_frames_in_trans = len([x for x in trajectory if x > lb and x < ub])
+        _, _, no_frames_in_trans = transition_stats(trajectory, trans_prop)
         
         # Raw (absolute) transition duration
-        trans_dur = no_frames_in_trans * step_size
+        trans_dur = no_frames_in_trans * self.spec_first.get_step_size()
         
         # Duration of the two phones combined
-        total_dur = combined_spectra.get_duration()
+        total_dur = self.get_combined_spectra().get_duration()
         
         # Return the raw and relative transition durations
-        return trans_dur, trans_dur / total_dur
\ No newline at end of file
+        return trans_dur, trans_dur / total_dur
+
+def f12_trajectory(log_spectra, average_first, average_second):
+    """ Computes the trajectory of Gerosa & Narayanan for a block of frames:
+    f12(i) = d(x1, xi) − d(x2, xi) where 1 and 2 are the first and second 
+    phones, respectively, and xi is the ith frame. Returns d1, d2 and f12.
+    
+    log_spectra:
+        Log spectral vectors, one column per frame (expects a 2-D array).
+    average_first:
+        Average (log) spectral vector of the first phone (or one column per 
+        frame).
+    average_second:
+        Average (log) spectral vector of the second phone (or one column per 
+        frame).
+    """
+    average_first = np.reshape(average_first, (len(average_first), -1))
+    average_second = np.reshape(average_second, (len(average_second), -1))
+    d1 = _column_norms(average_first - log_spectra) # d(x1, xi)
+    d2 = _column_norms(average_second - log_spectra) # d(x2, xi)
+    return d1, d2, d1 - d2
+    
+def _column_norms(vectors):
+    """ Euclidean norm of each column. Each norm goes through a (1 x n) @ (n x 1)
+    product, which numpy hands to the same dot routine as np.linalg.norm on a
+    single vector, so the values match a per-frame loop over the same
+    spectra to rounding (see tests/test_f12_trajectory.py for the
+    tolerance). """
+    rows = np.ascontiguousarray(vectors.T)
+    return np.sqrt(np.matmul(rows[:, np.newaxis, :], rows[:, :, np.newaxis])[:, 0, 0])
+
+def transition_stats(trajectory, trans_prop = 0.8):
+    """ Gets the mean f12 in the portions for the first and second phones and 
+    the number of frames in the transition.
+    
+    trajectory:
+        f12 values (expects an array).
+    trans_prop:
+        Proportion of the two means that bounds the transition (default: 0.8).
+    """
+    mean1 = np.mean(trajectory[trajectory < 0]) # Mean f12 in the portion for the first phone
+    mean2 = np.mean(trajectory[trajectory >= 0]) # Mean f12 in the portion for the second phone
+        
+    lb = mean1 * trans_prop # Lowerbound for f12 values in the transition
+    ub = mean2 * trans_prop # Upperbound
+    
+    no_frames_in_trans = np.count_nonzero((trajectory > lb) & (trajectory < ub))
+    return mean1, mean2, no_frames_in_trans
+
+def recording_pair_measures(spectral_recording, temporal_recording, 
+                            first_bounds, second_bounds, trans_prop = 0.8,
+                            spectral_step_size = None):
+    """ Gets the spectral distance and the raw and relative transition 
+    durations of all phone pairs in a recording at once. Pairs whose 
+    transition cannot be measured (no frames on one side of f12 = 0) get NaN.
+    
+    spectral_recording:
+        RecordingSpectra for the spectral distance (step size 0.010).
+    temporal_recording:
+        RecordingSpectra for the temporal transition (step size 0.001).
+    first_bounds:
+        [start, end) samples of the first phones (expects an n x 2 array).
+    second_bounds:
+        [start, end) samples of the second phones (expects an n x 2 array).
+    trans_prop:
+        Proportion of the mean f12 values that bounds the transition 
+        (default: 0.8).
+    spectral_step_size:
+        If given, spectral_recording has a finer step size and its frames are 
+        decimated to this step size for the spectral distance (default: None).
+    """
+    # Spectral distance
+    average_first = spectral_recording.get_average_spectra(first_bounds[:, 0],
+                                                           first_bounds[:, 1],
+                                                           spectral_step_size)
+    average_second = spectral_recording.get_average_spectra(second_bounds[:, 0],
+                                                            second_bounds[:, 1],
+                                                            spectral_step_size)
+    spectral_distance = _column_norms(average_first - average_second)
+    
+    # Temporal transition: the frames between the midpoints of the two 
+    # phones, counted from the first frame of the combined span.
+    average_first = temporal_recording.get_average_spectra(first_bounds[:, 0],
+                                                           first_bounds[:, 1])
+    average_second = temporal_recording.get_average_spectra(second_bounds[:, 0],
+                                                            second_bounds[:, 1])
+    hop_length = temporal_recording.hop_length
+    no_frames_first = 1 + (first_bounds[:, 1] - first_bounds[:, 0]) // hop_length
+    no_frames_second = 1 + (second_bounds[:, 1] - second_bounds[:, 0]) // hop_length
+    first_frame, _ = temporal_recording.get_frame_range(first_bounds[:, 0],
+                                                        second_bounds[:, 1])
+    start_frame = first_frame + no_frames_first // 2
+    no_frames = no_frames_first - no_frames_first // 2 + no_frames_second // 2
+    temporal_recording.compute_frames(start_frame, start_frame + no_frames)
+    frames, offsets = _segment_frames(start_frame, no_frames)
+    frames = np.minimum(frames, temporal_recording.no_of_frames - 1)
+    
+    # f12 for the frames of all pairs, each against the averages of its pair
+    log_spectra = temporal_recording.get_log_spectra(frames)
+    _, _, trajectory = f12_trajectory(log_spectra,
+                                      np.repeat(average_first, no_frames, axis = 1),
+                                      np.repeat(average_second, no_frames, axis = 1))
+    
+    # Means of the negative and non-negative f12 values of each pair
+    is_first = trajectory < 0
+    no_first = np.add.reduceat(is_first.astype(int), offsets)
+    no_second = no_frames - no_first
+    with np.errstate(invalid = "ignore", divide = "ignore"):
+        mean1 = np.add.reduceat(np.where(is_first, trajectory, 0.0), offsets) / no_first
+        mean2 = np.add.reduceat(np.where(is_first, 0.0, trajectory), offsets) / no_second
+    
+    lb = np.repeat(mean1 * trans_prop, no_frames)
+    ub = np.repeat(mean2 * trans_prop, no_frames)
+    no_frames_in_trans = np.add.reduceat(
+            ((trajectory > lb) & (trajectory < ub)).astype(int), offsets)
+    
+    raw_trans_dur = no_frames_in_trans * temporal_recording.get_step_size()
+    raw_trans_dur = np.where((no_first > 0) & (no_second > 0), raw_trans_dur, np.nan)
+    total_dur = (second_bounds[:, 1] - first_bounds[:, 0]) / \
+        temporal_recording.get_sampling_rate()
+    return spectral_distance, raw_trans_dur, raw_trans_dur / total_dur
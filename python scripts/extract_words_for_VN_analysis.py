@@ -7,6 +7,7 @@ Created on Mon Jun 28 13:50:34 2021
 """
 
 import os, sys, textgrids, shutil
+from textgrid_io import iter_textgrids
 
 sys.path.append("/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/python scripts")
 import get_keywords_tiers
@@ -16,7 +17,9 @@ def extract_words_for_VN_analysis(input_dir,
                                   keywords,
                                   words_tier_name = "words_KW",
                                   phones_tier_name = "phones_KW",
-                                  vowels_tier_name = "vowels_KW"):
+                                  vowels_tier_name = "vowels_KW",
+                                  n_jobs = 1,
+                                  textgrid_cache_path = None):
     """
     Gets the sound files for coarticulatory vowel nasalization analysis. This 
     script extracts all tokens of the specified keywords and saves each of them as 
@@ -35,6 +38,16 @@ def extract_words_for_VN_analysis(input_dir,
         Word-aligned annotation tier for the keywords (default: "words_KW").
     phones_tier_name:
         Phone-aligned annotation tier for the keywords (default: "phones_KW").
+    vowels_tier_name:
+        Name of the new tier with the vowels of the keywords (default: 
+        "vowels_KW").
+    n_jobs:
+        Number of worker processes that read the TextGrids (default: 1, i.e., 
+        no worker processes; see textgrid_io.iter_textgrids).
+    textgrid_cache_path:
+        Path to a cache of parsed TextGrids (see textgrid_cache.TextGridCache)
+        (default: None, i.e., no cache). The TextGrids in output_dir/tmp are 
+        written anew on every run, so they are parsed (and cached) every time.
     """    
     # Convert all keywords in the keyword list to uppercase.
     keywords = [kw.upper() for kw in keywords]
@@ -74,33 +87,30 @@ def extract_words_for_VN_analysis(input_dir,
         # Create subfolder directory
         sub_subfolder1_dir = os.path.join(subfolder1_dir, subfolder_name)
         os.makedirs(sub_subfolder1_dir)
+    
+    # Iterate over all the TextGrid files in the subfolders (read in worker 
+    # processes):
+    for textgrid_path, textgrid in iter_textgrids(tmp_dir, n_jobs = n_jobs,
+                                                  cache_path = textgrid_cache_path):
         
-        # Get all the TextGrid files in this subfolder
-        all_textgrids_files = [i for i in os.listdir(subfolder) if i.endswith(".TextGrid")]
+        # Create TextGrid object
+        textgrid = textgrid.to_textgrid()
         
-        # Iterate over all the TextGrid files:
-        for textgrid_file in all_textgrids_files:
-                        
-            # Create TextGrid object
-            textgrid = textgrids.TextGrid(os.path.join(subfolder,
-                                                       textgrid_file))
-            
-            # Re-use the get_KW_words_ints function from get_keywords_tiers.py. 
-            # Note that it can also be used for getting a tier with just vowels. 
-            # Simply supply the vowel label list for the keyword argument and 
-            # phones_tier_names for the words_tier_name argument.
-            keyword_vowels_intervals = get_keywords_tiers.get_KW_words_ints(
-                    textgrid = textgrid,
-                    keywords = vowels,
-                    words_tier_name = phones_tier_name)
-            
-            # Add it as a new tier to the TextGrid object
-            keyword_vowels_intervals_tier = textgrids.Tier(keyword_vowels_intervals)
-            textgrid[vowels_tier_name] = keyword_vowels_intervals_tier
-            
-            # Save the TextGrid to output/force-aligned keywords for VN/subfolder
-            textgrid.write(os.path.join(sub_subfolder1_dir,
-                                        textgrid_file))
+        # Re-use the get_KW_words_ints function from get_keywords_tiers.py. 
+        # Note that it can also be used for getting a tier with just vowels. 
+        # Simply supply the vowel label list for the keyword argument and 
+        # phones_tier_names for the words_tier_name argument.
+        keyword_vowels_intervals = get_keywords_tiers.get_KW_words_ints(
+                textgrid = textgrid,
+                keywords = vowels,
+                words_tier_name = phones_tier_name)
+        
+        # Add it as a new tier to the TextGrid object
+        keyword_vowels_intervals_tier = textgrids.Tier(keyword_vowels_intervals)
+        textgrid[vowels_tier_name] = keyword_vowels_intervals_tier
+        
+        # Save the TextGrid to output/force-aligned keywords for VN/subfolder
+        textgrid.write(os.path.join(subfolder1_dir, textgrid_path))
     
     print("\nFinished adding the vowel tier...")
     
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 19:24:52 2026
+
+@author: adamguo
+
+A store of the frame-level log-Mel spectra of every recording of the corpus,
+computed once and read back through memory maps, so that the analysis can
+run without decoding any audio. The spectra of a phone are sliced out of
+the frames of its recording as in the whole-recording mode of the analysis
+(see analyze_coarticulation.check_whole_recording for how far these are from
+the per-pair spectra).
+"""
+import os, sys, json, hashlib, tempfile
+import numpy as np
+from coarticulation_classes import RecordingSpectra, get_n_fft
+import audio_io
+from audio_io import load_audio
+
+class FeatureStore:
+    # Name of the index in the store directory
+    index_name = "index.json"
+
+    def __init__(self, store_dir):
+        """
+        Opens a feature store built by build_feature_store. The store holds,
+        for each recording and step size, one .npy chunk of log spectra (one
+        row per frame, one column per filter), and an index (index.json) of
+        the chunk, number of frames and hop length of each recording and of
+        the parameters of the features.
+
+        store_dir:
+            Directory of the store.
+        """
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, self.index_name)) as f:
+            index = json.load(f)
+        self.parameters = index["parameters"]
+        self.recordings = index["recordings"]
+
+    def check_parameters(self, **parameters):
+        """ Raises a ValueError if the features were not computed with the
+        given parameters (e.g., sr = 44100, n_fft = 2048). """
+        different = {name: (self.parameters.get(name), value)
+                     for name, value in parameters.items()
+                     if self.parameters.get(name) != value}
+        if different:
+            raise ValueError("The feature store {} was built with different parameters "
+                             "(store, analysis): {}".format(self.store_dir, different))
+
+    def get_version(self):
+        """ Gets the SHA-1 of the index of the store, which changes with the
+        parameters of the features and whenever a recording is added or
+        computed again. """
+        with open(os.path.join(self.store_dir, self.index_name), "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    def get_recording(self, recording, step_size):
+        """ Gets the features of a recording at a step size (0.001 or 0.010)
+        as a StoredRecordingSpectra.
+
+        recording:
+            Path of the sound file relative to the sound folders directory
+            (condition subfolder/file name).
+        step_size:
+            Step size (time in seconds).
+        """
+        try:
+            entry = self.recordings[recording]["features"][str(step_size)]
+        except KeyError:
+            raise KeyError("The feature store {} has no features for {} at step size "
+                           "{}".format(self.store_dir, recording, step_size)) from None
+        log_spectra = np.load(os.path.join(self.store_dir, entry["chunk"]), mmap_mode = "r")
+        return StoredRecordingSpectra(log_spectra.T,
+                                      self.recordings[recording]["no_of_samples"],
+                                      self.parameters["sr"],
+                                      self.parameters["window_length"],
+                                      step_size)
+
+class StoredRecordingSpectra(RecordingSpectra):
+    stores_log_spectra = True
+
+    def __init__(self, log_spectra, no_of_samples, sr, window_length, step_size):
+        """ The log spectra of a whole recording from a FeatureStore, with the
+        interface of a RecordingSpectra (see recording_pair_measures and
+        Spectra.from_recording). All frames are already computed, and there is
+        no time series.
+
+        log_spectra:
+            Log spectra, one column per frame (expects an array, e.g., a
+            memory-mapped one).
+        no_of_samples:
+            Number of samples of the recording.
+        sr:
+            Sampling rate.
+        window_length:
+            Window length (time in seconds).
+        step_size:
+            Step size (time in seconds).
+        """
+        self.log_spectra = log_spectra
+        self.time_series = None
+        self.sampling_rate = sr
+        self.window_length = window_length
+        self.step_size = step_size
+        self.filter_bank = None
+        self.backend = None
+        self.dtype = log_spectra.dtype
+        self.hop_length = int(sr * step_size)
+        self.no_of_samples = no_of_samples
+        self.no_of_frames = log_spectra.shape[1]
+
+    def compute_frames(self, first_frames, last_frames):
+        """ All frames are in the store. """
+        pass
+
+    def get_spectra(self, first_frame, last_frame):
+        """ Gets the spectral vectors of frames first_frame to last_frame. """
+        return np.exp(self.log_spectra[:, first_frame:last_frame])
+
+    def get_log_spectra(self, frames):
+        """ Gets the log spectral vectors of some frames (an index array or a
+        slice). """
+        return self.log_spectra[:, frames]
+
+def build_feature_store(sound_folders_dir, store_dir, mel_f, sr = 44100,
+                        window_length = 0.0256, step_sizes = (0.001, 0.010),
+                        dtype = "float32", spectra_options = None):
+    """
+    Computes the log spectra of every recording (the WAV files of the
+    condition subfolders of sound_folders_dir) at each step size and saves
+    them in a feature store (see FeatureStore). Recordings whose size and
+    modification time have not changed since the last build are skipped, so
+    the store can be brought up to date after adding recordings. The store
+    is rebuilt from scratch if it was built with other parameters.
+
+    sound_folders_dir:
+        Directory of the sound files (one subfolder per condition).
+    store_dir:
+        Directory of the store.
+    mel_f:
+        Mel-frequency filter bank (e.g., filter_banks.get_mel_filter_bank(sr)).
+    sr:
+        Sampling rate (default: 44100).
+    window_length:
+        Window length (time in seconds; default: 0.0256).
+    step_sizes:
+        Step sizes (times in seconds; default: (0.001, 0.010)).
+    dtype:
+        Precision of the stored log spectra (default: "float32").
+    spectra_options:
+        Keyword arguments of the RecordingSpectra, e.g., backend (expects a
+        dictionary; default: None).
+    """
+    if spectra_options is None:
+        spectra_options = {}
+    parameters = {"sr": sr,
+                  "res_type": audio_io.res_type,
+                  "n_fft": get_n_fft(mel_f),
+                  "n_mels": mel_f.shape[0],
+                  "filter_bank_sum": float(np.asarray(mel_f, dtype = np.float64).sum()),
+                  "window_length": window_length,
+                  "step_sizes": list(step_sizes),
+                  "dtype": str(np.dtype(dtype))}
+
+    # Keep the entries of an existing store with the same parameters
+    recordings = {}
+    os.makedirs(os.path.join(store_dir, "chunks"), exist_ok = True)
+    if os.path.exists(os.path.join(store_dir, FeatureStore.index_name)):
+        store = FeatureStore(store_dir)
+        if store.parameters == parameters:
+            recordings = store.recordings
+
+    sound_files = sorted(os.path.join(subfolder, filename)
+                         for subfolder in os.listdir(sound_folders_dir)
+                         if os.path.isdir(os.path.join(sound_folders_dir, subfolder))
+                         for filename in os.listdir(os.path.join(sound_folders_dir, subfolder))
+                         if filename.lower().endswith(".wav"))
+    for count, recording in enumerate(sound_files):
+        full_sound_file_path = os.path.join(sound_folders_dir, recording)
+        stat = os.stat(full_sound_file_path)
+        entry = recordings.get(recording)
+        if entry is not None and entry["size"] == stat.st_size and \
+            entry["mtime"] == stat.st_mtime:
+            continue
+
+        sound = load_audio(full_sound_file_path, sr)
+        entry = {"size": stat.st_size,
+                 "mtime": stat.st_mtime,
+                 "no_of_samples": len(sound),
+                 "features": {}}
+        for step_size in step_sizes:
+            spectra = RecordingSpectra(sound, sr, mel_f, window_length = window_length,
+                                       step_size = step_size, **spectra_options)
+            log_spectra = np.log(spectra.get_spectra(0, spectra.no_of_frames)).T
+            chunk = os.path.join("chunks", "{}_{}.npy".format(
+                    recording.replace(os.sep, "__")[:-len(".wav")], step_size))
+            _save_atomically(os.path.join(store_dir, chunk),
+                             np.ascontiguousarray(log_spectra, dtype = dtype))
+            entry["features"][str(step_size)] = {"chunk": chunk,
+                                                 "hop_length": spectra.hop_length,
+                                                 "no_of_frames": spectra.no_of_frames}
+        recordings[recording] = entry
+
+        # Save the index after each recording, so an interrupted build keeps
+        # what it has done
+        _save_index(store_dir, parameters, recordings)
+
+        # Update progress
+        sys.stdout.write("\rProgress: {0}%".format(round((float(count + 1) / len(sound_files)) * 100)))
+        sys.stdout.flush()
+
+    _save_index(store_dir, parameters, recordings)
+    print("\nDone!")
+
+def _save_index(store_dir, parameters, recordings):
+    """ Writes the index of a store. """
+    fd, tmp_path = tempfile.mkstemp(dir = store_dir, suffix = ".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump({"parameters": parameters, "recordings": recordings}, f, indent = 1)
+    os.replace(tmp_path, os.path.join(store_dir, FeatureStore.index_name))
+
+def _save_atomically(path, array):
+    """ Saves an array to a .npy file through a temporary file, so that
+    readers never see a partly written file. """
+    fd, tmp_path = tempfile.mkstemp(dir = os.path.dirname(path), suffix = ".npy")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 17:05:48 2026
+
+@author: adamguo
+
+Mel-frequency filter banks, made once per set of parameters and shared by
+all the Spectra that use them.
+"""
+import librosa
+import numpy as np
+import scipy.sparse as sp
+from functools import lru_cache
+
+class MelFilterBank:
+    def __init__(self, weights):
+        """
+        A filter bank stored as a read-only sparse matrix of the frequency
+        bins that at least one filter covers (bins 5 to 278 of 1025 for the
+        filter bank of the analysis), so that projecting a spectrum onto it
+        only touches those bins. The weights keep their precision; a float32
+        copy is made for projecting float32 spectra (see dot). It can be used
+        like the dense filter bank (mel_f.dot(spectrum), mel_f.shape,
+        np.asarray(mel_f)).
+
+        weights:
+            Filter bank (expects an array with one row per filter and one
+            column per frequency bin, e.g., from librosa.filters.mel).
+        """
+        weights = np.asarray(weights)
+        if not np.issubdtype(weights.dtype, np.floating):
+            weights = weights.astype(np.float64)
+        covered = np.flatnonzero(np.any(weights != 0, axis = 0))
+        self.shape = weights.shape
+        self.start = covered[0] if len(covered) else 0
+        self.stop = covered[-1] + 1 if len(covered) else 0
+        self.band = _read_only_csr(weights[:, self.start:self.stop])
+
+        # Made on first use (see get_band)
+        self.single_band = None
+
+    def get_band(self, dtype):
+        """ Gets the sparse weights of the covered bins for projecting
+        spectra in dtype: a float32 copy for float32, and the weights as
+        they were given otherwise. """
+        if np.dtype(dtype) == np.float32 and self.band.dtype != np.float32:
+            if self.single_band is None:
+                self.single_band = _read_only_csr(self.band.astype(np.float32))
+            return self.single_band
+        return self.band
+
+    def dot(self, spectrum, dtype = None):
+        """ Projects a spectrum (one frequency bin per row; one or more
+        columns) onto the filters, in the precision of the spectrum (or in
+        dtype, if given). """
+        dtype = np.dtype(spectrum.dtype if dtype is None else dtype)
+        band_spectrum = spectrum[self.start:self.stop].astype(dtype, copy = False)
+        return self.get_band(dtype).dot(band_spectrum)
+
+    def toarray(self):
+        """ Gets the filter bank as a dense array (in the precision of the
+        weights). """
+        weights = np.zeros(self.shape, dtype = self.band.dtype)
+        weights[:, self.start:self.stop] = self.band.toarray()
+        return weights
+
+    def __array__(self, dtype = None, copy = None):
+        return self.toarray() if dtype is None else self.toarray().astype(dtype)
+
+def _read_only_csr(weights):
+    """ Gets a sparse (CSR) matrix of some weights with read-only arrays. """
+    band = sp.csr_matrix(weights)
+    for array in (band.data, band.indices, band.indptr):
+        array.flags.writeable = False
+    return band
+
+def get_mel_filter_bank(sr, n_fft = 2048, n_mels = 29, fmin = 100.0, fmax = 6000.0,
+                        htk = True, norm = 1):
+    """
+    Gets a Mel-frequency filter bank (a MelFilterBank) from librosa.filters.mel,
+    with float64 weights (float32 spectra are projected onto a float32 copy).
+    Filter banks are made once per set of parameters and kept for later calls
+    (the 32 most recently used), so they must not be changed. The defaults
+    are those of the analysis.
+
+    sr:
+        Sampling rate.
+    n_fft:
+        FFT size (default: 2048).
+    n_mels:
+        Number of filters (default: 29).
+    fmin:
+        Lowest frequency (in Hz; default: 100.0).
+    fmax:
+        Highest frequency (in Hz; default: 6000.0).
+    htk:
+        Use the HTK formula for the Mel scale (default: True).
+    norm:
+        Normalization of the filters (see librosa.filters.mel; default: 1).
+    """
+    # Positional arguments, so that the same parameters always give the same 
+    # key of the cache
+    return _make_mel_filter_bank(sr, n_fft, n_mels, fmin, fmax, htk, norm)
+
+@lru_cache(maxsize = 32)
+def _make_mel_filter_bank(sr, n_fft, n_mels, fmin, fmax, htk, norm):
+    return MelFilterBank(librosa.filters.mel(sr = sr, n_fft = n_fft, n_mels = n_mels,
+                                             fmin = fmin, fmax = fmax, htk = htk,
+                                             norm = norm, dtype = np.float64))
@@ -8,6 +8,17 @@ Created on Fri Dec 25 22:05:19 2020
 
 import os
 import pandas as pd
+from table_io import write_table, get_table_path
+
+# Columns of the file metadata (in the order of extract_file_info)
+file_metadata_columns = ["Filename","Filename_wav",
+                         "Filename_TextGrid",
+                         "Condition", "Task_type",
+                         "Style", "Scene", "Scene_ID",
+                         "Speaker_tier_AB",
+                         "Speaker", "Speaker_sex",
+                         "Partner", "Partner_sex",
+                         "Position_number"]
 
 def get_files_metadata(input_dir, output_dir,
                        condition_code_dict = {"noBarrierCondition": "NB",
@@ -15,7 +26,8 @@ def get_files_metadata(input_dir, output_dir,
                                               "vocoderCondition": "VOC",
                                               "L2Condition": "L2",
                                               "sentenceReadingCasual": "READ_CO",
-                                              "sentenceReadingClear": "READ_CL"}):
+                                              "sentenceReadingClear": "READ_CL"},
+                       table_format = "parquet"):
     """
     Gets the metadata of all recording files, such as the speaker ID, the 
     condition that each file belongs to, etc. Each subfolder in the input 
@@ -28,19 +40,15 @@ def get_files_metadata(input_dir, output_dir,
         Directory where the file metadata are to be saved.
     condition_code_dict:
         A dictionary specifying the code/abbreviation for each condition
+    table_format:
+        Format of the output, all_file_metadata: "parquet", "csv" or "xlsx" 
+        (default: "parquet"; see table_io).
     """
     # Get a list of the directories of all the subfolders
     subfolders_dirs = [f.path for f in os.scandir(input_dir) if f.is_dir()]
     
     # Create an empty dataframe for storing the file information
-    file_metadata = pd.DataFrame(columns = ["Filename","Filename_wav",
-                                            "Filename_TextGrid",
-                                            "Condition", "Task_type",
-                                            "Style", "Scene", "Scene_ID",
-                                            "Speaker_tier_AB",
-                                            "Speaker", "Speaker_sex",
-                                            "Partner", "Partner_sex",
-                                            "Position_number"])
+    file_metadata = pd.DataFrame(columns = file_metadata_columns)
     
     # Iterate over all subfolders
     for subfolder in subfolders_dirs:
@@ -68,10 +76,9 @@ def get_files_metadata(input_dir, output_dir,
             except ValueError:
                 print("\nLength of the file info list doesn't match the columns. Make sure that all file info is in the list!")
                 
-    # Save to Excel
-    file_metadata.to_excel(
-            os.path.join(output_dir, "all_file_metadata.xlsx"),
-            index = False)
+    # Save the table
+    write_table(file_metadata,
+                get_table_path(output_dir, "all_file_metadata", table_format))
 
 
 def extract_file_info(file_name, cond_code):
@@ -5,20 +5,35 @@ Created on Fri Dec 25 15:34:09 2020
 
 @author: adamguo
 """
-import os, sys, textgrids
+import os, sys
 import pandas as pd
+import numpy as np
+from table_io import read_table, write_table, get_table_path
+from metadata_catalog import MetadataCatalog
+from textgrid_io import iter_textgrids
 
 sys.path.append("/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/python scripts")
 from get_keywords_tiers import get_KW_phones_ints_and_times
 
+# Columns of the phone pair data that follow the file metadata
+phone_pair_columns = ["Keyword", "Repetition", "Phone_pair",
+                      "First_phone", "First_phone_start_t",
+                      "First_phone_end_t",
+                      "Second_phone", "Second_phone_start_t",
+                      "Second_phone_end_t"]
+
 def get_phone_pairs_data(input_dir, output_dir,
                          file_metadata = None,
                          words_tier_name = "words_KW",
-                         phones_tier_name = "phones_KW"):
+                         phones_tier_name = "phones_KW",
+                         table_format = "parquet",
+                         tolerance = 1e-6,
+                         n_jobs = 1,
+                         textgrid_cache_path = None):
     """
     This functions gets the start and end points of each pair of adjacent phones 
     in each keyword (and some other information about that word)). The output 
-    is an Excel dataframe that is ready to be used for coarticulation analysis.
+    is a table (phone_pairs_data) that is ready to be used for coarticulation analysis.
     
     input_dir:
         Directory of the subfolders containing the TextGrid files. Note: each 
@@ -27,83 +42,91 @@ def get_phone_pairs_data(input_dir, output_dir,
     ouput_dir:
         Directory of the folder where the output will be saved.
     file_metadata:
-        Path to an Excel file containing information about all WAV/TextGrid 
-        files (default: None).
+        Path to a table (see table_io.read_table), or a dataframe, containing 
+        information about all WAV/TextGrid files (default: None).
     words_tier_name:
         Word-aligned annotation tier for the keywords (default: "words_KW").
     phones_tier_name:
         Phone-aligned annotation tier for the keywords (default: "phones_KW").
+    table_format:
+        Format of the output: "parquet", "csv" or "xlsx" (default: "parquet"; 
+        see table_io).
+    tolerance:
+        Largest difference between the end of a phone and the start of the 
+        next one for the two to count as adjacent (time in seconds; default: 
+        1e-6, well under one sample).
+    n_jobs:
+        Number of worker processes that read the TextGrids (default: 1, i.e., 
+        no worker processes; see textgrid_io.iter_textgrids).
+    textgrid_cache_path:
+        Path to a cache of parsed TextGrids (an SQLite file; see 
+        textgrid_cache.TextGridCache) (default: None, i.e., no cache). 
+        TextGrids that have not changed since an earlier run are read from 
+        the cache instead of being parsed again.
     """
     # Load file name metadata
     if file_metadata is None:
         
         # If the path to the metadata is not provided, try getting the data 
         # from the # following folder.
-        file_metadata_dir = "/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/metadata/all_file_metadata.xlsx"
+        file_metadata_dir = "/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/metadata/all_file_metadata.parquet"
         print("\nNo file metadata provided. Try reading from " + \
               file_metadata_dir + "...")
         
         try:
-            file_metadata = pd.read_excel(file_metadata_dir)
+            file_metadata = read_table(file_metadata_dir)
         
         except FileNotFoundError:
             print("\nNo such file or directory. Please provide the file metadata.")
     
-    # Create an empty dataframe for storing the phone pairs data. This dataframe 
-    # should have all the columns from the metadata plus some other information 
-    # about each pair of phones.
-    phone_pairs_data = pd.DataFrame(columns = list(file_metadata.columns) + \
-                                    ["Keyword", "Repetition", "Phone_pair",
-                                     "First_phone", "First_phone_start_t",
-                                     "First_phone_end_t",
-                                     "Second_phone", "Second_phone_start_t",
-                                     "Second_phone_end_t"])
+    elif isinstance(file_metadata, str):
+        file_metadata = read_table(file_metadata)
+    
+    # Create an empty list for storing the phone pairs data of each TextGrid. 
+    # These dataframes have all the columns from the metadata plus some other 
+    # information about each pair of phones, and are concatenated at the end.
+    phone_pairs_frames = []
     
-    # Get a list of all subfolders in input_dir.
-    subfolders_dirs = [f.path for f in os.scandir(input_dir) if f.is_dir()]
+    # Index the metadata by file name
+    catalog = MetadataCatalog(file_metadata)
     
-    # Iterate over all subfolders:
-    for subfolder in subfolders_dirs:
+    # Iterate over all the TextGrid files in the subfolders of input_dir (read 
+    # in worker processes, with only the two keyword tiers):
+    for textgrid_path, textgrid in iter_textgrids(input_dir,
+                                                  tier_names = [words_tier_name,
+                                                                phones_tier_name],
+                                                  n_jobs = n_jobs,
+                                                  cache_path = textgrid_cache_path):
         
-        # Get subfolder (condition) name
-        # subfolder_name = subfolder.split("/")[-1]
+        # Get the metadata of this TextGrid.
+        textgrid_metadata = catalog.get(os.path.basename(textgrid_path))
         
-        # Get all the TextGrid files in this input subfolder
-        all_textgrids_files = [i for i in os.listdir(subfolder) if i.endswith(".TextGrid")]
+        # Now, call to the get_KW_phones_ints_and_times function from the 
+        # get_keywords_tiers module to get the time data (and other info.) 
+        # of each individual phone in the TextGrid object.
+        # Note: only phone_time_data is needed.
+        _, phone_time_data = get_KW_phones_ints_and_times(textgrid.view(),
+                                                          words_tier_name = words_tier_name,
+                                                          phones_tier_name = phones_tier_name)
         
-        # Iterate over all the TextGrid files:
-        for textgrid_file in all_textgrids_files:
-            
-            # Get the metadata of this TextGrid.
-            textgrid_metadata = file_metadata[file_metadata["Filename_TextGrid"] == textgrid_file].values.tolist()[0]
-            
-            # Create TextGrid object.
-            textgrid = textgrids.TextGrid(os.path.join(subfolder,
-                                                       textgrid_file))
-            
-            # Now, call to the get_KW_phones_ints_and_times function from the 
-            # get_keywords_tiers module to get the time data (and other info.) 
-            # of each individual phone in the TextGrid object.
-            # Note: only phone_time_data is needed.
-            _, phone_time_data = get_KW_phones_ints_and_times(textgrid,
-                                                              words_tier_name = words_tier_name,
-                                                              phones_tier_name = phones_tier_name)
-            
-            # Call to the helper function to process phone_time_data into a 
-            # formate appropriate for coarticulation analysis (i.e., each row 
-            # represents a pair of adjacent phones in a keyword) and update the 
-            # phone_pairs_data dataframe.
-            phone_pairs_data = update_data(phone_pairs_data,
-                                           phone_time_data,
-                                           textgrid_metadata)
+        # Call to the helper function to process phone_time_data into a 
+        # formate appropriate for coarticulation analysis (i.e., each row 
+        # represents a pair of adjacent phones in a keyword).
+        phone_pairs_frames.append(get_adjacent_phone_pairs(phone_time_data,
+                                                           textgrid_metadata,
+                                                           list(file_metadata.columns),
+                                                           tolerance = tolerance))
+    
+    # Concatenate the phone pairs data of all TextGrids
+    phone_pairs_data = concat_phone_pairs(phone_pairs_frames,
+                                          list(file_metadata.columns))
     
     # Write the phone pairs data to the output directory.
-    phone_pairs_data.to_excel(
-            os.path.join(output_dir, "phone_pairs_data.xlsx"),
-            index = False)
+    write_table(phone_pairs_data,
+                get_table_path(output_dir, "phone_pairs_data", table_format))
     print("\nDone! The phone pairs data have been saved to " + output_dir)
 
-def update_data(phone_pairs_data, phone_time_data, metadata):
+def update_data(phone_pairs_data, phone_time_data, metadata, tolerance = 1e-6):
     """
     Upates phone pair dataframe.
     
@@ -114,66 +137,70 @@ def update_data(phone_pairs_data, phone_time_data, metadata):
     metadata:
         Metadata about the TextGrid/wav to which the to-be-added dataframe 
         belongs (expects a list).
+    tolerance:
+        See get_adjacent_phone_pairs (default: 1e-6).
     """
+    metadata_columns = list(phone_pairs_data.columns[:len(metadata)])
+    return concat_phone_pairs([phone_pairs_data,
+                               get_adjacent_phone_pairs(phone_time_data,
+                                                        metadata,
+                                                        metadata_columns,
+                                                        tolerance = tolerance)],
+                              metadata_columns)
+
+def get_adjacent_phone_pairs(phone_time_data, metadata, metadata_columns,
+                             tolerance = 1e-6):
+    """
+    Gets the phone pair data of one TextGrid: one row per pair of consecutive 
+    rows (phones) of phone_time_data where the first phone ends where the 
+    second one starts. If two phones are adjacent, they are of the same word, 
+    so the keyword and the repetition are those of the first phone.
     
-    # Iterate over rows of phone_time_data:
-    for index, row in phone_time_data.iterrows():
-        
-        # If this in the first row (phone) in the dataframe, then let prev_phone 
-        # be the current phone.
-        if index == 0:
-            prev_phone = row
-            
-        else:
-            # Check if current_phone is adjacent to prev_phone. If yes, create 
-            # all phone pair information and update the dataframe:
-            current_phone = row
-            if prev_phone["End_t"] == current_phone["Start_t"]:
-                
-                # Get phone pair information.
-                # If the two phones are adjacent, they must be of the same word. 
-                # So using either prev_phone or current_phone to get keyword and 
-                # repetition should be OK.
-                keyword = prev_phone["Keyword"]
-                repetition = prev_phone["Repetition"]
-                
-                # Concatenate the phones with "_"
-                phone_pair = prev_phone["Phone"] + "_" + current_phone["Phone"]
-                
-                # Time info. of first phone
-                first_phone = prev_phone["Phone"]
-                first_phone_start_t = prev_phone["Start_t"]
-                first_phone_end_t = prev_phone["End_t"]
-                
-                # Time info. of second phone
-                second_phone = current_phone["Phone"]
-                second_phone_start_t = current_phone["Start_t"]
-                second_phone_end_t = current_phone["End_t"]
-                
-                # Now create a list with all information about this phoone pair 
-                # (including the metadata)
-                phone_pair_info = metadata + [keyword, repetition, phone_pair,
-                                              first_phone, first_phone_start_t,
-                                              first_phone_end_t,
-                                              second_phone, second_phone_start_t,
-                                              second_phone_end_t]
-                
-                # Update phone_pairs_data
-                try:
-                    phone_pairs_data.loc[len(phone_pairs_data)] = phone_pair_info
-                
-                except ValueError:
-                     print("\nLength of the phone pair info list doesn't match the columns. Make sure that all phone pair info is in the list!")
-                
-                # Finally, let current_phone be prev_phone
-                prev_phone = current_phone
-             
-            # If no, just let current_phone be prev_phone
-            else:
-                prev_phone = current_phone
+    phone_time_data:
+        Time data of the keyword phones (columns Keyword, Repetition, Phone, 
+        Start_t and End_t).
+    metadata:
+        Metadata about the TextGrid/wav (expects a list).
+    metadata_columns:
+        Columns of the metadata.
+    tolerance:
+        Largest difference between the end of a phone and the start of the 
+        next one for the two to count as adjacent (time in seconds; default: 
+        1e-6).
+    """
+    start_t = phone_time_data["Start_t"].values.astype(float)
+    end_t = phone_time_data["End_t"].values.astype(float)
     
-    # Return the updated phone_pairs_data
-    return phone_pairs_data
+    # Positions of the first phones of the adjacent pairs (the second phone 
+    # of each pair is the next row)
+    first = np.flatnonzero(np.abs(end_t[:-1] - start_t[1:]) <= tolerance)
+    second = first + 1
+    
+    phones = phone_time_data["Phone"].values.astype(str)
+    columns = {column: [value] * len(first) for column, value
+               in zip(metadata_columns, metadata)}
+    columns.update(zip(phone_pair_columns,
+                       [phone_time_data["Keyword"].values[first],
+                        phone_time_data["Repetition"].values[first],
+                        np.char.add(np.char.add(phones[first], "_"), phones[second]),
+                        phones[first], start_t[first], end_t[first],
+                        phones[second], start_t[second], end_t[second]]))
+    return pd.DataFrame(columns, columns = list(metadata_columns) + phone_pair_columns)
+
+def concat_phone_pairs(phone_pairs_frames, metadata_columns):
+    """
+    Concatenates the phone pair data of several TextGrids (see 
+    get_adjacent_phone_pairs) into one dataframe, in one go.
+    
+    phone_pairs_frames:
+        Phone pair data (expects a list of dataframes).
+    metadata_columns:
+        Columns of the metadata (for an empty result).
+    """
+    phone_pairs_frames = [frame for frame in phone_pairs_frames if len(frame) > 0]
+    if len(phone_pairs_frames) == 0:
+        return pd.DataFrame(columns = list(metadata_columns) + phone_pair_columns)
+    return pd.concat(phone_pairs_frames, ignore_index = True)
 
 if __name__ == "__main__":
     input_dir = "/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/recordings/force-aligned keywords"
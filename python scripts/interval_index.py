@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 17:52:09 2026
+
+@author: adamguo
+
+Index of the intervals of a tier by time, for finding the intervals that lie
+within (or overlap) a time window, such as the vowels of a keyword token or
+the phones of a keyword, without going through the whole tier every time.
+"""
+import numpy as np
+
+class IntervalIndex:
+    def __init__(self, xmin, xmax):
+        """
+        Sorts intervals by start time, so that the intervals within or
+        overlapping a window are found with binary searches
+        (numpy.searchsorted). When the end times are in order too (as in an
+        interval tier of a TextGrid, where intervals do not overlap), a query
+        is only two binary searches; otherwise the candidates that the start
+        times leave are checked one by one.
+
+        xmin:
+            Start times of the intervals (expects an array).
+        xmax:
+            End times of the intervals (expects an array).
+        """
+        xmin = np.asarray(xmin, dtype = np.float64)
+        xmax = np.asarray(xmax, dtype = np.float64)
+        self.order = np.argsort(xmin, kind = "stable")
+        self.xmin = xmin[self.order]
+        self.xmax = xmax[self.order]
+
+        # Latest end time up to each interval, for the overlap queries
+        self.max_xmax = np.maximum.accumulate(self.xmax) if len(xmax) > 0 else self.xmax
+        self.ends_sorted = bool(np.all(self.xmax[1:] >= self.xmax[:-1]))
+
+    @classmethod
+    def from_tier(cls, tier):
+        """ Indexes the intervals of a textgrid_io.TierArrays. """
+        return cls(tier.xmin, tier.xmax)
+
+    @classmethod
+    def from_intervals(cls, intervals):
+        """ Indexes a list of intervals (objects with xmin and xmax, e.g., a
+        tier of a textgrids.TextGrid or of a textgrid_io.TextGridView). """
+        return cls([interval.xmin for interval in intervals],
+                   [interval.xmax for interval in intervals])
+
+    def __len__(self):
+        return len(self.order)
+
+    def contained_in(self, start, end):
+        """ Gets the positions (in the order the intervals were given) of
+        the intervals that lie within [start, end], i.e., with xmin >= start
+        and xmax <= end. """
+        return self.contained_in_each([start], [end])[0]
+
+    def overlapping(self, start, end):
+        """ Gets the positions (in the order the intervals were given) of
+        the intervals that overlap (start, end), i.e., with xmin < end and
+        xmax > start. """
+        return self.overlapping_each([start], [end])[0]
+
+    def contained_in_each(self, starts, ends):
+        """
+        Gets the positions of the intervals that lie within each of several
+        windows (see contained_in), with the binary searches of all the
+        windows done at once.
+
+        starts:
+            Start times of the windows (expects an array).
+        ends:
+            End times of the windows (expects an array).
+        """
+        starts = np.asarray(starts, dtype = np.float64)
+        ends = np.asarray(ends, dtype = np.float64)
+        lower = np.searchsorted(self.xmin, starts, side = "left")
+        if self.ends_sorted:
+            upper = np.searchsorted(self.xmax, ends, side = "right")
+            return self._get_positions(lower, upper)
+        upper = np.searchsorted(self.xmin, ends, side = "right")
+        return self._get_positions(lower, upper, latest_ends = ends)
+
+    def overlapping_each(self, starts, ends):
+        """
+        Gets the positions of the intervals that overlap each of several
+        windows (see overlapping), with the binary searches of all the
+        windows done at once.
+
+        starts:
+            Start times of the windows (expects an array).
+        ends:
+            End times of the windows (expects an array).
+        """
+        starts = np.asarray(starts, dtype = np.float64)
+        ends = np.asarray(ends, dtype = np.float64)
+        lower = np.searchsorted(self.max_xmax, starts, side = "right")
+        upper = np.searchsorted(self.xmin, ends, side = "left")
+        if self.ends_sorted:
+            return self._get_positions(lower, upper)
+        return self._get_positions(lower, upper, earliest_ends = starts)
+
+    def _get_positions(self, lower, upper, latest_ends = None, earliest_ends = None):
+        """ Gets the positions of the intervals in each range [lower, upper)
+        of the sorted intervals, keeping only those that end at or before
+        latest_ends, or after earliest_ends, of the window if given. """
+        positions = []
+        for i, (first, last) in enumerate(zip(lower.tolist(), upper.tolist())):
+            if last <= first:
+                positions.append(np.empty(0, dtype = self.order.dtype))
+                continue
+            window_positions = self.order[first:last]
+            if latest_ends is not None:
+                window_positions = window_positions[self.xmax[first:last] <= latest_ends[i]]
+            elif earliest_ends is not None:
+                window_positions = window_positions[self.xmax[first:last] > earliest_ends[i]]
+            positions.append(np.sort(window_positions))
+        return positions
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 10:12:41 2026
+
+@author: adamguo
+
+On-disk journal of the coarticulation measures, so that a long run of
+analyze_coarticulation can be resumed after a crash.
+"""
+import os, sqlite3, hashlib
+import pandas as pd
+import numpy as np
+
+class MeasuresJournal:
+    def __init__(self, path, phone_pairs_data, settings,
+                 checkpoint_interval = 10):
+        """
+        Opens (or creates) a journal of the measures of the phone pairs. Rows
+        are identified by their position in phone_pairs_data; the journal
+        also stores a fingerprint of the phone pair data and of the analysis
+        settings, and refuses to resume a run that used different ones.
+
+        path:
+            Path to the journal (an SQLite file).
+        phone_pairs_data:
+            Phone pair data being analyzed.
+        settings:
+            Analysis settings that affect the measures (expects a dictionary).
+        checkpoint_interval:
+            Number of recordings between two writes to disk (default: 10).
+        """
+        self.path = path
+        self.checkpoint_interval = checkpoint_interval
+        self.pending = []
+        self.no_of_pending_recordings = 0
+
+        fingerprint = hashlib.sha1()
+        fingerprint.update(pd.util.hash_pandas_object(
+                phone_pairs_data[["Filename_wav", "Condition",
+                                  "First_phone_start_t", "First_phone_end_t",
+                                  "Second_phone_start_t", "Second_phone_end_t"]],
+                index = True).values.tobytes())
+        fingerprint.update(repr(sorted(settings.items())).encode())
+        fingerprint = fingerprint.hexdigest()
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta "
+                                "(key TEXT PRIMARY KEY, value TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS measures "
+                                "(position INTEGER PRIMARY KEY, "
+                                "spectral_distance REAL, "
+                                "raw_transition_duration REAL, "
+                                "relative_transition_duration REAL)")
+
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+        if row is None:
+            self.connection.execute("INSERT INTO meta VALUES ('fingerprint', ?)",
+                                    (fingerprint,))
+            self.connection.commit()
+
+        elif row[0] != fingerprint:
+            self.connection.close()
+            raise ValueError("The journal {} belongs to a run with different phone "
+                             "pair data or settings. Delete it to start over.".format(path))
+
+    def get_measures(self):
+        """ Gets the positions and the measures (spectral distance, raw and
+        relative transition durations) of the phone pairs already done. """
+        rows = self.connection.execute("SELECT * FROM measures ORDER BY position").fetchall()
+        rows = np.array(rows, dtype = float).reshape(-1, 4)
+        return rows[:, 0].astype(int), rows[:, 1:]
+
+    def add(self, positions, measures):
+        """ Adds the measures of some phone pairs (written at the next
+        checkpoint). """
+        self.pending.extend(zip(np.atleast_1d(positions).tolist(),
+                                *np.atleast_2d(measures).T.tolist()))
+
+    def end_recording(self):
+        """ Marks the end of a recording and writes the pending measures to
+        disk every checkpoint_interval recordings. """
+        self.no_of_pending_recordings += 1
+        if self.no_of_pending_recordings >= self.checkpoint_interval:
+            self.flush()
+
+    def flush(self):
+        """ Writes the pending measures to disk. """
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO measures VALUES (?, ?, ?, ?)",
+                                        self.pending)
+        self.pending = []
+        self.no_of_pending_recordings = 0
+
+    def close(self, remove = False):
+        """ Writes the pending measures and closes the journal (and removes
+        it if remove is True). """
+        self.flush()
+        self.connection.close()
+        if remove:
+            os.remove(self.path)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 13:22:48 2026
+
+@author: adamguo
+
+Lookup of the metadata of a recording (see get_files_metadata) by its file
+name, for the scripts that go through the TextGrids one at a time.
+"""
+
+class MetadataCatalog:
+    # Columns the metadata can be looked up by
+    key_columns = ["Filename_TextGrid", "Filename_wav", "Filename"]
+
+    def __init__(self, file_metadata):
+        """
+        Indexes the file metadata by each of the key_columns, so that the
+        row of a file is found with a dictionary lookup instead of a scan of
+        the whole table. If a file name appears more than once, the first
+        row is used.
+
+        file_metadata:
+            File metadata (a dataframe; see get_files_metadata).
+        """
+        self.file_metadata = file_metadata
+        self.columns = list(file_metadata.columns)
+        self.rows = file_metadata.values.tolist()
+        self.index = {}
+        for column in self.key_columns:
+            if column in file_metadata.columns:
+                positions = {}
+                for position, name in enumerate(file_metadata[column].tolist()):
+                    positions.setdefault(name, position)
+                self.index[column] = positions
+
+    def get_position(self, name, column = "Filename_TextGrid"):
+        """ Gets the row position of a file in the metadata. Raises a
+        KeyError naming the file if it is not in the metadata. """
+        if column not in self.index:
+            raise KeyError("The file metadata has no {} column".format(column))
+        try:
+            return self.index[column][name]
+        except KeyError:
+            raise KeyError("No metadata for {} {!r}. Check that the file metadata "
+                           "covers every file.".format(column, name)) from None
+
+    def get(self, name, column = "Filename_TextGrid"):
+        """
+        Gets the metadata of a file as a list (in the order of the columns).
+
+        name:
+            File name (e.g., "....TextGrid").
+        column:
+            Column of the file name: "Filename_TextGrid", "Filename_wav" or
+            "Filename" (default: "Filename_TextGrid").
+        """
+        return self.rows[self.get_position(name, column)][:]
+
+    def get_frame(self, name, column = "Filename_TextGrid"):
+        """ Gets the metadata of a file as a one-row dataframe (with the
+        index 0). See get. """
+        position = self.get_position(name, column)
+        return self.file_metadata.iloc[[position]].reset_index(drop = True)
+
+    def __contains__(self, name):
+        return any(name in positions for positions in self.index.values())
+
+    def __len__(self):
+        return len(self.rows)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 18:31:09 2026
+
+@author: adamguo
+
+Sensitivity analyses of the coarticulation measures: the measures of every
+phone pair for a grid of settings (window length, number of Mel filters and
+trans_prop), sharing the work that the settings have in common.
+"""
+import os, sys, itertools
+import numpy as np
+from coarticulation_classes import Spectra, Coarticulation, stft_magnitude, \
+    single_precision
+from filter_banks import get_mel_filter_bank
+from analyze_coarticulation import condition_folder_code_dict, measure_columns, \
+    get_sample_bounds, get_analysis_n_fft, load_recording
+from table_io import read_table, write_table, get_table_path
+
+# Columns of the settings in the output
+setting_columns = ["Window_length", "N_mels", "Trans_prop"]
+
+def sweep_coarticulation(sound_folders_dir,
+                         phone_pairs_data_dir,
+                         output_dir,
+                         window_lengths = (0.0256,),
+                         n_mels = (29,),
+                         trans_props = (0.8,),
+                         sr = 44100,
+                         stft_backend = "librosa",
+                         dtype = "float64",
+                         table_format = "parquet"):
+    """
+    Gets the coarticulation measures of the phone pairs for every combination
+    of the settings and saves them as a long table (coart_sweep in
+    output_dir): the phone pair data repeated once per combination, with one
+    column per setting (see setting_columns) and the measures. Each
+    recording is loaded once; for each phone pair the magnitude STFT is
+    computed once per window length (and step size), each filter bank is
+    applied to those magnitudes, and every trans_prop is evaluated on the
+    same f12 trajectory. The measures of each combination are those of
+    analyze_coarticulation with that setting.
+
+    sound_folders_dir:
+        Directory of the sound files (one subfolder per condition).
+    phone_pairs_data_dir:
+        Directory of the phone pair data.
+    output_dir:
+        Directory of the output.
+    window_lengths:
+        Window lengths (times in seconds; default: (0.0256,)).
+    n_mels:
+        Numbers of Mel filters (default: (29,)).
+    trans_props:
+        Proportions of the mean f12 values that bound the transition
+        (default: (0.8,)).
+    sr:
+        Sampling rate (default: 44100).
+    stft_backend:
+        STFT backend (see analyze_coarticulation; default: "librosa").
+    dtype:
+        Precision of the spectra (see analyze_coarticulation; default:
+        "float64").
+    table_format:
+        Format of the output (see analyze_coarticulation; default:
+        "parquet").
+    """
+    phone_pairs_data = read_table(phone_pairs_data_dir)
+    nrow = phone_pairs_data.shape[0]
+    settings = list(itertools.product(window_lengths, n_mels, trans_props))
+    spectra_options = {"backend": stft_backend, "dtype": np.dtype(dtype)}
+
+    # FFT size of each window length (at least the window)
+    n_ffts = {window_length: max(get_analysis_n_fft(sr),
+                                 int(2 ** np.ceil(np.log2(int(sr * window_length)))))
+              for window_length in window_lengths}
+
+    # One row per phone pair, one column per combination of settings (in the
+    # order of settings), one plane per measure
+    measures = np.full((nrow, len(settings), len(measure_columns)), np.nan)
+
+    bounds = get_sample_bounds(phone_pairs_data, sr)
+    groups = phone_pairs_data.groupby(["Condition", "Filename_wav"],
+                                      sort = False, observed = True).indices
+    for count, ((condition_code, filename_wav), positions) in enumerate(groups.items()):
+        full_sound_file_path = os.path.join(sound_folders_dir,
+                                            condition_folder_code_dict[condition_code],
+                                            filename_wav)
+        sound = load_recording(full_sound_file_path, sr,
+                               get_mel_filter_bank(sr, n_fft = max(n_ffts.values())),
+                               bounds[positions])
+
+        for i in positions:
+            first_phone_ts = sound[bounds[i, 0]:bounds[i, 1]]
+            second_phone_ts = sound[bounds[i, 2]:bounds[i, 3]]
+            measures[i] = get_pair_sweep_measures(first_phone_ts, second_phone_ts,
+                                                  sr, settings, n_ffts,
+                                                  spectra_options)
+
+        # Update progress
+        sys.stdout.write("\rProgress: {0}%".format(round((float(count + 1) / len(groups)) * 100)))
+        sys.stdout.flush()
+
+    # Long table: the rows of each phone pair, one per combination of settings
+    coart_sweep = phone_pairs_data.iloc[np.repeat(np.arange(nrow), len(settings))]
+    coart_sweep = coart_sweep.reset_index(drop = True)
+    for i, column in enumerate(setting_columns):
+        coart_sweep[column] = np.tile([setting[i] for setting in settings], nrow)
+    for i, column in enumerate(measure_columns):
+        coart_sweep[column] = measures[:, :, i].ravel()
+
+    write_table(coart_sweep, get_table_path(output_dir, "coart_sweep", table_format))
+    print("\nDone!")
+    return coart_sweep
+
+def get_pair_sweep_measures(first_phone_ts, second_phone_ts, sr, settings, n_ffts,
+                            spectra_options = None):
+    """
+    Gets the spectral distance and the raw and relative transition durations
+    of a phone pair for each combination of settings (an array with one row
+    per combination).
+
+    first_phone_ts:
+        Time series of the first phone.
+    second_phone_ts:
+        Time series of the second phone.
+    sr:
+        Sampling rate.
+    settings:
+        Combinations of (window length, number of Mel filters, trans_prop)
+        (expects a list of tuples).
+    n_ffts:
+        FFT size of each window length (expects a dictionary).
+    spectra_options:
+        Keyword arguments of the Spectra: backend and dtype (expects a
+        dictionary; default: None).
+    """
+    if spectra_options is None:
+        spectra_options = {}
+    dtype = np.dtype(spectra_options.get("dtype", np.float64))
+    time_series = {"first": first_phone_ts,
+                   "second": second_phone_ts,
+                   "combined": np.concatenate((first_phone_ts, second_phone_ts))}
+
+    measures = np.full((len(settings), len(measure_columns)), np.nan)
+    magnitudes = {}
+    coarticulations = {}
+    for k, (window_length, n_mels, trans_prop) in enumerate(settings):
+
+        # Magnitude STFTs of the phones (and of the two phones combined) at
+        # the step sizes of the temporal transition and the spectral
+        # distance, once per window length
+        if window_length not in magnitudes:
+            magnitudes[window_length] = {
+                    (name, step_size): stft_magnitude(
+                            single_precision(ts, dtype),
+                            n_fft = n_ffts[window_length],
+                            hop_length = int(sr * step_size),
+                            win_length = int(sr * window_length),
+                            backend = spectra_options.get("backend", "librosa"))
+                    for name, ts in time_series.items()
+                    for step_size in (0.001, 0.010)
+                    if not (name == "combined" and step_size == 0.010)}
+
+        # Spectra for the filter bank, once per window length and number of
+        # filters (so the trajectory is shared by the trans_prop values)
+        if (window_length, n_mels) not in coarticulations:
+            mel_f = get_mel_filter_bank(sr, n_fft = n_ffts[window_length], n_mels = n_mels)
+            spectra = {(name, step_size): Spectra.from_magnitudes(
+                               magnitude, time_series[name], sr, mel_f,
+                               window_length = window_length,
+                               step_size = step_size,
+                               **spectra_options)
+                       for (name, step_size), magnitude in magnitudes[window_length].items()}
+            spectral_distance = Coarticulation(spectra[("first", 0.010)],
+                                               spectra[("second", 0.010)]).spectral_dist()
+            coar = Coarticulation(spectra[("first", 0.001)],
+                                  spectra[("second", 0.001)],
+                                  combined_spectra = spectra[("combined", 0.001)])
+            coarticulations[(window_length, n_mels)] = (spectral_distance, coar)
+
+        spectral_distance, coar = coarticulations[(window_length, n_mels)]
+        try:
+            raw_trans_dur, relative_trans_dur = coar.temporal_trans(trans_prop)
+
+        except RuntimeWarning:
+            raw_trans_dur, relative_trans_dur = np.nan, np.nan
+
+        measures[k] = spectral_distance, raw_trans_dur, relative_trans_dur
+    return measures
+
+if __name__ == "__main__":
+    sound_folders_dir = "/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/recordings/channels separated"
+    phone_pairs_data_dir = "/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/recordings/phone_pairs_data.parquet"
+    output_dir = "/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/recordings"
+    sweep_coarticulation(sound_folders_dir,
+                         phone_pairs_data_dir,
+                         output_dir,
+                         window_lengths = (0.0128, 0.0256, 0.0384),
+                         n_mels = (20, 29, 40),
+                         trans_props = (0.7, 0.8, 0.9))
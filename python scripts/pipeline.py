@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 11:06:53 2026
+
+@author: adamguo
+
+The whole analysis (TextGrids to coarticulation measures) as a chain of
+generators, one recording at a time, without writing the file metadata and
+the phone pair data to disk in between.
+"""
+import os, sys
+import pandas as pd
+import numpy as np
+from get_files_metadata import extract_file_info, file_metadata_columns
+from get_phone_pairs_data import get_adjacent_phone_pairs, \
+    get_KW_phones_ints_and_times
+from analyze_coarticulation import condition_folder_code_dict, measure_columns, \
+    analyze_recording, get_sample_bounds, get_analysis_n_fft
+from filter_banks import get_mel_filter_bank
+from table_io import TableWriter, set_column_types, get_table_path
+from textgrid_io import iter_textgrids
+
+def run_pipeline(textgrid_dir,
+                 sound_folders_dir,
+                 output_dir,
+                 sr = 44100,
+                 whole_recording = False,
+                 multi_resolution = False,
+                 resample_cache_dir = None,
+                 n_fft = None,
+                 stft_backend = "librosa",
+                 dtype = "float64",
+                 words_tier_name = "words_KW",
+                 phones_tier_name = "phones_KW",
+                 table_format = "parquet",
+                 chunk_size = 10000,
+                 n_jobs = 1,
+                 textgrid_cache_path = None):
+    """
+    Gets the coarticulation measures of the phone pairs of every TextGrid in
+    textgrid_dir and saves them as coart_data in output_dir, like
+    get_files_metadata, get_phone_pairs_data and analyze_coarticulation run
+    one after the other. Each recording goes through all the stages (see
+    discover_recordings, parse_textgrids, get_phone_pairs, get_measures and
+    write_batches) before the next one is read, so memory does not grow with
+    the size of the corpus and the measures are saved as they come.
+
+    textgrid_dir:
+        Directory of the TextGrids (one subfolder per condition, named as in
+        analyze_coarticulation.condition_folder_code_dict). The TextGrids
+        should contain word- and phone-aligned tiers for the keywords.
+    sound_folders_dir:
+        Directory of the sound files (with the same subfolders).
+    output_dir:
+        Directory of the output.
+    sr:
+        Sampling rate (default: 44100).
+    whole_recording:
+        See analyze_coarticulation (default: False).
+    multi_resolution:
+        See analyze_coarticulation (default: False).
+    resample_cache_dir:
+        See analyze_coarticulation (default: None).
+    n_fft:
+        See analyze_coarticulation (default: None).
+    stft_backend:
+        See analyze_coarticulation (default: "librosa").
+    dtype:
+        See analyze_coarticulation (default: "float64").
+    words_tier_name:
+        Word-aligned annotation tier for the keywords (default: "words_KW").
+    phones_tier_name:
+        Phone-aligned annotation tier for the keywords (default: "phones_KW").
+    table_format:
+        Format of the output: "parquet", "csv" or "xlsx" (default: "parquet";
+        an Excel output is only written at the end).
+    chunk_size:
+        Number of rows saved at a time (default: 10000).
+    n_jobs:
+        Number of worker processes that read the TextGrids ahead of the 
+        analysis (default: 1, i.e., no worker processes).
+    textgrid_cache_path:
+        Path to a cache of parsed TextGrids (an SQLite file; see
+        textgrid_cache.TextGridCache) (default: None, i.e., no cache).
+    """
+    mel_f = get_mel_filter_bank(sr, n_fft = get_analysis_n_fft(sr, n_fft), n_mels = 29,
+                                fmin = 100.0, fmax = 6000.0, htk = True, norm = 1)
+    spectra_options = {"backend": stft_backend, "dtype": np.dtype(dtype)}
+
+    recordings = discover_recordings(textgrid_dir)
+    parsed = parse_textgrids(recordings, textgrid_dir,
+                             words_tier_name = words_tier_name,
+                             phones_tier_name = phones_tier_name,
+                             n_jobs = n_jobs,
+                             cache_path = textgrid_cache_path)
+    phone_pairs = get_phone_pairs(parsed)
+    coart_data = get_measures(phone_pairs, sound_folders_dir, sr, mel_f,
+                              whole_recording = whole_recording,
+                              multi_resolution = multi_resolution,
+                              cache_dir = resample_cache_dir,
+                              spectra_options = spectra_options)
+    write_batches(coart_data, get_table_path(output_dir, "coart_data", table_format),
+                  chunk_size = chunk_size)
+    print("\nDone!")
+
+def discover_recordings(textgrid_dir):
+    """
+    Yields the condition subfolder, the TextGrid file name and the file
+    metadata (see get_files_metadata.extract_file_info) of each TextGrid in
+    textgrid_dir, in the order of the subfolders and file names.
+
+    textgrid_dir:
+        Directory of the TextGrids (one subfolder per condition).
+    """
+    condition_code_dict = {subfolder: condition_code for condition_code, subfolder
+                           in condition_folder_code_dict.items()}
+    for subfolder in sorted(f.name for f in os.scandir(textgrid_dir) if f.is_dir()):
+        for textgrid_file in sorted(os.listdir(os.path.join(textgrid_dir, subfolder))):
+            if textgrid_file.endswith(".TextGrid"):
+                yield subfolder, textgrid_file, extract_file_info(
+                        textgrid_file.split(".")[0] + ".wav",
+                        condition_code_dict[subfolder])
+
+def parse_textgrids(recordings, textgrid_dir, words_tier_name = "words_KW",
+                    phones_tier_name = "phones_KW", n_jobs = 1, cache_path = None):
+    """
+    Yields the condition subfolder, the file metadata and the time data of
+    the keyword phones (see get_keywords_tiers.get_KW_phones_ints_and_times)
+    of each recording. With n_jobs > 1 the TextGrids are read in worker
+    processes (see textgrid_io.iter_textgrids), which may run ahead of the
+    later stages by up to the whole corpus, but only keep the arrays of the
+    two keyword tiers.
+
+    recordings:
+        Recordings (see discover_recordings).
+    textgrid_dir:
+        Directory of the TextGrids.
+    words_tier_name:
+        Word-aligned annotation tier for the keywords (default: "words_KW").
+    phones_tier_name:
+        Phone-aligned annotation tier for the keywords (default: "phones_KW").
+    n_jobs:
+        Number of worker processes (default: 1, i.e., no worker processes).
+    cache_path:
+        Path to the cache of parsed TextGrids (default: None, i.e., no cache;
+        see textgrid_io.iter_textgrids).
+    """
+    recordings = list(recordings)
+    textgrids = iter_textgrids(textgrid_dir,
+                               tier_names = [words_tier_name, phones_tier_name],
+                               n_jobs = n_jobs,
+                               cache_path = cache_path,
+                               textgrid_paths = [os.path.join(subfolder, textgrid_file)
+                                                 for subfolder, textgrid_file, _ in recordings])
+    for (subfolder, _, metadata), (_, textgrid) in zip(recordings, textgrids):
+        _, phone_time_data = get_KW_phones_ints_and_times(textgrid.view(),
+                                                          words_tier_name = words_tier_name,
+                                                          phones_tier_name = phones_tier_name)
+        yield subfolder, metadata, phone_time_data
+
+def get_phone_pairs(parsed):
+    """
+    Yields the condition subfolder and the phone pair data (see
+    get_phone_pairs_data.get_adjacent_phone_pairs) of each recording that has
+    adjacent keyword phones.
+
+    parsed:
+        Parsed TextGrids (see parse_textgrids).
+    """
+    for subfolder, metadata, phone_time_data in parsed:
+        phone_pairs_data = get_adjacent_phone_pairs(phone_time_data, metadata,
+                                                    file_metadata_columns)
+        if len(phone_pairs_data) > 0:
+            yield subfolder, set_column_types(phone_pairs_data)
+
+def get_measures(phone_pairs, sound_folders_dir, sr, mel_f, whole_recording = False,
+                 multi_resolution = False, cache_dir = None, spectra_options = None):
+    """
+    Yields the coarticulation data (the phone pair data plus the measures,
+    see analyze_coarticulation) of each recording.
+
+    phone_pairs:
+        Phone pair data of the recordings (see get_phone_pairs).
+    sound_folders_dir:
+        Directory of the sound files (one subfolder per condition).
+    sr:
+        Sampling rate.
+    mel_f:
+        Mel-frequency filter bank.
+    whole_recording:
+        See analyze_coarticulation (default: False).
+    multi_resolution:
+        See analyze_coarticulation (default: False).
+    cache_dir:
+        Directory of the cache of resampled recordings (default: None).
+    spectra_options:
+        Keyword arguments of the Spectra, e.g., backend and dtype (expects a
+        dictionary; default: None).
+    """
+    for subfolder, phone_pairs_data in phone_pairs:
+        measures = analyze_recording(os.path.join(sound_folders_dir, subfolder,
+                                                  phone_pairs_data["Filename_wav"].iloc[0]),
+                                     get_sample_bounds(phone_pairs_data, sr),
+                                     sr, mel_f,
+                                     whole_recording = whole_recording,
+                                     multi_resolution = multi_resolution,
+                                     cache_dir = cache_dir,
+                                     spectra_options = spectra_options)
+        for i, column in enumerate(measure_columns):
+            phone_pairs_data[column] = measures[:, i]
+        yield phone_pairs_data
+
+def write_batches(batches, path, chunk_size = 10000):
+    """
+    Saves batches of rows (dataframes with the same columns) to a table as
+    they come, chunk_size rows or more at a time (see table_io.TableWriter).
+
+    batches:
+        Batches of rows (e.g., see get_measures).
+    path:
+        Path to the table.
+    chunk_size:
+        Number of rows saved at a time (default: 10000).
+    """
+    pending = []
+    no_of_pending_rows = 0
+    no_of_rows = 0
+    with TableWriter(path) as writer:
+        for count, batch in enumerate(batches):
+            pending.append(batch)
+            no_of_pending_rows += len(batch)
+            no_of_rows += len(batch)
+            if no_of_pending_rows >= chunk_size:
+                writer.write(pd.concat(pending, ignore_index = True))
+                pending = []
+                no_of_pending_rows = 0
+
+            # Update progress
+            sys.stdout.write("\rRecordings done: {0} ({1} phone pairs)".format(count + 1, no_of_rows))
+            sys.stdout.flush()
+
+        if pending:
+            writer.write(pd.concat(pending, ignore_index = True))
+
+if __name__ == "__main__":
+    textgrid_dir = "/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/recordings/force-aligned keywords"
+    sound_folders_dir = "/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/recordings/channels separated"
+    output_dir = "/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/recordings"
+    run_pipeline(textgrid_dir, sound_folders_dir, output_dir)
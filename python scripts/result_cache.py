@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 16 20:12:35 2026
+
+@author: adamguo
+
+Cache of the coarticulation measures of phone pairs, keyed by what the
+measures depend on, so that a rerun after a few boundaries have been fixed
+only analyzes the phone pairs that changed.
+"""
+import os, sqlite3, hashlib
+import numpy as np
+
+# Modules whose code the measures depend on (a change to any of them
+# invalidates the cache)
+code_modules = ["analyze_coarticulation.py", "coarticulation_classes.py",
+                "filter_banks.py", "audio_io.py", "feature_store.py"]
+
+class ResultCache:
+    def __init__(self, path, settings):
+        """
+        Opens (or creates) a cache of phone pair measures. The key of a phone
+        pair is the SHA-1 of the contents of its sound file, its four time
+        bounds, the analysis settings and the version of the code (see
+        get_code_version), so a cached measure is only used when none of them
+        has changed. The hashes of the sound files are kept too, and are only
+        recomputed when the size or the modification time of a file changes.
+
+        path:
+            Path to the cache (an SQLite file).
+        settings:
+            Analysis settings that affect the measures (expects a dictionary).
+        """
+        self.path = path
+        self.version = hashlib.sha1((repr(sorted(settings.items())) +
+                                     get_code_version()).encode()).hexdigest()
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS sound_files "
+                                "(path TEXT PRIMARY KEY, size INTEGER, mtime REAL, "
+                                "hash TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS measures "
+                                "(key TEXT PRIMARY KEY, "
+                                "spectral_distance REAL, "
+                                "raw_transition_duration REAL, "
+                                "relative_transition_duration REAL)")
+
+    def get_sound_file_hash(self, path):
+        """ Gets the SHA-1 of the contents of a sound file (from the cache if
+        the file has not changed). """
+        stat = os.stat(path)
+        row = self.connection.execute("SELECT size, mtime, hash FROM sound_files "
+                                      "WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            return row[2]
+
+        file_hash = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                file_hash.update(chunk)
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO sound_files VALUES (?, ?, ?, ?)",
+                                    (path, stat.st_size, stat.st_mtime, file_hash.hexdigest()))
+        return file_hash.hexdigest()
+
+    def get_keys(self, sound_file_paths, times):
+        """ Gets the keys of some phone pairs.
+
+        sound_file_paths:
+            Path to the sound file of each phone pair.
+        times:
+            Start and end times of the first and second phones of each phone
+            pair (expects an array with one row per phone pair).
+        """
+        file_hashes = {path: self.get_sound_file_hash(path) for path in set(sound_file_paths)}
+        return [hashlib.sha1("{} {} {}".format(file_hashes[path], repr(tuple(row)),
+                                               self.version).encode()).hexdigest()
+                for path, row in zip(sound_file_paths, np.asarray(times, dtype = float).tolist())]
+
+    def get_measures(self, keys):
+        """ Gets the positions (in keys) of the phone pairs in the cache and
+        their measures (spectral distance, raw and relative transition
+        durations), and counts the hits and misses. """
+        found = {}
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            found.update((row[0], row[1:]) for row in self.connection.execute(
+                    "SELECT * FROM measures WHERE key IN ({})".format(
+                            ", ".join("?" * len(batch))), batch))
+        positions = np.array([i for i, key in enumerate(keys) if key in found], dtype = int)
+        measures = np.array([found[keys[i]] for i in positions], dtype = float).reshape(-1, 3)
+        self.hits += len(positions)
+        self.misses += len(keys) - len(positions)
+        return positions, measures
+
+    def add(self, keys, measures):
+        """ Adds the measures of some phone pairs. """
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO measures VALUES (?, ?, ?, ?)",
+                                        [(key, *row) for key, row in
+                                         zip(keys, np.atleast_2d(measures).tolist())])
+
+    def report(self):
+        """ Prints the number of cache hits and misses. """
+        print("\nResult cache: {} hits, {} misses".format(self.hits, self.misses))
+
+    def close(self):
+        """ Closes the cache. """
+        self.connection.close()
+
+def get_code_version():
+    """ Gets the SHA-1 of the source of the modules in code_modules. """
+    code_hash = hashlib.sha1()
+    for module in code_modules:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), module), "rb") as f:
+            code_hash.update(f.read())
+    return code_hash.hexdigest()
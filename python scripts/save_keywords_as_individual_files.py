@@ -7,6 +7,11 @@ Created on Tue Jun 29 15:08:02 2021
 """
 import os, sys, textgrids, librosa
 import pandas as pd
+from audio_io import load_audio
+from table_io import read_table, write_table, get_table_path
+from metadata_catalog import MetadataCatalog
+from textgrid_io import iter_textgrids
+from interval_index import IntervalIndex
 
 def save_keywords_as_individual_files(textgrid_dir,
                                       soundfile_dir,
@@ -14,7 +19,10 @@ def save_keywords_as_individual_files(textgrid_dir,
                                       sr = 44100,
                                       file_metadata = None,
                                       words_tier_name = "words_KW",
-                                      vowels_tier_name = "vowels_KW"):
+                                      vowels_tier_name = "vowels_KW",
+                                      table_format = "parquet",
+                                      n_jobs = 1,
+                                      textgrid_cache_path = None):
     """
     Saves tokens of the keywords as individual sound fles. Also, create dataframe 
     that provides metadata for these sound files.
@@ -31,26 +39,39 @@ def save_keywords_as_individual_files(textgrid_dir,
     sr:
         Sampling rate (default: 44100).
     file_metadata:
-        An Excel file containing information about the input WAV/TextGrid 
-        files (default: None).
+        A table (see table_io.read_table), or a dataframe, containing 
+        information about the input WAV/TextGrid files (default: None).
     words_tier_name:
         Word-aligned annotation tier for the keywords (default: "words_KW").
     vowels_tier_namne:
         Vowel-align annotation for the vowels in the keywords (default: "words_KW").
+    table_format:
+        Format of the metadata of the tokens, keyword_token_metadata: 
+        "parquet", "csv" or "xlsx" (default: "parquet"; see table_io).
+    n_jobs:
+        Number of worker processes that read the TextGrids (default: 1, i.e., 
+        no worker processes; see textgrid_io.iter_textgrids).
+    textgrid_cache_path:
+        Path to a cache of parsed TextGrids (an SQLite file) shared with the 
+        other scripts (default: None, i.e., no cache; see 
+        textgrid_cache.TextGridCache).
     """
     # Load file name metadata
     if file_metadata is None:
         
         # If the metadata is not provided, try getting the data from the following folder.
-        file_metadata_dir = "/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/metadata/all_file_metadata.xlsx"
+        file_metadata_dir = "/Users/adamguo/Desktop/Research/Clear speech corpora/LUCID/metadata/all_file_metadata.parquet"
         print("\nNo file metadata provided. Try reading from {}...".format(file_metadata_dir))
         
         try:
-            file_metadata = pd.read_excel(file_metadata_dir)
+            file_metadata = read_table(file_metadata_dir)
         
         except FileNotFoundError:
             print("\nNo such file or directory. Please provide the file metadata.")
     
+    elif isinstance(file_metadata, str):
+        file_metadata = read_table(file_metadata)
+    
     # Create an empty dataframe for storing the word tooken data. This dataframe 
     # should have all the columns from the metadata plus some other information 
     # about word token
@@ -58,6 +79,16 @@ def save_keywords_as_individual_files(textgrid_dir,
                               ["Keyword", "Repetition", "Token_filename_wav",
                                "Token_filename_TextGrid", "Vowel", "Word_duration"])
     
+    # Index the metadata by file name
+    catalog = MetadataCatalog(file_metadata)
+    
+    # Read the keyword and vowel tiers of all TextGrids (in worker processes)
+    textgrids_by_path = dict(iter_textgrids(textgrid_dir,
+                                            tier_names = [words_tier_name,
+                                                          vowels_tier_name],
+                                            n_jobs = n_jobs,
+                                            cache_path = textgrid_cache_path))
+    
     # Get a list of all subfolders in textgrid_dir.
     subfolders_dirs = [f.path for f in os.scandir(textgrid_dir) if f.is_dir()]
     
@@ -95,13 +126,14 @@ def save_keywords_as_individual_files(textgrid_dir,
                                             textgrid_file.split(".")[0] + ".wav")
             
             
-            # Get the metadata for this sound file and reset its index
-            sound_md = file_metadata.loc[file_metadata["Filename_TextGrid"] == textgrid_file]
-            sound_md = sound_md.reset_index(drop = True)
+            # Get the metadata for this sound file (with the index 0)
+            sound_md = catalog.get_frame(textgrid_file)
             
             try:
                 token_data = extract_sounds_and_textgrids(
                         textgrid_path = path_to_textgrid_file,
+                        textgrid = textgrids_by_path[os.path.join(subfolder_name,
+                                                                  textgrid_file)].view(),
                         soundfile_path = path_to_sounfile,
                         output_path = output_subfolder_dir,
                         sampling_rate = sr,
@@ -126,8 +158,8 @@ def save_keywords_as_individual_files(textgrid_dir,
             sys.stdout.flush()
             
     print("\nFinished extracting keyword tokens. Now saving the metadata")
-    token_data.to_excel(os.path.join(output_dir, "keyword_token_metadata.xlsx"),
-                        index = False)
+    write_table(token_data,
+                get_table_path(output_dir, "keyword_token_metadata", table_format))
     
     print("\nDone!")
     
@@ -135,14 +167,19 @@ def save_keywords_as_individual_files(textgrid_dir,
 def extract_sounds_and_textgrids(textgrid_path, soundfile_path, output_path,
                                  sampling_rate, soundfile_metadata, 
                                  token_data_frame, words_tier,
-                                 vowels_tier):
+                                 vowels_tier, textgrid = None):
     """
     Extracts keyword token and save them as individual files, along with
     their TextGrids, and also creates an dataframe containing metadata for these 
-    sound files.
+    sound files. If textgrid (a textgrids.TextGrid or a 
+    textgrid_io.TextGridView) is given, it is used instead of reading 
+    textgrid_path.
     """
     # Open the TextGrid
-    tg = textgrids.TextGrid(textgrid_path)
+    if textgrid is None:
+        tg = textgrids.TextGrid(textgrid_path)
+    else:
+        tg = textgrid
     
     # Get a list containing all the non-empty keyword intervals
     keyword_ints = [kw for kw in tg[words_tier] if kw.text != ""]
@@ -154,8 +191,10 @@ def extract_sounds_and_textgrids(textgrid_path, soundfile_path, output_path,
     if len(keyword_ints) == 0 or len(vowel_ints) == 0:
         raise IndexError
     
-    # Load the corresponding audio
-    audio, _ = librosa.load(soundfile_path, sampling_rate)
+    # Load the corresponding audio (only the keywords)
+    audio = load_audio(soundfile_path, sampling_rate,
+                       regions = [[int(kw.xmin * sampling_rate),
+                                   int(kw.xmax * sampling_rate)] for kw in keyword_ints])
     
     # Create a dictionary to track counts of the keywords
     kw_counts = {}
@@ -177,8 +216,16 @@ def extract_sounds_and_textgrids(textgrid_path, soundfile_path, output_path,
     # Create a copy of the token dataframe to be updated
     updated_token_data_frame = token_data_frame.copy(deep = True)
     
+    # Find the vowel intervals that belong to each keyword, i.e., that lie 
+    # within it (for all keywords at once, with an index of the vowel 
+    # intervals by time). Because the keywords are monosyllabic, normally 
+    # there should be just one vowel in each keyword token. However, this 
+    # method should scale to words with any numbers of vowel.
+    vowel_positions = IntervalIndex.from_intervals(vowel_ints).contained_in_each(
+            [kw.xmin for kw in keyword_ints], [kw.xmax for kw in keyword_ints])
+    
     # Now, loop through keywords_ints
-    for kw_int in keyword_ints:
+    for kw_int, positions in zip(keyword_ints, vowel_positions):
         
         # Get the keyword, onset time, offset time, and duration
         keyword = kw_int.text
@@ -211,11 +258,8 @@ def extract_sounds_and_textgrids(textgrid_path, soundfile_path, output_path,
         word_dur = librosa.get_duration(snippet, sampling_rate)
         
         # Before creating the TextGrid, do some preparation:
-        # Get a list containing all vowel intervals that belong to this keyword. 
-        # Because the keywords are monosyllabic, normally there should be just 
-        # one vowel in each keyword token. However, this method should scale to
-        # words with any numbers of vowel.
-        v_ints_for_each_kw = [v for v in vowel_ints if v.xmin >= onset_t and v.xmax <= offset_t]
+        # Get a list containing all vowel intervals that belong to this keyword.
+        v_ints_for_each_kw = [vowel_ints[i] for i in positions]
         
         # Shift the xmin and xmax of each vowel interval so that they represent 
         # the timings with respect to word onet and the vowel intervals can be 
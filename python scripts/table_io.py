@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 09:41:26 2026
+
+@author: adamguo
+
+Reading and writing the tables that the scripts hand to each other (file
+metadata, phone pair data, coarticulation data, keyword token metadata).
+Tables are Parquet files by default, with typed columns; CSV and Excel are
+supported for exporting and for reading older outputs.
+"""
+import os
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Columns stored as categoricals (few distinct values, many rows)
+categorical_columns = ["Condition", "Speaker", "Partner", "Phone", "Phone_pair",
+                       "First_phone", "Second_phone", "Vowel"]
+
+# Columns stored as float64 that are not time columns (see get_column_types)
+float_columns = ["Word_duration", "Spectral_distance", "Raw_transition_duration",
+                 "Relative_transition_duration"]
+
+# File extension of each table format
+table_extensions = {"parquet": ".parquet",
+                    "csv": ".csv",
+                    "xlsx": ".xlsx"}
+
+def get_table_path(output_dir, name, table_format = "parquet"):
+    """
+    Gets the path of a table in output_dir, e.g.,
+    get_table_path(output_dir, "phone_pairs_data") is
+    output_dir/phone_pairs_data.parquet.
+
+    output_dir:
+        Directory of the table.
+    name:
+        Name of the table (without extension).
+    table_format:
+        "parquet", "csv" or "xlsx" (default: "parquet").
+    """
+    try:
+        return os.path.join(output_dir, name + table_extensions[table_format])
+    except KeyError:
+        raise ValueError("Unknown table format {!r} (expected one of {})".format(
+                table_format, ", ".join(table_extensions))) from None
+
+def get_table_format(path):
+    """ Gets the format of a table from the extension of its path. """
+    extension = os.path.splitext(path)[1].lower()
+    for table_format, table_extension in table_extensions.items():
+        if extension == table_extension:
+            return table_format
+    if extension == ".xls":
+        return "xlsx"
+    raise ValueError("Unknown table format of {} (expected one of {})".format(
+            path, ", ".join(table_extensions.values())))
+
+def get_column_types(table):
+    """ Gets the types of the columns of a table that have a fixed type:
+    categorical for the columns in categorical_columns, float64 for the time
+    columns (ending in "_t") and the columns in float_columns. """
+    column_types = {}
+    for column in table.columns:
+        if column in categorical_columns:
+            column_types[column] = "category"
+        elif column.endswith("_t") or column in float_columns:
+            column_types[column] = np.float64
+    return column_types
+
+def set_column_types(table):
+    """ Sets the types of the columns of a table (see get_column_types). """
+    return table.astype(get_column_types(table))
+
+def read_table(path, columns = None):
+    """
+    Reads a table (Parquet, CSV or Excel, by the extension of path) as a
+    dataframe with typed columns (see get_column_types).
+
+    path:
+        Path to the table.
+    columns:
+        Columns to read (default: None, i.e., all of them).
+    """
+    table_format = get_table_format(path)
+    if table_format == "parquet":
+        table = pd.read_parquet(path, columns = columns)
+    elif table_format == "csv":
+        table = pd.read_csv(path, usecols = columns)
+    else:
+        table = pd.read_excel(path, usecols = columns)
+    return set_column_types(table)
+
+def iter_table(path, chunk_size = 100000, columns = None):
+    """
+    Reads a table in chunks of chunk_size rows (typed dataframes, see
+    read_table), so that a large table never has to be in memory at once.
+    Parquet files are read one batch at a time and CSV files with
+    pandas.read_csv(chunksize); Excel files cannot be streamed and are read
+    whole first.
+
+    path:
+        Path to the table.
+    chunk_size:
+        Number of rows per chunk (default: 100000).
+    columns:
+        Columns to read (default: None, i.e., all of them).
+    """
+    table_format = get_table_format(path)
+    if table_format == "parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size = chunk_size,
+                                                       columns = columns):
+            yield set_column_types(batch.to_pandas())
+
+    elif table_format == "csv":
+        for chunk in pd.read_csv(path, usecols = columns, chunksize = chunk_size):
+            yield set_column_types(chunk)
+
+    else:
+        table = read_table(path, columns = columns)
+        for start in range(0, len(table), chunk_size):
+            yield table.iloc[start:start + chunk_size]
+
+def write_table(table, path):
+    """
+    Writes a dataframe as a table (Parquet, CSV or Excel, by the extension
+    of path), with typed columns (see get_column_types) and without the
+    index.
+
+    table:
+        Dataframe to write.
+    path:
+        Path to the table.
+    """
+    table_format = get_table_format(path)
+    table = set_column_types(table)
+    if table_format == "parquet":
+        table.to_parquet(path, index = False)
+    elif table_format == "csv":
+        table.to_csv(path, index = False)
+    else:
+        table.to_excel(path, index = False)
+
+def export_excel(path, excel_path = None):
+    """
+    Exports a table to an Excel file, e.g., to look at it in a spreadsheet.
+
+    path:
+        Path to the table.
+    excel_path:
+        Path to the Excel file (default: None, i.e., path with the extension
+        .xlsx).
+    """
+    if excel_path is None:
+        excel_path = os.path.splitext(path)[0] + ".xlsx"
+    read_table(path).to_excel(excel_path, index = False)
+    return excel_path
+
+class TableWriter:
+    def __init__(self, path):
+        """
+        Writes a table in chunks (dataframes with the same columns), so that
+        rows can be saved as they are produced. Parquet tables get one row
+        group per chunk and CSV tables are appended to; Excel tables cannot
+        be appended to and are kept in memory until close. Use as a context
+        manager, or call close when done.
+
+        path:
+            Path to the table.
+        """
+        self.path = path
+        self.table_format = get_table_format(path)
+        self.parquet_writer = None
+        self.schema = None
+        self.chunks = []
+        self.no_of_rows = 0
+
+    def write(self, chunk):
+        """ Writes a chunk of rows. """
+        chunk = set_column_types(chunk)
+        if self.table_format == "parquet":
+
+            # The schema is that of the first chunk, with room for more
+            # categories in the categorical columns
+            if self.schema is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index = False)
+                for i, field in enumerate(schema):
+                    if pa.types.is_dictionary(field.type):
+                        schema = schema.set(i, field.with_type(
+                                pa.dictionary(pa.int32(), field.type.value_type)))
+                self.schema = schema
+                self.parquet_writer = pq.ParquetWriter(self.path, self.schema)
+            self.parquet_writer.write_table(pa.Table.from_pandas(
+                    chunk, schema = self.schema, preserve_index = False))
+
+        elif self.table_format == "csv":
+            chunk.to_csv(self.path, index = False, mode = "w" if self.no_of_rows == 0 else "a",
+                         header = self.no_of_rows == 0)
+
+        else:
+            self.chunks.append(chunk)
+        self.no_of_rows += len(chunk)
+
+    def close(self):
+        """ Finishes the table. """
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+            self.parquet_writer = None
+        if self.chunks:
+            pd.concat(self.chunks, ignore_index = True).to_excel(self.path, index = False)
+            self.chunks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
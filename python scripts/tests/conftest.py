@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:02:14 2026
+
+@author: adamguo
+
+Makes the analysis scripts importable from the tests (they are run from the
+python scripts folder, not installed as a package), and fixtures shared by
+the tests.
+"""
+import os, sys
+import numpy as np
+import pandas as pd
+import soundfile as sf
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def make_corpus(tmp_path):
+    """ Gets a function that writes a small synthetic corpus (WAV files in
+    the noBarrierCondition subfolder and their phone pair data) and returns
+    the sound folders directory and the path to the phone pair data. """
+    def make_corpus(sr = 16000, n_files = 3, n_pairs = 6, duration = 3.0, seed = 0):
+        rng = np.random.default_rng(seed)
+        sound_folders_dir = tmp_path / "recordings"
+        (sound_folders_dir / "noBarrierCondition").mkdir(parents = True, exist_ok = True)
+        rows = []
+        t = np.arange(int(duration * sr)) / sr
+        for i in range(n_files):
+            sound = 0.3 * np.sin(2 * np.pi * (150 + 80 * np.sin((i + 1) * t)) * t) + \
+                0.05 * rng.standard_normal(len(t))
+            sf.write(str(sound_folders_dir / "noBarrierCondition" / "file{}.wav".format(i)),
+                     sound.astype(np.float32), sr, subtype = "PCM_16")
+            for start in np.sort(rng.uniform(0.2, duration - 0.5, n_pairs)):
+                first_end = start + rng.uniform(0.05, 0.15)
+                rows.append({"Filename_wav": "file{}.wav".format(i),
+                             "Condition": "NB",
+                             "First_phone_start_t": round(start, 3),
+                             "First_phone_end_t": round(first_end, 3),
+                             "Second_phone_start_t": round(first_end, 3),
+                             "Second_phone_end_t": round(first_end + rng.uniform(0.05, 0.15), 3)})
+        phone_pairs_path = tmp_path / "phone_pairs_data.csv"
+        pd.DataFrame(rows).to_csv(phone_pairs_path, index = False)
+        return str(sound_folders_dir), str(phone_pairs_path)
+    return make_corpus
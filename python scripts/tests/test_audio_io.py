@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 20:12:37 2026
+
+@author: adamguo
+
+Checks reading the parts of a recording (audio_io.load_audio) and the cache
+of resampled recordings.
+"""
+import os
+import librosa
+import numpy as np
+import soundfile as sf
+import pytest
+import audio_io
+from audio_io import load_audio, AudioPrefetcher
+
+@pytest.fixture
+def sound_path(tmp_path):
+    rng = np.random.default_rng(0)
+    path = str(tmp_path / "sound.wav")
+    sf.write(path, (0.1 * rng.standard_normal(22050 * 2)).astype(np.float32), 22050,
+             subtype = "PCM_16")
+    return path
+
+def test_regions_match_full_load(sound_path):
+    full, _ = librosa.load(sound_path, sr = 22050)
+    regions = np.array([[1000, 3000], [20000, 21000], [2500, 5000]])
+    sound = load_audio(sound_path, 22050, regions = regions, margin = 512, merge_gap = 0)
+    for start, end in regions:
+        np.testing.assert_array_equal(sound[start - 512:end + 512],
+                                      full[start - 512:end + 512])
+
+def test_resampled_cache_matches_uncached(sound_path, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    uncached = load_audio(sound_path, 16000)
+    cached = load_audio(sound_path, 16000, cache_dir = cache_dir)
+    np.testing.assert_array_equal(cached, uncached)
+
+    # The entry is named after the resampler, and a second load is a hit
+    (entry,) = os.listdir(cache_dir)
+    assert entry.endswith("_16000_{}.npy".format(audio_io.res_type))
+    mtime = os.stat(os.path.join(cache_dir, entry)).st_mtime_ns
+    np.testing.assert_array_equal(load_audio(sound_path, 16000, cache_dir = cache_dir),
+                                  uncached)
+    assert os.stat(os.path.join(cache_dir, entry)).st_mtime_ns == mtime
+
+def test_resample_cache_does_not_change_measures(tmp_path, make_corpus):
+    import analyze_coarticulation as ac
+    sound_folders_dir, phone_pairs_path = make_corpus(sr = 22050, n_files = 2)
+    outputs = []
+    for resample_cache_dir in [None, str(tmp_path / "cache")]:
+        output_dir = tmp_path / "output{}".format(len(outputs))
+        output_dir.mkdir()
+        ac.analyze_coarticulation(sound_folders_dir, phone_pairs_path, str(output_dir),
+                                  sr = 16000, resample_cache_dir = resample_cache_dir,
+                                  table_format = "csv")
+        outputs.append(np.loadtxt(output_dir / "coart_data.csv", delimiter = ",",
+                                  skiprows = 1, usecols = (6, 7, 8)))
+    np.testing.assert_array_equal(outputs[0], outputs[1])
+
+def test_prefetcher_estimates_sizes_when_loading():
+    estimated = []
+    def estimate_size(i):
+        estimated.append(i)
+        return 10
+    prefetcher = AudioPrefetcher(lambda i: i * 2, [(i,) for i in range(20)], estimate_size,
+                                 depth = 2, max_bytes = 25)
+    sounds = iter(prefetcher)
+
+    # Only the files loaded ahead are estimated before the first one is used
+    assert next(sounds) == 0
+    assert len(estimated) <= 3
+    assert list(sounds) == [i * 2 for i in range(1, 20)]
+    assert sorted(estimated) == list(range(20))
+
+def test_prefetcher_memory_budget():
+    loading = []
+    held = []
+    def load(i):
+        loading.append(i)
+        return i
+    prefetcher = AudioPrefetcher(load, [(i,) for i in range(10)], lambda i: 10,
+                                 depth = 4, max_bytes = 20)
+    for sound in prefetcher:
+        # At most two files of 10 bytes are loaded ahead, or one if it is
+        # over the budget on its own
+        held.append(len(loading) - sound)
+    assert max(held) <= 2
+    assert prefetcher.no_of_loads == 10
+
+    prefetcher = AudioPrefetcher(lambda i: i, [(i,) for i in range(3)], lambda i: 100,
+                                 depth = 2, max_bytes = 20)
+    assert list(prefetcher) == [0, 1, 2]
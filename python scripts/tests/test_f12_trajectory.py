@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:05:40 2026
+
+@author: adamguo
+
+Checks the vectorized f12 trajectory (coarticulation_classes.f12_trajectory
+and transition_stats) against the per-frame loop it replaced.
+"""
+import numpy as np
+import pytest
+from coarticulation_classes import Spectra, Coarticulation, f12_trajectory, \
+    transition_stats
+
+# Largest relative difference from the per-frame loop allowed for each
+# precision (the column norms may be summed in another order than
+# np.linalg.norm sums them, depending on the BLAS)
+tolerances = {np.float64: 1e-12, np.float32: 1e-5}
+
+def rowwise_f12(log_spectra, average_first, average_second):
+    """ The per-frame loop of the original Coarticulation.temporal_trans. """
+    d1_list, d2_list, trajectory = [], [], []
+    for i in np.arange(log_spectra.shape[1]):
+        spec = log_spectra[:, i]
+        d1 = np.linalg.norm(average_first - spec)
+        d2 = np.linalg.norm(average_second - spec)
+        d1_list.append(d1)
+        d2_list.append(d2)
+        trajectory.append(d1 - d2)
+    return np.array(d1_list), np.array(d2_list), np.array(trajectory)
+
+def rowwise_transition_frames(trajectory, trans_prop = 0.8):
+    """ The counting loop of the original Coarticulation.temporal_trans. """
+    list1 = [value for value in trajectory if value < 0]
+    list2 = [value for value in trajectory if value >= 0]
+    lb = np.mean(list1) * trans_prop
+    ub = np.mean(list2) * trans_prop
+    return len([x for x in trajectory if x > lb and x < ub])
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_f12_trajectory_matches_rowwise(dtype):
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        log_spectra = (3 * rng.standard_normal((29, rng.integers(1, 300)))).astype(dtype)
+        average_first = rng.standard_normal(29).astype(dtype)
+        average_second = rng.standard_normal(29).astype(dtype)
+        for actual, expected in zip(f12_trajectory(log_spectra, average_first, average_second),
+                                    rowwise_f12(log_spectra, average_first, average_second)):
+            np.testing.assert_allclose(actual, expected, rtol = tolerances[dtype],
+                                       atol = tolerances[dtype])
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_temporal_trans_matches_rowwise(dtype):
+    sr = 16000
+    rng = np.random.default_rng(1)
+    t = np.arange(int(0.4 * sr)) / sr
+    sound = (np.sin(2 * np.pi * 300 * t) * np.linspace(1, 0, len(t)) +
+             np.sin(2 * np.pi * 2500 * t) * np.linspace(0, 1, len(t)) +
+             0.01 * rng.standard_normal(len(t))).astype(np.float32)
+    first = Spectra(sound[:int(0.2 * sr)], sr, step_size = 0.001, dtype = dtype)
+    second = Spectra(sound[int(0.2 * sr):], sr, step_size = 0.001, dtype = dtype)
+    coar = Coarticulation(first, second)
+
+    start_frame = int(first.get_no_of_frames() / 2)
+    end_frame = first.get_no_of_frames() + int(second.get_no_of_frames() / 2)
+    log_spectra = np.log(coar.get_combined_spectra().get_spectra()[:, start_frame:end_frame])
+    _, _, expected = rowwise_f12(log_spectra, first.get_average_spectrum(),
+                                 second.get_average_spectrum())
+    _, _, trajectory = coar.get_trajectory()
+    np.testing.assert_allclose(trajectory, expected, rtol = tolerances[dtype],
+                               atol = tolerances[dtype])
+
+    _, _, no_frames_in_trans = transition_stats(trajectory)
+    assert no_frames_in_trans == rowwise_transition_frames(expected)
+    trans_dur, relative_trans_dur = coar.temporal_trans()
+    assert trans_dur == pytest.approx(no_frames_in_trans * 0.001)
+    assert relative_trans_dur == pytest.approx(trans_dur / (len(sound) / sr))
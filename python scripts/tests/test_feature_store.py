@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 20:46:02 2026
+
+@author: adamguo
+
+Checks building, reading and updating a feature store (feature_store).
+"""
+import os, json
+import numpy as np
+import soundfile as sf
+import pytest
+from feature_store import FeatureStore, build_feature_store
+from filter_banks import get_mel_filter_bank
+from coarticulation_classes import RecordingSpectra, Spectra
+from audio_io import load_audio
+
+sr = 16000
+
+@pytest.fixture
+def corpus(make_corpus):
+    sound_folders_dir, _ = make_corpus(sr = sr, n_files = 2)
+    return sound_folders_dir
+
+def get_chunk_mtimes(store_dir):
+    chunks_dir = os.path.join(store_dir, "chunks")
+    return {chunk: os.stat(os.path.join(chunks_dir, chunk)).st_mtime_ns
+            for chunk in os.listdir(chunks_dir)}
+
+def test_round_trip(tmp_path, corpus):
+    store_dir = str(tmp_path / "store")
+    mel_f = get_mel_filter_bank(sr, n_fft = 512)
+    build_feature_store(corpus, store_dir, mel_f, sr = sr, dtype = "float64")
+
+    store = FeatureStore(store_dir)
+    store.check_parameters(sr = sr, n_fft = 512, n_mels = 29, window_length = 0.0256)
+    with pytest.raises(ValueError):
+        store.check_parameters(sr = 44100)
+
+    recording = os.path.join("noBarrierCondition", "file1.wav")
+    sound = load_audio(os.path.join(corpus, recording), sr)
+    for step_size in [0.001, 0.010]:
+        stored = store.get_recording(recording, step_size)
+        computed = RecordingSpectra(sound, sr, mel_f, step_size = step_size)
+        np.testing.assert_allclose(stored.get_log_spectra(slice(None)),
+                                   np.log(computed.get_spectra(0, computed.no_of_frames)),
+                                   rtol = 1e-12)
+
+        # Phones sliced out of the store are those of the recording
+        np.testing.assert_allclose(Spectra.from_recording(stored, 1000, 3000).get_average_spectrum(),
+                                   Spectra.from_recording(computed, 1000, 3000).get_average_spectrum(),
+                                   rtol = 1e-12)
+    with pytest.raises(KeyError):
+        store.get_recording("noBarrierCondition/missing.wav", 0.001)
+
+def test_unchanged_recordings_are_skipped(tmp_path, corpus):
+    store_dir = str(tmp_path / "store")
+    mel_f = get_mel_filter_bank(sr, n_fft = 512)
+    build_feature_store(corpus, store_dir, mel_f, sr = sr)
+    mtimes = get_chunk_mtimes(store_dir)
+
+    # Only the recording that changed is computed again
+    path = os.path.join(corpus, "noBarrierCondition", "file0.wav")
+    sound, _ = sf.read(path, dtype = "float32")
+    sf.write(path, sound[:len(sound) // 2], sr, subtype = "PCM_16")
+    build_feature_store(corpus, store_dir, mel_f, sr = sr)
+    changed = {chunk for chunk, mtime in get_chunk_mtimes(store_dir).items()
+               if mtimes[chunk] != mtime}
+    assert changed == {"noBarrierCondition__file0_0.001.npy",
+                       "noBarrierCondition__file0_0.01.npy"}
+    store = FeatureStore(store_dir)
+    assert store.recordings[os.path.join("noBarrierCondition", "file0.wav")]["no_of_samples"] == \
+        len(sound) // 2
+
+@pytest.mark.parametrize("change", ["parameters", "old_index"])
+def test_store_with_other_parameters_is_rebuilt(tmp_path, corpus, change):
+    store_dir = str(tmp_path / "store")
+    mel_f = get_mel_filter_bank(sr, n_fft = 512)
+    build_feature_store(corpus, store_dir, mel_f, sr = sr)
+    mtimes = get_chunk_mtimes(store_dir)
+
+    if change == "parameters":
+        mel_f = get_mel_filter_bank(sr, n_fft = 512, n_mels = 20)
+    else:
+        # An index written before a parameter was recorded
+        index_path = os.path.join(store_dir, FeatureStore.index_name)
+        with open(index_path) as f:
+            index = json.load(f)
+        del index["parameters"]["res_type"]
+        with open(index_path, "w") as f:
+            json.dump(index, f)
+    build_feature_store(corpus, store_dir, mel_f, sr = sr)
+    assert all(mtime != mtimes[chunk] for chunk, mtime in get_chunk_mtimes(store_dir).items())
+    assert FeatureStore(store_dir).parameters["n_mels"] == mel_f.shape[0]
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 20:31:19 2026
+
+@author: adamguo
+
+Checks the sparse Mel filter banks (filter_banks.MelFilterBank) against the
+dense filter banks of librosa.filters.mel.
+"""
+import librosa
+import numpy as np
+import pytest
+from filter_banks import MelFilterBank, get_mel_filter_bank
+from coarticulation_classes import Spectra
+
+sr = 16000
+
+def get_weights(dtype):
+    return librosa.filters.mel(sr = sr, n_fft = 512, n_mels = 29, fmin = 100.0,
+                               fmax = 6000.0, htk = True, norm = 1, dtype = dtype)
+
+@pytest.fixture
+def magnitudes():
+    rng = np.random.default_rng(0)
+    return np.abs(rng.standard_normal((257, 40))).astype(np.float32)
+
+def test_weights_keep_their_precision():
+    for dtype in [np.float64, np.float32]:
+        mel_f = MelFilterBank(get_weights(dtype))
+        assert np.asarray(mel_f).dtype == dtype
+        np.testing.assert_array_equal(np.asarray(mel_f), get_weights(dtype))
+    assert np.asarray(get_mel_filter_bank(sr, n_fft = 512)).dtype == np.float64
+
+def test_dot_matches_dense(magnitudes):
+    mel_f = get_mel_filter_bank(sr, n_fft = 512)
+    weights = get_weights(np.float64)
+
+    # float64: the float64 weights, with no rounding to float32 on the way
+    spectra = mel_f.dot(magnitudes, dtype = np.float64)
+    assert spectra.dtype == np.float64
+    np.testing.assert_allclose(spectra, weights.dot(magnitudes.astype(np.float64)),
+                               rtol = 1e-12)
+
+    # float32 only when asked for
+    spectra = mel_f.dot(magnitudes, dtype = np.float32)
+    assert spectra.dtype == np.float32
+    np.testing.assert_allclose(spectra, weights.astype(np.float32).dot(magnitudes),
+                               rtol = 1e-5)
+    assert mel_f.dot(magnitudes).dtype == np.float32
+
+def test_default_spectra_are_float64():
+    rng = np.random.default_rng(1)
+    sound = (0.1 * rng.standard_normal(4000)).astype(np.float32)
+    spectra = Spectra(sound, sr, get_mel_filter_bank(sr, n_fft = 512),
+                      step_size = 0.001).get_spectra()
+    expected = get_weights(np.float64).dot(
+            np.abs(librosa.stft(sound, n_fft = 512, hop_length = 16,
+                                win_length = int(sr * 0.0256))).astype(np.float64))
+    assert spectra.dtype == np.float64
+    np.testing.assert_allclose(spectra, expected, rtol = 1e-12)
+
+def test_filter_banks_are_memoized():
+    assert get_mel_filter_bank(sr, n_fft = 512) is get_mel_filter_bank(sr, n_fft = 512)
+    assert get_mel_filter_bank(sr, n_fft = 512) is not get_mel_filter_bank(sr, n_fft = 1024)
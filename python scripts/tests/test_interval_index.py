@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 22:03:36 2026
+
+@author: adamguo
+
+Checks the queries of the interval index (interval_index.IntervalIndex)
+against going through all the intervals.
+"""
+import numpy as np
+import pytest
+from interval_index import IntervalIndex
+
+def brute_force_contained_in(xmin, xmax, start, end):
+    return np.flatnonzero((xmin >= start) & (xmax <= end))
+
+def brute_force_overlapping(xmin, xmax, start, end):
+    return np.flatnonzero((xmin < end) & (xmax > start))
+
+def make_intervals(rng, n, kind):
+    """ Intervals on a coarse grid, so that times are often equal. """
+    if kind == "tier":
+        # Adjacent intervals, as in an interval tier of a TextGrid
+        bounds = np.cumsum(rng.integers(1, 4, n + 1)) / 10
+        return bounds[:-1], bounds[1:]
+    if kind == "points":
+        xmin = rng.integers(0, 30, n) / 10
+        return xmin, xmin.copy()
+    # Unsorted intervals that overlap and nest
+    xmin = rng.integers(0, 30, n) / 10
+    return xmin, xmin + rng.integers(0, 15, n) / 10
+
+@pytest.mark.parametrize("kind", ["tier", "points", "overlapping"])
+def test_matches_brute_force(kind):
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        xmin, xmax = make_intervals(rng, rng.integers(0, 20), kind)
+        index = IntervalIndex(xmin, xmax)
+        assert len(index) == len(xmin)
+        assert index.ends_sorted or kind == "overlapping"
+
+        # Windows that start on, between and beyond the interval bounds,
+        # including empty and reversed ones
+        starts = rng.integers(-5, 40, 30) / 10 + rng.choice([0, 0.05], 30)
+        ends = starts + rng.integers(-2, 20, 30) / 10
+        for query, brute_force in [(index.contained_in_each, brute_force_contained_in),
+                                   (index.overlapping_each, brute_force_overlapping)]:
+            results = query(starts, ends)
+            assert len(results) == len(starts)
+            for start, end, positions in zip(starts, ends, results):
+                np.testing.assert_array_equal(positions,
+                                              brute_force(xmin, xmax, start, end))
+        for start, end in zip(starts[:5], ends[:5]):
+            np.testing.assert_array_equal(index.contained_in(start, end),
+                                          brute_force_contained_in(xmin, xmax, start, end))
+            np.testing.assert_array_equal(index.overlapping(start, end),
+                                          brute_force_overlapping(xmin, xmax, start, end))
+
+def test_empty():
+    index = IntervalIndex([], [])
+    assert len(index.contained_in(0.0, 1.0)) == 0
+    assert len(index.overlapping(0.0, 1.0)) == 0
+    index = IntervalIndex([0.0, 1.0], [1.0, 2.0])
+    assert index.contained_in_each([], []) == []
+    assert index.overlapping_each([], []) == []
+
+def test_from_intervals():
+    from textgrid_io import TierArrays
+    tier = TierArrays("phones", np.array([0.0, 0.3, 0.7]), np.array([0.3, 0.7, 1.0]),
+                      np.array(["a", "b", "c"], dtype = object))
+    for index in [IntervalIndex.from_tier(tier), IntervalIndex.from_intervals(tier.intervals())]:
+        np.testing.assert_array_equal(index.contained_in(0.2, 1.0), [1, 2])
+        np.testing.assert_array_equal(index.overlapping(0.2, 0.7), [0, 1])
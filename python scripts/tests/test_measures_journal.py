@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:48:55 2026
+
+@author: adamguo
+
+Checks the journal of the measures (measures_journal.MeasuresJournal) and
+resuming a run of analyze_coarticulation from it.
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from measures_journal import MeasuresJournal
+
+settings = {"sr": 16000, "whole_recording": False}
+
+@pytest.fixture
+def phone_pairs_data():
+    return pd.DataFrame({"Filename_wav": ["a.wav", "a.wav", "b.wav"],
+                         "Condition": "NB",
+                         "First_phone_start_t": [0.1, 0.5, 0.2],
+                         "First_phone_end_t": [0.2, 0.6, 0.3],
+                         "Second_phone_start_t": [0.2, 0.6, 0.3],
+                         "Second_phone_end_t": [0.3, 0.7, 0.4]})
+
+def test_round_trip(tmp_path, phone_pairs_data):
+    path = str(tmp_path / "journal.sqlite")
+    journal = MeasuresJournal(path, phone_pairs_data, settings)
+    journal.add([2, 0], [[1.0, 0.01, 0.1], [2.0, np.nan, np.nan]])
+    journal.end_recording()
+    journal.close()
+
+    journal = MeasuresJournal(path, phone_pairs_data, settings)
+    positions, measures = journal.get_measures()
+    np.testing.assert_array_equal(positions, [0, 2])
+    np.testing.assert_array_equal(measures, [[2.0, np.nan, np.nan], [1.0, 0.01, 0.1]])
+    journal.close(remove = True)
+    assert not os.path.exists(path)
+
+def test_checkpoint_interval(tmp_path, phone_pairs_data):
+    # Measures are only on disk after checkpoint_interval recordings (a
+    # journal that is not closed stands for a run that crashed)
+    path = str(tmp_path / "journal.sqlite")
+    journal = MeasuresJournal(path, phone_pairs_data, settings, checkpoint_interval = 2)
+    journal.add([0], [[1.0, 0.01, 0.1]])
+    journal.end_recording()
+    assert len(MeasuresJournal(path, phone_pairs_data, settings).get_measures()[0]) == 0
+    journal.add([1], [[2.0, 0.02, 0.2]])
+    journal.end_recording()
+    positions, _ = MeasuresJournal(path, phone_pairs_data, settings).get_measures()
+    np.testing.assert_array_equal(positions, [0, 1])
+
+@pytest.mark.parametrize("change", ["settings", "phone_pairs_data"])
+def test_different_run_is_refused(tmp_path, phone_pairs_data, change):
+    path = str(tmp_path / "journal.sqlite")
+    MeasuresJournal(path, phone_pairs_data, settings).close()
+    if change == "settings":
+        other_settings, other_data = dict(settings, sr = 44100), phone_pairs_data
+    else:
+        other_settings, other_data = settings, phone_pairs_data.copy()
+        other_data.loc[1, "Second_phone_end_t"] = 0.75
+    with pytest.raises(ValueError):
+        MeasuresJournal(path, other_data, other_settings)
+
+def test_resume_after_crash(tmp_path, make_corpus, monkeypatch):
+    import analyze_coarticulation as ac
+    sound_folders_dir, phone_pairs_path = make_corpus(n_files = 3)
+    reference_dir = tmp_path / "reference"
+    reference_dir.mkdir()
+    ac.analyze_coarticulation(sound_folders_dir, phone_pairs_path, str(reference_dir),
+                              sr = 16000, table_format = "csv")
+
+    # Fail on the second recording, after the first one has been journaled
+    get_sound_measures = ac.get_sound_measures
+    analyzed = []
+    def failing_get_sound_measures(sound, *args, **kwargs):
+        if len(analyzed) == 1:
+            raise RuntimeError("crash")
+        analyzed.append(len(sound))
+        return get_sound_measures(sound, *args, **kwargs)
+    monkeypatch.setattr(ac, "get_sound_measures", failing_get_sound_measures)
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    with pytest.raises(RuntimeError):
+        ac.analyze_coarticulation(sound_folders_dir, phone_pairs_path, str(output_dir),
+                                  sr = 16000, checkpoint = True, checkpoint_interval = 1,
+                                  table_format = "csv")
+    assert os.path.exists(output_dir / "coart_data_journal.sqlite")
+
+    # The resumed run only analyzes the two other recordings
+    analyzed.clear()
+    monkeypatch.setattr(ac, "get_sound_measures",
+                        lambda sound, *args, **kwargs: analyzed.append(len(sound)) or
+                        get_sound_measures(sound, *args, **kwargs))
+    ac.analyze_coarticulation(sound_folders_dir, phone_pairs_path, str(output_dir),
+                              sr = 16000, checkpoint = True, checkpoint_interval = 1,
+                              table_format = "csv")
+    assert len(analyzed) == 2
+    assert not os.path.exists(output_dir / "coart_data_journal.sqlite")
+    pd.testing.assert_frame_equal(pd.read_csv(output_dir / "coart_data.csv"),
+                                  pd.read_csv(reference_dir / "coart_data.csv"))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:31:08 2026
+
+@author: adamguo
+
+Checks the spectra sliced out of a whole recording (RecordingSpectra) against
+the STFT of the recording and of each phone.
+"""
+import librosa
+import numpy as np
+import pytest
+from coarticulation_classes import Spectra, Coarticulation, RecordingSpectra, \
+    recording_pair_measures
+from filter_banks import get_mel_filter_bank
+
+sr = 16000
+
+@pytest.fixture(scope = "module")
+def sound():
+    rng = np.random.default_rng(0)
+    t = np.arange(3 * sr) / sr
+    return (0.3 * np.sin(2 * np.pi * (150 + 80 * np.sin(2 * t)) * t) +
+            0.05 * rng.standard_normal(len(t))).astype(np.float32)
+
+@pytest.fixture(scope = "module")
+def bounds():
+    # Phone pairs spread over the recording, the first one at its start
+    rng = np.random.default_rng(1)
+    starts = np.concatenate(([0], rng.integers(sr // 10, 2 * sr, 19)))
+    first_ends = starts + rng.integers(int(0.05 * sr), int(0.15 * sr), len(starts))
+    second_ends = first_ends + rng.integers(int(0.05 * sr), int(0.15 * sr), len(starts))
+    return np.column_stack((starts, first_ends, first_ends, second_ends))
+
+@pytest.mark.parametrize("step_size", [0.001, 0.010])
+def test_recording_frames_match_stft(sound, step_size):
+    mel_f = get_mel_filter_bank(sr, n_fft = 512)
+    recording = RecordingSpectra(sound, sr, mel_f, step_size = step_size)
+    expected = np.asarray(mel_f, dtype = np.float64).dot(
+            np.abs(librosa.stft(sound, n_fft = 512, hop_length = int(sr * step_size),
+                                win_length = int(sr * 0.0256))))
+    actual = recording.get_spectra(0, recording.no_of_frames)
+    np.testing.assert_allclose(actual, expected, rtol = 1e-5, atol = 1e-8)
+
+def test_aligned_phone_interior_frames(sound):
+    # A phone that starts on the frame grid of the recording has the frames
+    # of its own STFT except where its STFT sees padding
+    mel_f = get_mel_filter_bank(sr, n_fft = 512)
+    hop_length = int(sr * 0.001)
+    start, end = 500 * hop_length, 500 * hop_length + 2000
+    recording = RecordingSpectra(sound, sr, mel_f, step_size = 0.001)
+    sliced = Spectra.from_recording(recording, start, end).get_spectra()
+    own = Spectra(sound[start:end], sr, mel_f, step_size = 0.001).get_spectra()
+    assert sliced.shape == own.shape
+    interior = slice(256 // hop_length + 1, (end - start - 256) // hop_length)
+    np.testing.assert_allclose(sliced[:, interior], own[:, interior], rtol = 1e-5)
+
+def test_recording_pair_measures_match_from_recording(sound, bounds):
+    mel_f = get_mel_filter_bank(sr, n_fft = 512)
+    spectral_recording = RecordingSpectra(sound, sr, mel_f, step_size = 0.010)
+    temporal_recording = RecordingSpectra(sound, sr, mel_f, step_size = 0.001)
+    measures = np.column_stack(recording_pair_measures(spectral_recording,
+                                                       temporal_recording,
+                                                       bounds[:, 0:2], bounds[:, 2:4]))
+    for (first_start, first_end, second_start, second_end), row in zip(bounds, measures):
+        spectral_distance = Coarticulation(
+                Spectra.from_recording(spectral_recording, first_start, first_end),
+                Spectra.from_recording(spectral_recording, second_start, second_end)).spectral_dist()
+        trans_dur, relative_trans_dur = Coarticulation(
+                Spectra.from_recording(temporal_recording, first_start, first_end),
+                Spectra.from_recording(temporal_recording, second_start, second_end)).temporal_trans()
+        np.testing.assert_allclose(row, [spectral_distance, trans_dur, relative_trans_dur],
+                                   rtol = 1e-12)
+
+def test_check_whole_recording(sound, bounds):
+    from analyze_coarticulation import check_whole_recording
+    mel_f = get_mel_filter_bank(sr, n_fft = 512)
+    assert check_whole_recording(sound, sr, mel_f, bounds, tolerance = np.inf)
+    assert not check_whole_recording(sound, sr, mel_f, bounds, tolerance = 0.0)
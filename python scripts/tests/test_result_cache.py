@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 21:03:44 2026
+
+@author: adamguo
+
+Checks the cache of phone pair measures (result_cache.ResultCache) and the
+settings it is keyed by.
+"""
+import functools
+import numpy as np
+import pytest
+import result_cache
+from result_cache import ResultCache
+from coarticulation_classes import get_backend_name, scipy_stft_magnitude, \
+    frame_stft_magnitude
+
+settings = {"sr": 16000, "stft_backend": "librosa"}
+times = np.array([[0.1, 0.2, 0.2, 0.3], [0.5, 0.6, 0.6, 0.7]])
+measures = np.array([[1.0, 0.01, 0.1], [2.0, np.nan, np.nan]])
+
+@pytest.fixture
+def sound_path(tmp_path):
+    path = tmp_path / "sound.wav"
+    path.write_bytes(b"RIFF one recording")
+    return str(path)
+
+def get_cached(path, sound_path, pair_times, pair_settings = settings):
+    cache = ResultCache(path, pair_settings)
+    positions, cached = cache.get_measures(cache.get_keys([sound_path] * len(pair_times),
+                                                          pair_times))
+    cache.close()
+    return positions, cached
+
+def test_round_trip(tmp_path, sound_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(path, settings)
+    keys = cache.get_keys([sound_path] * 2, times)
+    assert cache.get_measures(keys)[0].size == 0
+    cache.add(keys, measures)
+    cache.close()
+
+    positions, cached = get_cached(path, sound_path, times)
+    np.testing.assert_array_equal(positions, [0, 1])
+    np.testing.assert_array_equal(cached, measures)
+
+def test_invalidation(tmp_path, sound_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResultCache(path, settings)
+    cache.add(cache.get_keys([sound_path] * 2, times), measures)
+    cache.close()
+
+    # Other bounds for one pair: only that pair is a miss
+    other_times = times.copy()
+    other_times[1, 3] = 0.75
+    np.testing.assert_array_equal(get_cached(path, sound_path, other_times)[0], [0])
+
+    # Other settings
+    assert get_cached(path, sound_path, times, dict(settings, sr = 44100))[0].size == 0
+
+    # Other code
+    monkeypatch.setattr(result_cache, "get_code_version", lambda: "other")
+    assert get_cached(path, sound_path, times)[0].size == 0
+    monkeypatch.undo()
+    assert len(get_cached(path, sound_path, times)[0]) == 2
+
+    # An edited sound file
+    with open(sound_path, "ab") as f:
+        f.write(b" edited")
+    assert get_cached(path, sound_path, times)[0].size == 0
+
+def test_backend_names():
+    def backend(time_series, n_fft, hop_length, win_length, center = True):
+        return frame_stft_magnitude(time_series, n_fft, hop_length, win_length, center)
+    names = [get_backend_name("librosa"),
+             get_backend_name(frame_stft_magnitude),
+             get_backend_name(backend),
+             get_backend_name(lambda *args, **kwargs: None),
+             get_backend_name(functools.partial(scipy_stft_magnitude, workers = 2)),
+             get_backend_name(functools.partial(scipy_stft_magnitude, workers = 4))]
+    assert len(set(names)) == len(names)
+    assert get_backend_name(functools.partial(scipy_stft_magnitude, workers = 2)) == names[4]
+
+def test_rerun_takes_measures_from_cache(tmp_path, make_corpus, monkeypatch):
+    import analyze_coarticulation as ac
+    sound_folders_dir, phone_pairs_path = make_corpus(n_files = 2)
+    cache_path = str(tmp_path / "cache.sqlite")
+    get_sound_measures = ac.get_sound_measures
+    analyzed = []
+    monkeypatch.setattr(ac, "get_sound_measures",
+                        lambda sound, sr, mel_f, bounds, **kwargs: analyzed.append(len(bounds)) or
+                        get_sound_measures(sound, sr, mel_f, bounds, **kwargs))
+    def run(**kwargs):
+        analyzed.clear()
+        output_dir = tmp_path / "output"
+        output_dir.mkdir(exist_ok = True)
+        ac.analyze_coarticulation(sound_folders_dir, phone_pairs_path, str(output_dir),
+                                  sr = 16000, result_cache_path = cache_path,
+                                  table_format = "csv", **kwargs)
+        return np.loadtxt(output_dir / "coart_data.csv", delimiter = ",", skiprows = 1,
+                          usecols = (6, 7, 8))
+
+    first = run()
+    assert sum(analyzed) == len(first)
+    np.testing.assert_array_equal(run(), first)
+    assert sum(analyzed) == 0
+
+    # Two function backends do not share entries
+    run(stft_backend = functools.partial(scipy_stft_magnitude, workers = 1))
+    assert sum(analyzed) == len(first)
+    run(stft_backend = frame_stft_magnitude)
+    assert sum(analyzed) == len(first)
+    run(stft_backend = frame_stft_magnitude)
+    assert sum(analyzed) == 0
+
+def test_feature_store_versions(tmp_path, make_corpus):
+    from feature_store import FeatureStore, build_feature_store
+    from filter_banks import get_mel_filter_bank
+    sound_folders_dir, _ = make_corpus(n_files = 1)
+    versions = []
+    for n_mels, store_name in [(29, "store"), (20, "other_store"), (29, "store")]:
+        store_dir = str(tmp_path / store_name)
+        build_feature_store(sound_folders_dir, store_dir,
+                            get_mel_filter_bank(16000, n_fft = 512, n_mels = n_mels),
+                            sr = 16000)
+        versions.append(FeatureStore(store_dir).get_version())
+    assert versions[0] != versions[1]
+    assert versions[0] == versions[2]
+
+    # Adding a recording changes the version
+    make_corpus(n_files = 2)
+    build_feature_store(sound_folders_dir, str(tmp_path / "store"),
+                        get_mel_filter_bank(16000, n_fft = 512), sr = 16000)
+    assert FeatureStore(str(tmp_path / "store")).get_version() != versions[0]
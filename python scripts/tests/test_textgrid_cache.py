@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 21:40:19 2026
+
+@author: adamguo
+
+Checks the cache of parsed TextGrids (textgrid_cache.TextGridCache): its round
+trip, its invalidation when a TextGrid or the code changes, and the emptying
+of a cache made before the tiers kept their own start and end times.
+"""
+import os, sqlite3
+import numpy as np
+import pytest
+import textgrid_cache
+from textgrid_cache import TextGridCache
+from textgrid_io import read_textgrid_arrays, iter_textgrids
+
+textgrid_text = """File type = "ooTextFile"
+Object class = "TextGrid"
+
+0
+3
+<exists>
+2
+"IntervalTier"
+"phones"
+0
+3
+3
+0
+1
+"a"
+1
+2.2
+"say ""hi""
+twice"
+2.2
+3
+""
+"TextTier"
+"events"
+0.5
+2.5
+1
+1.5
+"click"
+"""
+
+def write_textgrid(path, text = textgrid_text):
+    with open(path, "w", encoding = "utf-8") as f:
+        f.write(text)
+    return str(path)
+
+def assert_same_textgrid(actual, expected):
+    assert (actual.xmin, actual.xmax) == (expected.xmin, expected.xmax)
+    assert list(actual) == list(expected)
+    for name in expected:
+        tier, expected_tier = actual[name], expected[name]
+        assert tier.is_point_tier == expected_tier.is_point_tier
+        assert (tier.tier_xmin, tier.tier_xmax) == (expected_tier.tier_xmin,
+                                                    expected_tier.tier_xmax)
+        np.testing.assert_array_equal(tier.xmin, expected_tier.xmin)
+        np.testing.assert_array_equal(tier.xmax, expected_tier.xmax)
+        assert list(tier.labels) == list(expected_tier.labels)
+
+def test_round_trip(tmp_path):
+    path = write_textgrid(tmp_path / "a.TextGrid")
+    expected = read_textgrid_arrays(path)
+    cache = TextGridCache(str(tmp_path / "cache.sqlite"))
+    assert not cache.is_cached(path)
+    assert cache.get(path) is None
+    cache.add(path, expected)
+    cache.close()
+
+    cache = TextGridCache(str(tmp_path / "cache.sqlite"))
+    assert cache.is_cached(path)
+    assert_same_textgrid(cache.get(path), expected)
+    assert_same_textgrid(cache.get(path, tier_names = ["events", "missing"]),
+                         expected.select(["events"]))
+    assert cache.get(path).to_textgrid()["events"].xmin == 0.5
+    assert (cache.hits, cache.misses) == (3, 0)
+    cache.close()
+
+@pytest.mark.parametrize("change", ["content", "mtime", "code"])
+def test_invalidation(tmp_path, monkeypatch, change):
+    path = write_textgrid(tmp_path / "a.TextGrid")
+    cache = TextGridCache(str(tmp_path / "cache.sqlite"))
+    cache.add(path, read_textgrid_arrays(path))
+    cache.close()
+
+    if change == "content":
+        write_textgrid(path, textgrid_text.replace('"click"', '"clap"'))
+    elif change == "mtime":
+        stat = os.stat(path)
+        os.utime(path, ns = (stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    else:
+        monkeypatch.setattr(textgrid_cache, "get_code_version", lambda: "other")
+    cache = TextGridCache(str(tmp_path / "cache.sqlite"))
+    assert not cache.is_cached(path)
+    assert cache.get(path) is None
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    # The new entry replaces the old one
+    cache.add(path, read_textgrid_arrays(path))
+    assert_same_textgrid(cache.get(path), read_textgrid_arrays(path))
+    assert cache.connection.execute("SELECT COUNT(*) FROM tiers").fetchone()[0] == 2
+    cache.close()
+
+def test_old_schema_is_emptied(tmp_path):
+    # A cache from before the tiers had tier_xmin and tier_xmax
+    path = write_textgrid(tmp_path / "a.TextGrid")
+    cache_path = str(tmp_path / "cache.sqlite")
+    stat = os.stat(path)
+    connection = sqlite3.connect(cache_path)
+    with connection:
+        connection.execute("CREATE TABLE textgrids (path TEXT PRIMARY KEY, size INTEGER, "
+                           "mtime INTEGER, version TEXT, xmin REAL, xmax REAL)")
+        connection.execute("CREATE TABLE tiers (path TEXT, position INTEGER, name TEXT, "
+                           "is_point_tier INTEGER, xmin BLOB, xmax BLOB, labels TEXT, "
+                           "PRIMARY KEY (path, position))")
+        connection.execute("INSERT INTO textgrids VALUES (?, ?, ?, ?, ?, ?)",
+                           (os.path.abspath(path), stat.st_size, stat.st_mtime_ns,
+                            textgrid_cache.get_code_version(), 0.0, 3.0))
+        connection.execute("INSERT INTO tiers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           (os.path.abspath(path), 0, "phones", 0,
+                            np.zeros(1).tobytes(), np.ones(1).tobytes(), '["a"]'))
+    connection.close()
+
+    cache = TextGridCache(cache_path)
+    columns = [row[1] for row in cache.connection.execute("PRAGMA table_info(tiers)")]
+    assert "tier_xmin" in columns and "tier_xmax" in columns
+    assert not cache.is_cached(path)
+    cache.add(path, read_textgrid_arrays(path))
+    assert_same_textgrid(cache.get(path), read_textgrid_arrays(path))
+    cache.close()
+
+def test_iter_textgrids_with_cache(tmp_path, capsys):
+    input_dir = tmp_path / "textgrids"
+    input_dir.mkdir()
+    for i in range(3):
+        write_textgrid(input_dir / "file{}.TextGrid".format(i))
+    cache_path = str(tmp_path / "cache.sqlite")
+    expected = list(iter_textgrids(str(input_dir), tier_names = ["phones"], subfolders = False))
+
+    for hits, misses in [(0, 3), (3, 0)]:
+        actual = list(iter_textgrids(str(input_dir), tier_names = ["phones"],
+                                     subfolders = False, cache_path = cache_path))
+        assert [path for path, _ in actual] == [path for path, _ in expected]
+        for (_, textgrid), (_, expected_textgrid) in zip(actual, expected):
+            assert_same_textgrid(textgrid, expected_textgrid)
+        assert "{} hits, {} misses".format(hits, misses) in capsys.readouterr().out
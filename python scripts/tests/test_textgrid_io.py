@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 21:12:47 2026
+
+@author: adamguo
+
+Checks the TextGrid reader (textgrid_io.read_textgrid_arrays) on TextGrids in
+the long and short text formats and their encodings, against the textgrids
+package where it reads them correctly and against the expected values where
+it does not.
+"""
+import numpy as np
+import pytest
+import textgrids
+from textgrid_io import read_textgrid_arrays, iter_textgrids
+
+# (class, name, xmin, xmax, elements): the elements are (xmin, xmax, label)
+# for an interval tier and (time, label) for a point tier. The tiers start
+# and end away from their first and last elements.
+simple_tiers = [("IntervalTier", "words", 0.0, 2.5,
+                 [(0.0, 0.7, "hello"), (0.7, 1.6, ""), (1.6, 2.5, "world")]),
+                ("IntervalTier", "phones", 0.0, 2.5,
+                 [(0.0, 0.3, "h"), (0.3, 0.7, "@"), (0.7, 1.6, ""),
+                  (1.6, 2.0, "w"), (2.0, 2.5, "3:")]),
+                ("TextTier", "events", 0.1, 2.4,
+                 [(0.5, "click"), (1.8, "cough")])]
+
+# Labels that the textgrids package does not read back as they were written
+hard_tiers = [("IntervalTier", "words", 0.0, 3.0,
+               [(0.0, 1.0, 'say ""hi"" = yes'), (1.0, 2.0, "line one\nline two"),
+                (2.0, 3.0, "élan")]),
+              ("TextTier", "notes", 0.0, 3.0,
+               [(1.5, 'a ""quoted""\nnote')])]
+
+def format_long(tiers, xmin = 0.0, xmax = 3.0):
+    """ Writes tiers as a TextGrid in the long text format. """
+    lines = ['File type = "ooTextFile"', 'Object class = "TextGrid"', "",
+             "xmin = {} ".format(xmin), "xmax = {} ".format(xmax), "tiers? <exists> ",
+             "size = {} ".format(len(tiers)), "item []: "]
+    for i, (tier_class, name, tier_xmin, tier_xmax, elements) in enumerate(tiers, 1):
+        lines += ["    item [{}]:".format(i), '        class = "{}" '.format(tier_class),
+                  '        name = "{}" '.format(name),
+                  "        xmin = {} ".format(tier_xmin), "        xmax = {} ".format(tier_xmax)]
+        if tier_class == "IntervalTier":
+            lines.append("        intervals: size = {} ".format(len(elements)))
+            for j, (start, end, label) in enumerate(elements, 1):
+                lines += ["        intervals [{}]:".format(j),
+                          "            xmin = {} ".format(start),
+                          "            xmax = {} ".format(end),
+                          '            text = "{}" '.format(label)]
+        else:
+            lines.append("        points: size = {} ".format(len(elements)))
+            for j, (time, label) in enumerate(elements, 1):
+                lines += ["        points [{}]:".format(j),
+                          "            number = {} ".format(time),
+                          '            mark = "{}" '.format(label)]
+    return "\n".join(lines) + "\n"
+
+def format_short(tiers, xmin = 0.0, xmax = 3.0):
+    """ Writes tiers as a TextGrid in the short text format. """
+    lines = ['File type = "ooTextFile"', 'Object class = "TextGrid"', "",
+             str(xmin), str(xmax), "<exists>", str(len(tiers))]
+    for tier_class, name, tier_xmin, tier_xmax, elements in tiers:
+        lines += ['"{}"'.format(tier_class), '"{}"'.format(name), str(tier_xmin),
+                  str(tier_xmax), str(len(elements))]
+        for element in elements:
+            lines += [str(value) for value in element[:-1]] + ['"{}"'.format(element[-1])]
+    return "\n".join(lines) + "\n"
+
+formats = {"long": format_long, "short": format_short}
+encodings = ["utf-8", "utf-8-sig", "utf-16"]
+
+def write_textgrid(path, tiers, text_format = "long", encoding = "utf-8"):
+    with open(path, "w", encoding = encoding, newline = "\n") as f:
+        f.write(formats[text_format](tiers))
+    return str(path)
+
+def check_tiers(textgrid, tiers):
+    """ Checks a TextGridArrays against the tiers it was written from. """
+    assert list(textgrid) == [tier[1] for tier in tiers]
+    for tier_class, name, tier_xmin, tier_xmax, elements in tiers:
+        tier = textgrid[name]
+        assert tier.is_point_tier == (tier_class != "IntervalTier")
+        assert (tier.tier_xmin, tier.tier_xmax) == (tier_xmin, tier_xmax)
+        assert list(tier.labels) == [element[-1].replace('""', '"') for element in elements]
+        np.testing.assert_array_equal(tier.xmin, [element[0] for element in elements])
+        np.testing.assert_array_equal(tier.xmax, [element[-2] for element in elements])
+        assert tier.xmin.dtype == tier.xmax.dtype == np.float64
+
+def test_matches_textgrids(tmp_path):
+    # The textgrids package only reads the long format in UTF-8
+    path = write_textgrid(tmp_path / "a.TextGrid", simple_tiers)
+    textgrid = read_textgrid_arrays(path)
+    expected = textgrids.TextGrid(path)
+    assert (textgrid.xmin, textgrid.xmax) == (expected.xmin, expected.xmax)
+    assert list(textgrid) == list(expected)
+    for name, expected_tier in expected.items():
+        tier = textgrid[name]
+        assert (tier.tier_xmin, tier.tier_xmax) == (expected_tier.xmin, expected_tier.xmax)
+        assert list(tier.labels) == [str(element.text) for element in expected_tier]
+        if expected_tier.is_point_tier:
+            assert tier.xmin.tolist() == [point.xpos for point in expected_tier]
+        else:
+            assert tier.xmin.tolist() == [interval.xmin for interval in expected_tier]
+            assert tier.xmax.tolist() == [interval.xmax for interval in expected_tier]
+
+@pytest.mark.parametrize("encoding", encodings)
+@pytest.mark.parametrize("text_format", formats)
+def test_formats(tmp_path, text_format, encoding):
+    path = write_textgrid(tmp_path / "a.TextGrid", simple_tiers, text_format, encoding)
+    textgrid = read_textgrid_arrays(path)
+    assert (textgrid.xmin, textgrid.xmax) == (0.0, 3.0)
+    check_tiers(textgrid, simple_tiers)
+
+@pytest.mark.parametrize("encoding", encodings)
+@pytest.mark.parametrize("text_format", formats)
+def test_escaped_and_multiline_labels(tmp_path, text_format, encoding):
+    path = write_textgrid(tmp_path / "a.TextGrid", hard_tiers, text_format, encoding)
+    textgrid = read_textgrid_arrays(path)
+    check_tiers(textgrid, hard_tiers)
+    assert textgrid["words"].labels[0] == 'say "hi" = yes'
+    assert textgrid["words"].labels[1] == "line one\nline two"
+
+@pytest.mark.parametrize("text_format", formats)
+def test_tier_names(tmp_path, text_format):
+    # The tiers that are skipped have multi-line labels, which are one value
+    path = write_textgrid(tmp_path / "a.TextGrid", hard_tiers + simple_tiers[1:2],
+                          text_format)
+    textgrid = read_textgrid_arrays(path, tier_names = ["phones", "missing"])
+    check_tiers(textgrid, simple_tiers[1:2])
+    assert "words" not in textgrid
+    with pytest.raises(KeyError):
+        textgrid["words"]
+    check_tiers(read_textgrid_arrays(path).select(["phones"]), simple_tiers[1:2])
+
+def test_truncated_and_other_files(tmp_path):
+    text = format_long(simple_tiers)
+    path = tmp_path / "a.TextGrid"
+    path.write_text(text[:text.index("        points [2]:")], encoding = "utf-8")
+    with pytest.raises(ValueError):
+        read_textgrid_arrays(str(path))
+    path.write_text('File type = "ooTextFile"\nObject class = "Sound"\n', encoding = "utf-8")
+    with pytest.raises(ValueError):
+        read_textgrid_arrays(str(path))
+
+def test_binary(tmp_path):
+    # Binary TextGrids are read with the textgrids package (which does not
+    # read the start and end times of the tiers)
+    textgrid = textgrids.TextGrid()
+    textgrid.xmin, textgrid.xmax = 0.0, 2.5
+    for tier_class, name, tier_xmin, tier_xmax, elements in simple_tiers:
+        tier = textgrids.Tier(xmin = tier_xmin, xmax = tier_xmax,
+                              point_tier = tier_class != "IntervalTier")
+        if tier.is_point_tier:
+            tier.extend(textgrids.Point(textgrids.Transcript(label), time)
+                        for time, label in elements)
+        else:
+            tier.extend(textgrids.Interval(label, start, end) for start, end, label in elements)
+        textgrid[name] = tier
+    path = str(tmp_path / "a.TextGrid")
+    textgrid.write(path, fmt = textgrids.BINARY)
+
+    actual = read_textgrid_arrays(path)
+    assert list(actual) == [tier[1] for tier in simple_tiers]
+    for tier_class, name, _, _, elements in simple_tiers:
+        assert actual[name].is_point_tier == (tier_class != "IntervalTier")
+        assert list(actual[name].labels) == [element[-1] for element in elements]
+        np.testing.assert_array_equal(actual[name].xmin, [element[0] for element in elements])
+
+def test_point_tier_to_textgrid(tmp_path):
+    # Tiers keep their own start and end times, which a point tier cannot
+    # take from its points
+    path = write_textgrid(tmp_path / "a.TextGrid", simple_tiers)
+    textgrid = read_textgrid_arrays(path).to_textgrid()
+    events = textgrid["events"]
+    assert events.is_point_tier
+    assert (events.xmin, events.xmax) == (0.1, 2.4)
+    assert [(point.xpos, str(point.text)) for point in events] == simple_tiers[2][4]
+    phones = textgrid["phones"]
+    assert not phones.is_point_tier
+    assert (phones.xmin, phones.xmax) == (0.0, 2.5)
+    assert [(interval.xmin, interval.xmax, interval.text)
+            for interval in phones] == simple_tiers[1][4]
+
+def test_view(tmp_path):
+    path = write_textgrid(tmp_path / "a.TextGrid", simple_tiers)
+    view = read_textgrid_arrays(path).view()
+    assert list(view.keys()) == ["words", "phones", "events"]
+    assert [(interval.xmin, interval.xmax, interval.text)
+            for interval in view["words"]] == simple_tiers[0][4]
+    assert [(point.xpos, point.text) for point in view["events"]] == simple_tiers[2][4]
+
+def test_iter_textgrids_workers(tmp_path):
+    for condition in ["NB", "WB"]:
+        (tmp_path / condition).mkdir()
+        for i, tiers in enumerate([simple_tiers, hard_tiers]):
+            write_textgrid(tmp_path / condition / "file{}.TextGrid".format(i), tiers,
+                           "short" if i else "long")
+    serial = list(iter_textgrids(str(tmp_path), tier_names = ["words"]))
+    parallel = list(iter_textgrids(str(tmp_path), tier_names = ["words"], n_jobs = 2))
+    assert [path for path, _ in serial] == [path for path, _ in parallel] == \
+        ["NB/file0.TextGrid", "NB/file1.TextGrid", "WB/file0.TextGrid", "WB/file1.TextGrid"]
+    for (_, textgrid), (_, other) in zip(serial, parallel):
+        assert list(textgrid) == list(other) == ["words"]
+        assert list(textgrid["words"].labels) == list(other["words"].labels)
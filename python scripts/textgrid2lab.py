@@ -6,14 +6,17 @@ Created on Wed Dec 23 15:29:08 2020
 @author: adamguo
 """
 
-import os, textgrids
+import os
+from textgrid_io import iter_textgrids
 
 def textgrid2lab(input_dir, output_dir,
                  text_to_ignore,
                  target_tier = "Words",
                  uppercase = True,
                  ignore_nonspeech = True,
-                 strip_punc = True):
+                 strip_punc = True,
+                 n_jobs = 1,
+                 textgrid_cache_path = None):
     """ Convert (word-aligned) TextGrid annotations to LAB format.
     
     input_dir:
@@ -30,24 +33,30 @@ def textgrid2lab(input_dir, output_dir,
         Ignore nonspeech labels (e.g., !SIL)? (default: True)
     strip_punc:
         Strip off puncuations (e.g., - and ,)? (default: True)    
+    n_jobs:
+        Number of worker processes that read the TextGrids (default: 1, i.e., 
+        no worker processes; see textgrid_io.iter_textgrids).
+    textgrid_cache_path:
+        Path to a cache of parsed TextGrids, an SQLite file (default: None, 
+        i.e., no cache; see textgrid_cache.TextGridCache).
     """
     
-    # Get the TextGrid files in the input directory
-    all_textgrids = [i for i in os.listdir(input_dir) if i.endswith(".TextGrid")]
-    
     # Define punctuation
     punctuation = '!"#$%&\()*+,-./:;<=>?@[\\]^_`{|}~ '
     
-    # Iterate over all TextGrid files
-    for textgrid_file in all_textgrids:
-        textgrid = textgrids.TextGrid(os.path.join(input_dir, textgrid_file))
+    # Iterate over all TextGrid files in the input directory (only the target 
+    # tier is read)
+    for textgrid_file, textgrid in iter_textgrids(input_dir,
+                                                  tier_names = [target_tier],
+                                                  n_jobs = n_jobs,
+                                                  subfolders = False,
+                                                  cache_path = textgrid_cache_path):
         
         # Create an empty list for storing all text of this TextGrid
         all_text = []
         
-        # Itervate over all intervals in target_tier
-        for interval in textgrid[target_tier]:
-            text = interval.text
+        # Itervate over all interval labels in target_tier
+        for text in textgrid[target_tier].labels:
             
             # Check whether to ignore nonspeech labels
             
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 16:38:12 2026
+
+@author: adamguo
+
+Cache of parsed TextGrids (the arrays of their tiers, see textgrid_io), so
+that the scripts that read the same unchanged TextGrids run after run do
+not parse them from text every time.
+"""
+import os, sys, sqlite3, hashlib, json
+import numpy as np
+from textgrid_io import TierArrays, TextGridArrays
+
+# Modules whose code the parsed TextGrids depend on (a change to any of them
+# invalidates the cache)
+code_modules = ["textgrid_io.py", "textgrid_cache.py"]
+
+class TextGridCache:
+    def __init__(self, path):
+        """
+        Opens (or creates) a cache of parsed TextGrids. A TextGrid is keyed by
+        its absolute path, and its entry is only used while the size and the
+        modification time of the file and the version of the code (see
+        get_code_version) are the same as when it was parsed; otherwise it is
+        parsed again and replaced. The times of each tier are kept as float64
+        bytes and the labels as JSON, one row per tier, so that only the
+        tiers that are asked for are read.
+
+        path:
+            Path to the cache (an SQLite file).
+        """
+        self.path = path
+        self.version = get_code_version()
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(path)
+
+        # A cache made before the tiers kept their own start and end times
+        # is emptied (its entries would be parsed again anyway)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(tiers)")]
+        if columns and "tier_xmin" not in columns:
+            with self.connection:
+                self.connection.execute("DROP TABLE tiers")
+                self.connection.execute("DROP TABLE IF EXISTS textgrids")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS textgrids "
+                                "(path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, "
+                                "version TEXT, xmin REAL, xmax REAL)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS tiers "
+                                "(path TEXT, position INTEGER, name TEXT, "
+                                "is_point_tier INTEGER, tier_xmin REAL, tier_xmax REAL, "
+                                "xmin BLOB, xmax BLOB, labels TEXT, "
+                                "PRIMARY KEY (path, position))")
+
+    def is_cached(self, path):
+        """ Checks whether the cache has an up-to-date entry for a TextGrid
+        (without counting a hit or a miss). """
+        stat = os.stat(path)
+        row = self.connection.execute("SELECT size, mtime, version FROM textgrids "
+                                      "WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        return row is not None and tuple(row) == (stat.st_size, stat.st_mtime_ns, self.version)
+
+    def get(self, path, tier_names = None):
+        """
+        Gets a TextGrid from the cache as a TextGridArrays, or None if it has
+        no up-to-date entry, and counts the hit or miss.
+
+        path:
+            Path to the TextGrid.
+        tier_names:
+            Tiers to get (default: None, i.e., all of them). Tiers that the
+            TextGrid does not have are left out.
+        """
+        if not self.is_cached(path):
+            self.misses += 1
+            return None
+        path = os.path.abspath(path)
+        xmin, xmax = self.connection.execute("SELECT xmin, xmax FROM textgrids "
+                                             "WHERE path = ?", (path,)).fetchone()
+        query = ("SELECT name, is_point_tier, tier_xmin, tier_xmax, xmin, xmax, labels "
+                 "FROM tiers WHERE path = ?")
+        parameters = [path]
+        if tier_names is not None:
+            query += " AND name IN ({})".format(", ".join("?" * len(tier_names)))
+            parameters += list(tier_names)
+        tiers = {}
+        for name, is_point_tier, tier_xmin, tier_xmax, interval_xmin, interval_xmax, \
+                labels in self.connection.execute(query + " ORDER BY position", parameters):
+            tiers[name] = TierArrays(name,
+                                     np.frombuffer(interval_xmin, dtype = np.float64).copy(),
+                                     np.frombuffer(interval_xmax, dtype = np.float64).copy(),
+                                     np.array([sys.intern(label) for label in json.loads(labels)],
+                                              dtype = object),
+                                     is_point_tier = bool(is_point_tier),
+                                     tier_xmin = tier_xmin,
+                                     tier_xmax = tier_xmax)
+        self.hits += 1
+        return TextGridArrays(xmin, xmax, tiers)
+
+    def add(self, path, textgrid):
+        """
+        Adds (or replaces) the entry of a TextGrid.
+
+        path:
+            Path to the TextGrid.
+        textgrid:
+            The TextGrid with all of its tiers (a TextGridArrays).
+        """
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        with self.connection:
+            self.connection.execute("DELETE FROM tiers WHERE path = ?", (path,))
+            self.connection.execute("INSERT OR REPLACE INTO textgrids VALUES (?, ?, ?, ?, ?, ?)",
+                                    (path, stat.st_size, stat.st_mtime_ns, self.version,
+                                     textgrid.xmin, textgrid.xmax))
+            self.connection.executemany(
+                    "INSERT INTO tiers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(path, position, tier.name, int(tier.is_point_tier),
+                      tier.tier_xmin, tier.tier_xmax,
+                      np.ascontiguousarray(tier.xmin, dtype = np.float64).tobytes(),
+                      np.ascontiguousarray(tier.xmax, dtype = np.float64).tobytes(),
+                      json.dumps(list(tier.labels), ensure_ascii = False))
+                     for position, tier in enumerate(textgrid.tiers.values())])
+
+    def report(self):
+        """ Prints the number of cache hits and misses. """
+        print("\nTextGrid cache: {} hits, {} misses".format(self.hits, self.misses))
+
+    def close(self):
+        """ Closes the cache. """
+        self.connection.close()
+
+def get_code_version():
+    """ Gets the SHA-1 of the source of the modules in code_modules. """
+    code_hash = hashlib.sha1()
+    for module in code_modules:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), module), "rb") as f:
+            code_hash.update(f.read())
+    return code_hash.hexdigest()
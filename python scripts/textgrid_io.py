@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 14:05:31 2026
+
+@author: adamguo
+
+Reading TextGrids as compact arrays (one array of labels and two of times
+per tier) instead of one Python object per interval, and loading many of
+them at once in worker processes.
+"""
+import os, io, sys, textgrids
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+class TierArrays:
+    __slots__ = ("name", "xmin", "xmax", "labels", "is_point_tier", "tier_xmin",
+                 "tier_xmax")
+
+    def __init__(self, name, xmin, xmax, labels, is_point_tier = False,
+                 tier_xmin = None, tier_xmax = None):
+        """
+        The intervals (or points) of a tier as arrays.
+
+        name:
+            Name of the tier.
+        xmin:
+            Start times of the intervals (for a point tier, the times of the
+            points) (expects a float64 array).
+        xmax:
+            End times of the intervals (for a point tier, the same as xmin)
+            (expects a float64 array).
+        labels:
+            Labels of the intervals (expects an array of strings).
+        is_point_tier:
+            Whether the tier is a point tier (default: False).
+        tier_xmin:
+            Start time of the tier (default: None, i.e., the start of its
+            first interval, or 0.0 if it is empty).
+        tier_xmax:
+            End time of the tier (default: None, i.e., the end of its last
+            interval, or 0.0 if it is empty).
+        """
+        self.name = name
+        self.xmin = xmin
+        self.xmax = xmax
+        self.labels = labels
+        self.is_point_tier = is_point_tier
+        if tier_xmin is None:
+            tier_xmin = float(xmin.min()) if len(xmin) > 0 else 0.0
+        if tier_xmax is None:
+            tier_xmax = float(xmax.max()) if len(xmax) > 0 else 0.0
+        self.tier_xmin = tier_xmin
+        self.tier_xmax = tier_xmax
+
+    def __len__(self):
+        return len(self.labels)
+
+    def intervals(self):
+        """ Gets the intervals (or points) of the tier as a list of
+        IntervalView (or PointView) objects. """
+        if self.is_point_tier:
+            return [PointView(label, x) for label, x in zip(self.labels, self.xmin.tolist())]
+        return [IntervalView(label, xmin, xmax)
+                for label, xmin, xmax in zip(self.labels, self.xmin.tolist(),
+                                             self.xmax.tolist())]
+
+    def to_tier(self):
+        """ Gets the tier as a textgrids.Tier. """
+        # The tier is made empty and filled, as textgrids.Tier would take
+        # xmin and xmax of 0.0 from the elements (which points do not have)
+        tier = textgrids.Tier(xmin = self.tier_xmin, xmax = self.tier_xmax,
+                              point_tier = self.is_point_tier)
+        if self.is_point_tier:
+            tier.extend(textgrids.Point(textgrids.Transcript(label), x)
+                        for label, x in zip(self.labels, self.xmin.tolist()))
+        else:
+            tier.extend(textgrids.Interval(label, xmin, xmax)
+                        for label, xmin, xmax in zip(self.labels, self.xmin.tolist(),
+                                                     self.xmax.tolist()))
+        return tier
+
+class TextGridArrays:
+    __slots__ = ("xmin", "xmax", "tiers")
+
+    def __init__(self, xmin, xmax, tiers):
+        """
+        The tiers of a TextGrid as TierArrays. Tiers are looked up by name,
+        like in a textgrids.TextGrid (a KeyError if there is no such tier).
+
+        xmin:
+            Start time of the TextGrid.
+        xmax:
+            End time of the TextGrid.
+        tiers:
+            Tiers (expects a dictionary of TierArrays by name).
+        """
+        self.xmin = xmin
+        self.xmax = xmax
+        self.tiers = tiers
+
+    def __getitem__(self, tier_name):
+        return self.tiers[tier_name]
+
+    def __contains__(self, tier_name):
+        return tier_name in self.tiers
+
+    def __iter__(self):
+        return iter(self.tiers)
+
+    def select(self, tier_names = None):
+        """ Gets a TextGridArrays with only some of the tiers (default: None,
+        i.e., all of them). Tiers that the TextGrid does not have are left
+        out. """
+        if tier_names is None:
+            return self
+        return TextGridArrays(self.xmin, self.xmax,
+                              {tier_name: tier for tier_name, tier in self.tiers.items()
+                               if tier_name in tier_names})
+
+    def view(self):
+        """ Gets a TextGridView of the TextGrid, which the code written for
+        textgrids.TextGrid objects can read. """
+        return TextGridView(self)
+
+    def to_textgrid(self):
+        """ Gets the TextGrid as a textgrids.TextGrid (e.g., for the
+        functions of get_keywords_tiers, or to write it). """
+        textgrid = textgrids.TextGrid()
+        textgrid.xmin = self.xmin
+        textgrid.xmax = self.xmax
+        for tier_name, tier in self.tiers.items():
+            textgrid[tier_name] = tier.to_tier()
+        return textgrid
+
+class IntervalView:
+    __slots__ = ("text", "xmin", "xmax")
+
+    def __init__(self, text, xmin, xmax):
+        """ An interval of a TextGridView, with the text, xmin and xmax of a
+        textgrids.Interval. """
+        self.text = text
+        self.xmin = xmin
+        self.xmax = xmax
+
+    def dur(self):
+        """ Duration of the interval. """
+        return self.xmax - self.xmin
+
+    def mid(self):
+        """ Midpoint of the interval. """
+        return (self.xmin + self.xmax) / 2
+
+    def __repr__(self):
+        return '<Interval text="{}" xmin={} xmax={}>'.format(self.text, self.xmin, self.xmax)
+
+class PointView:
+    __slots__ = ("text", "xpos")
+
+    def __init__(self, text, xpos):
+        """ A point of a TextGridView, with the text and xpos of a
+        textgrids.Point. """
+        self.text = text
+        self.xpos = xpos
+
+class TextGridView:
+    def __init__(self, textgrid):
+        """
+        A read-only stand-in for a textgrids.TextGrid over a TextGridArrays:
+        tiers are looked up by name and are lists of IntervalView (or
+        PointView) objects with the text, xmin and xmax attributes that the
+        scripts use. The interval objects of a tier are only made when the
+        tier is first looked up.
+
+        textgrid:
+            A TextGridArrays.
+        """
+        self.textgrid = textgrid
+        self.xmin = textgrid.xmin
+        self.xmax = textgrid.xmax
+        self.tiers = {}
+
+    def __getitem__(self, tier_name):
+        if tier_name not in self.tiers:
+            self.tiers[tier_name] = self.textgrid[tier_name].intervals()
+        return self.tiers[tier_name]
+
+    def __contains__(self, tier_name):
+        return tier_name in self.textgrid
+
+    def __iter__(self):
+        return iter(self.textgrid)
+
+    def __len__(self):
+        return len(self.textgrid.tiers)
+
+    def keys(self):
+        return self.textgrid.tiers.keys()
+
+    def items(self):
+        return [(tier_name, self[tier_name]) for tier_name in self.textgrid]
+
+def read_textgrid_arrays(path, tier_names = None):
+    """
+    Reads a TextGrid as a TextGridArrays, one line at a time, without making
+    an object per interval. Reads the long and the short text formats (UTF-8
+    or UTF-16); binary TextGrids are read with the textgrids package. The
+    labels are interned, so repeated labels share one string.
+
+    path:
+        Path to the TextGrid.
+    tier_names:
+        Tiers to keep (default: None, i.e., all of them). The intervals of
+        the other tiers are skipped without being converted. Tiers that the
+        TextGrid does not have are left out.
+    """
+    with open(path, "rb") as f:
+        start = f.read(32)
+        f.seek(0)
+        if start.startswith(b"ooBinaryFile"):
+            return _read_textgrid_arrays_textgrids(path, tier_names = tier_names)
+        if start[:2] in (b"\xfe\xff", b"\xff\xfe"):
+            encoding = "utf-16"
+        else:
+            encoding = "utf-8-sig"
+
+        tokens = _iter_tokens(io.TextIOWrapper(f, encoding = encoding))
+        try:
+            if next(tokens) != '"ooTextFile"' or next(tokens) != '"TextGrid"':
+                raise ValueError("{} is not a TextGrid".format(path))
+            xmin = float(next(tokens))
+            xmax = float(next(tokens))
+            tiers = {}
+            if next(tokens) != "<exists>":
+                return TextGridArrays(xmin, xmax, tiers)
+
+            for _ in range(int(next(tokens))):
+                is_point_tier = _unquote(next(tokens)) != "IntervalTier"
+                tier_name = _unquote(next(tokens))
+                tier_xmin = float(next(tokens))
+                tier_xmax = float(next(tokens))
+                size = int(next(tokens))
+                values_per_element = 2 if is_point_tier else 3
+
+                # Skip the tiers that are not asked for
+                if tier_names is not None and tier_name not in tier_names:
+                    for _ in range(size * values_per_element):
+                        next(tokens)
+                    continue
+
+                starts = []
+                ends = []
+                labels = []
+                for _ in range(size):
+                    starts.append(float(next(tokens)))
+                    if not is_point_tier:
+                        ends.append(float(next(tokens)))
+                    labels.append(sys.intern(_unquote(next(tokens))))
+
+                starts = np.array(starts, dtype = np.float64)
+                tiers[tier_name] = TierArrays(tier_name, starts,
+                                              starts.copy() if is_point_tier else
+                                              np.array(ends, dtype = np.float64),
+                                              np.array(labels, dtype = object),
+                                              is_point_tier = is_point_tier,
+                                              tier_xmin = tier_xmin,
+                                              tier_xmax = tier_xmax)
+
+        except StopIteration:
+            raise ValueError("{} ends before the end of its last tier".format(path)) from None
+    return TextGridArrays(xmin, xmax, tiers)
+
+def _iter_tokens(lines):
+    """
+    Yields the values of a TextGrid in the long or short text format: the
+    part after " = " of the lines of the long format (or the whole line in
+    the short format), i.e., numbers, quoted strings and flags such as
+    <exists>. Lines without a value (e.g., "item [1]:") are skipped, and a
+    string that runs over several lines is yielded whole.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line[0] != '"':
+            equals = line.find("=")
+            if equals >= 0:
+                line = line[equals + 1:].strip()
+            elif line.endswith("<exists>") or line.endswith("<absent>"):
+                line = line[-8:]
+            elif line[0] not in "-.0123456789":
+                continue
+
+        # A string ends at an odd number of quotes (pairs of quotes are
+        # escaped quotes inside the string)
+        if line[0] == '"':
+            while line.count('"') % 2 == 1:
+                next_line = next(lines, None)
+                if next_line is None:
+                    break
+                line += "\n" + next_line.rstrip()
+        yield line
+
+def _unquote(token):
+    """ Gets the string in a quoted token. """
+    return token[1:-1].replace('""', '"')
+
+def _read_textgrid_arrays_textgrids(path, tier_names = None):
+    """ Reads a TextGrid as a TextGridArrays with the textgrids package
+    (for binary TextGrids). """
+    textgrid = textgrids.TextGrid(path)
+    tiers = {}
+    for tier_name, tier in textgrid.items():
+        if tier_names is not None and tier_name not in tier_names:
+            continue
+        if tier.is_point_tier:
+            xmin = np.array([point.xpos for point in tier], dtype = np.float64)
+            xmax = xmin.copy()
+        else:
+            xmin = np.array([interval.xmin for interval in tier], dtype = np.float64)
+            xmax = np.array([interval.xmax for interval in tier], dtype = np.float64)
+        tiers[tier_name] = TierArrays(tier_name, xmin, xmax,
+                                      np.array([str(element.text) for element in tier],
+                                               dtype = object),
+                                      is_point_tier = tier.is_point_tier,
+                                      tier_xmin = tier.xmin,
+                                      tier_xmax = tier.xmax)
+    return TextGridArrays(textgrid.xmin, textgrid.xmax, tiers)
+
+def list_textgrids(input_dir, subfolders = True):
+    """
+    Gets the paths of the TextGrids in input_dir (relative to it), sorted by
+    subfolder and file name.
+
+    input_dir:
+        Directory of the TextGrids.
+    subfolders:
+        Whether the TextGrids are in subfolders of input_dir (one per
+        condition) rather than in input_dir itself (default: True).
+    """
+    if not subfolders:
+        return sorted(f for f in os.listdir(input_dir) if f.endswith(".TextGrid"))
+    return [os.path.join(subfolder, f)
+            for subfolder in sorted(f.name for f in os.scandir(input_dir) if f.is_dir())
+            for f in sorted(os.listdir(os.path.join(input_dir, subfolder)))
+            if f.endswith(".TextGrid")]
+
+def iter_textgrids(input_dir, tier_names = None, n_jobs = 1, subfolders = True,
+                   textgrid_paths = None, cache_path = None):
+    """
+    Reads the TextGrids of input_dir (see list_textgrids) and yields the path
+    (relative to input_dir) and the TextGridArrays of each, in the order of
+    the paths. With n_jobs > 1 they are read in a pool of worker processes,
+    which only send back the arrays of the tiers asked for. With a cache (see
+    textgrid_cache.TextGridCache), the TextGrids that have not changed since
+    they were cached are taken from it instead of being parsed, and the
+    others are parsed whole and added to it; the numbers of cache hits and
+    misses are printed at the end.
+
+    input_dir:
+        Directory of the TextGrids.
+    tier_names:
+        Tiers to keep (default: None, i.e., all of them).
+    n_jobs:
+        Number of worker processes (default: 1, i.e., no worker processes).
+    subfolders:
+        See list_textgrids (default: True).
+    textgrid_paths:
+        Paths of the TextGrids to read, relative to input_dir (default: None,
+        i.e., all of them).
+    cache_path:
+        Path to the cache of parsed TextGrids (an SQLite file) (default: None,
+        i.e., no cache).
+    """
+    if textgrid_paths is None:
+        textgrid_paths = list_textgrids(input_dir, subfolders = subfolders)
+    full_paths = [os.path.join(input_dir, path) for path in textgrid_paths]
+
+    if cache_path is None:
+        for path, textgrid in zip(textgrid_paths,
+                                  _parse_textgrids([(full_path, tier_names)
+                                                    for full_path in full_paths], n_jobs)):
+            yield path, textgrid
+        return
+
+    from textgrid_cache import TextGridCache
+    cache = TextGridCache(cache_path)
+    try:
+        # Only the TextGrids that are not in the cache are parsed (with all
+        # of their tiers, for the cache)
+        to_parse = set(full_path for full_path in full_paths if not cache.is_cached(full_path))
+        parsed = _parse_textgrids([(full_path, None) for full_path in full_paths
+                                   if full_path in to_parse], n_jobs)
+        for path, full_path in zip(textgrid_paths, full_paths):
+            if full_path in to_parse:
+                textgrid = next(parsed)
+                cache.misses += 1
+                cache.add(full_path, textgrid)
+                textgrid = textgrid.select(tier_names)
+            else:
+                textgrid = cache.get(full_path, tier_names = tier_names)
+
+                # The TextGrid changed since the cache was checked
+                if textgrid is None:
+                    textgrid = read_textgrid_arrays(full_path)
+                    cache.add(full_path, textgrid)
+                    textgrid = textgrid.select(tier_names)
+            yield path, textgrid
+        cache.report()
+    finally:
+        cache.close()
+
+def _parse_textgrids(tasks, n_jobs = 1):
+    """ Reads TextGrids (expects a list of (path, tier_names) tasks), in a
+    pool of n_jobs worker processes if n_jobs > 1, and yields them in the
+    order of the tasks. """
+    if n_jobs <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            yield _read_textgrid_task(task)
+        return
+
+    with ProcessPoolExecutor(max_workers = n_jobs) as executor:
+        chunksize = max(1, len(tasks) // (n_jobs * 4))
+        yield from executor.map(_read_textgrid_task, tasks, chunksize = chunksize)
+
+def load_textgrids(input_dir, tier_names = None, n_jobs = 1, subfolders = True,
+                   cache_path = None):
+    """
+    Reads the TextGrids of input_dir into a list of (path relative to
+    input_dir, TextGridArrays), in the order of list_textgrids. See
+    iter_textgrids.
+    """
+    return list(iter_textgrids(input_dir, tier_names = tier_names, n_jobs = n_jobs,
+                               subfolders = subfolders, cache_path = cache_path))
+
+def _read_textgrid_task(task):
+    """ Reads a TextGrid in a worker process. """
+    path, tier_names = task
+    return read_textgrid_arrays(path, tier_names = tier_names)